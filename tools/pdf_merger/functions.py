@@ -2,7 +2,7 @@ import os, re, sys, logging
 from os.path import split, basename
 from shutil import rmtree
 from glob import glob
-from packages.PyPDF2 import PdfFileMerger, PdfFileReader
+from packages.PyPDF2 import PdfFileMerger, countPagesBatch
 
 
 def set_log_configs():
@@ -126,8 +126,8 @@ def merge_files(master_list):
 
     tmp_directory = os.path.join(os.getcwd(), "tmp{}".format(os.getpid()))
 
-    pdf_merger_actual = PdfFileMerger()
-    pdf_merger_expected = PdfFileMerger()
+    pdf_merger_actual = PdfFileMerger(useMmap=True, streamOutput=True, deduplicate=True)
+    pdf_merger_expected = PdfFileMerger(useMmap=True, streamOutput=True, deduplicate=True)
     blank_pdf_file = os.path.join(os.getcwd(), "files/blankPDF.pdf")
     letter_ids = master_list["Expected"].keys()
 
@@ -137,19 +137,19 @@ def merge_files(master_list):
             expected_letters = master_list["Expected"][letter_id]
             logging.info("Processing {} files...".format(letter_id))
 
-            files_merged_count = 0
-            for actual_letter, expected_letter in zip(actual_letters, expected_letters):
-                # Get the page count of both files.
-                with open(actual_letter, "rb") as fileObj:
-                    actual_letter_page_count = PdfFileReader(fileObj).getNumPages()
+            # Get the page count of all files in one concurrent batch.
+            letter_pairs = list(zip(actual_letters, expected_letters))
+            page_counts = countPagesBatch([letter for letter_pair in letter_pairs for letter in letter_pair])
 
-                with open(expected_letter, "rb") as fileObj:
-                    expected_letter_page_count = PdfFileReader(fileObj).getNumPages()
+            files_merged_count = 0
+            for index, (actual_letter, expected_letter) in enumerate(letter_pairs):
+                actual_letter_page_count = page_counts[2 * index]
+                expected_letter_page_count = page_counts[2 * index + 1]
 
                 # Check if pageCount does not match
                 if actual_letter_page_count != expected_letter_page_count:
                     # Add a blank page and save as a tmp_file
-                    pdf_merger_blank = PdfFileMerger()
+                    pdf_merger_blank = PdfFileMerger(useMmap=True, streamOutput=True)
                     num_of_blank_pages_to_add = abs(actual_letter_page_count - expected_letter_page_count)
                     tmp_file = expected_letter.replace("Expected_Results", "{}".format(basename(tmp_directory)))
                     actual_pg_count_gt_expected = actual_letter_page_count > expected_letter_page_count
@@ -196,8 +196,8 @@ def merge_files(master_list):
             logging.info("  " + outfile_expected)
 
             # Reset the PdfFileMerger objects
-            pdf_merger_actual = PdfFileMerger()
-            pdf_merger_expected = PdfFileMerger()
+            pdf_merger_actual = PdfFileMerger(useMmap=True, streamOutput=True, deduplicate=True)
+            pdf_merger_expected = PdfFileMerger(useMmap=True, streamOutput=True, deduplicate=True)
 
     except IsADirectoryError:
         abort_program("Unable to save {} file due to an existing directory with the same name.".format(fileObj.name))
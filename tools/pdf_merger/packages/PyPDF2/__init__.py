@@ -1,4 +1,4 @@
-from .pdf import PdfFileReader, PdfFileWriter
+from .pdf import PdfFileReader, PdfFileWriter, countPages, countPagesBatch
 from .merger import PdfFileMerger
 from .pagerange import PageRange, parse_filename_page_ranges
 from ._version import __version__
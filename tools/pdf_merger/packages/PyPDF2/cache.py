@@ -0,0 +1,204 @@
+"""
+Bounded caches used by PdfFileReader.
+"""
+
+import weakref
+from collections import OrderedDict
+from .generic import ArrayObject, DictionaryObject, StreamObject
+
+_MISSING = object()
+
+
+class LRUCache(object):
+    """
+    A mapping that keeps at most ``maxEntries`` entries and at most
+    ``maxBytes`` bytes worth of values, as measured by ``sizeOf``, evicting
+    the least recently used entries first.  Either bound may be ``None`` for
+    no limit; with neither the cache is a plain, unbounded mapping.  A value
+    larger than ``maxBytes`` on its own is not kept at all.
+
+    ``hits``, ``misses`` and ``evictions`` count lookups that found an entry,
+    lookups that did not, and entries dropped to stay within the bounds.
+    ``bytes`` is the total size of the entries held.
+    """
+    def __init__(self, maxEntries=None, maxBytes=None, sizeOf=len):
+        self.maxEntries = maxEntries
+        self.maxBytes = maxBytes
+        self.sizeOf = sizeOf
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes = 0
+        self._entries = OrderedDict()
+        self._sizes = {}
+
+    def get(self, key, default=None):
+        value = self._entries.get(key, _MISSING)
+        if value is _MISSING:
+            self.misses += 1
+            return default
+        self.hits += 1
+        if self.maxEntries is not None or self.maxBytes is not None:
+            self._touch(key, value)
+        return value
+
+    def _touch(self, key, value):
+        try:
+            self._entries.move_to_end(key)
+        except AttributeError:  # Py2
+            del self._entries[key]
+            self._entries[key] = value
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.pop(key, None)
+        if self.maxBytes is not None:
+            size = self.sizeOf(value)
+            if size > self.maxBytes:
+                return
+            self._sizes[key] = size
+            self.bytes += size
+        self._entries[key] = value
+        if self.maxEntries is not None or self.maxBytes is not None:
+            self._shrink()
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def keys(self):
+        return list(self._entries.keys())
+
+    def values(self):
+        return list(self._entries.values())
+
+    def items(self):
+        return list(self._entries.items())
+
+    def pop(self, key, *default):
+        value = self._entries.pop(key, _MISSING)
+        if value is _MISSING:
+            if default:
+                return default[0]
+            raise KeyError(key)
+        self.bytes -= self._sizes.pop(key, 0)
+        return value
+
+    def clear(self):
+        self._entries.clear()
+        self._sizes.clear()
+        self.bytes = 0
+
+    def _shrink(self):
+        entries = self._entries
+        while entries and (
+                (self.maxEntries is not None and len(entries) > self.maxEntries) or
+                (self.maxBytes is not None and self.bytes > self.maxBytes)):
+            key, value = entries.popitem(last=False)
+            self.bytes -= self._sizes.pop(key, 0)
+            self.evictions += 1
+
+
+def objectSize(obj):
+    """
+    Rough size in bytes of a resolved PDF object, for byte-bounded caches:
+    the length of stream data plus a fixed amount for every object, nested
+    direct objects included.
+    """
+    size = 0
+    todo = [obj]
+    while todo:
+        obj = todo.pop()
+        size += 64
+        if isinstance(obj, StreamObject):
+            size += len(getattr(obj, "_data", None) or b"")
+        if isinstance(obj, DictionaryObject):
+            todo.extend(dict.values(obj))
+        elif isinstance(obj, ArrayObject):
+            todo.extend(obj)
+    return size
+
+
+class ObjectCache(LRUCache):
+    """
+    Cache of the indirect objects resolved by a
+    :class:`PdfFileReader<PyPDF2.PdfFileReader>`, keyed by (generation,
+    object number).  By default it is unbounded and keeps every object for
+    the life of the reader.
+
+    Bounds work as for :class:`LRUCache`, with sizes estimated by
+    :func:`objectSize`.  An evicted object is read from the file again the
+    next time it is needed, as a new object, so changes made to the old one
+    are not seen.
+
+    With ``weakPageTree``, page and page tree node dictionaries are only
+    held through weak references: they stay cached while something else
+    uses them and do not count against the bounds.
+    """
+    def __init__(self, maxEntries=None, maxBytes=None, sizeOf=objectSize,
+                 weakPageTree=False):
+        LRUCache.__init__(self, maxEntries, maxBytes, sizeOf)
+        self.weakPageTree = weakPageTree
+        self._weak = weakref.WeakValueDictionary()
+
+    def get(self, key, default=None):
+        value = self._entries.get(key, _MISSING)
+        if value is _MISSING and self._weak:
+            value = self._weak.get(key, _MISSING)
+            if value is not _MISSING:
+                self.hits += 1
+                return value
+        if value is _MISSING:
+            self.misses += 1
+            return default
+        self.hits += 1
+        if self.maxEntries is not None or self.maxBytes is not None:
+            self._touch(key, value)
+        return value
+
+    def __setitem__(self, key, value):
+        if self.weakPageTree and isinstance(value, DictionaryObject) and \
+                dict.get(value, "/Type") in ("/Page", "/Pages"):
+            self.pop(key, None)
+            self._weak[key] = value
+        else:
+            self._weak.pop(key, None)
+            LRUCache.__setitem__(self, key, value)
+
+    def __contains__(self, key):
+        return key in self._entries or key in self._weak
+
+    def __len__(self):
+        return len(self._entries) + len(self._weak)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def keys(self):
+        return list(self._entries.keys()) + list(self._weak.keys())
+
+    def values(self):
+        return list(self._entries.values()) + list(self._weak.values())
+
+    def items(self):
+        return list(self._entries.items()) + list(self._weak.items())
+
+    def pop(self, key, *default):
+        value = self._weak.pop(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        return LRUCache.pop(self, key, *default)
+
+    def clear(self):
+        LRUCache.clear(self)
+        self._weak.clear()
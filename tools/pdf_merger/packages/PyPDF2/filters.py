@@ -34,13 +34,14 @@ Implementation of stream filters for PDF.
 __author__ = "Mathieu Fenniak"
 __author_email__ = "biziqe@mathieu.fenniak.net"
 
-from .utils import PdfReadError, ord_, chr_
+import re
+from binascii import hexlify, unhexlify
+from .utils import PdfReadError, ord_, chr_, b_, _toInt, _fromInt
 from sys import version_info
 if version_info < ( 3, 0 ):
     from cStringIO import StringIO
 else:
     from io import StringIO
-    import struct
 
 try:
     import zlib
@@ -48,8 +49,21 @@ try:
     def decompress(data):
         return zlib.decompress(data)
 
-    def compress(data):
-        return zlib.compress(data)
+    def compress(data, level=-1):
+        return zlib.compress(data, level)
+
+    def _inflate(chunks, chunkSize):
+        # decompresses the data coming in chunks, chunkSize bytes at a time
+        decompressor = zlib.decompressobj()
+        for chunk in chunks:
+            while chunk:
+                data = decompressor.decompress(chunk, chunkSize)
+                chunk = decompressor.unconsumed_tail
+                if data:
+                    yield data
+        data = decompressor.flush()
+        if data:
+            yield data
 
 except ImportError:
     # Unable to import zlib.  Attempt to use the System.IO.Compression
@@ -93,7 +107,8 @@ except ImportError:
         gz.Close()
         return retval
 
-    def compress(data):
+    def compress(data, level=-1):
+        # DeflateStream has no compression levels
         bytes = _string_to_bytearr(data)
         ms = IO.MemoryStream()
         gz = IO.Compression.DeflateStream(ms, IO.Compression.CompressionMode.Compress, True)
@@ -105,258 +120,576 @@ except ImportError:
         ms.Close()
         return retval
 
+    def _inflate(chunks, chunkSize):
+        yield decompress(b_("").join(chunks))
+
+
+# runs of equal bytes, used to find rows that share a PNG filter type
+_RUNS = re.compile(b"(.)\\1*", re.S)
+
+
+def _prefixSums(data, stride, period=None):
+    """
+    Returns the running sums, modulo 256, of the bytes of data taken stride
+    bytes apart: every byte gets the sum of those before it added to it.
+    With period, the sums start over every period bytes.
+
+    All bytes are added at once, as digits of one big integer: each step
+    adds the bytes a growing distance back, masking out the carries
+    between bytes, so ``log2(period / stride)`` big integer operations do
+    the work of a loop over every byte.
+    """
+    length = len(data)
+    period = period or length
+    value = _toInt(data)
+    low = _toInt(b"\x7f" * length)
+    high = _toInt(b"\x80" * length)
+    shift = stride
+    while shift < period:
+        if period == length:
+            # only what is shifted out at the top has to go
+            mask = (1 << 8 * length) - 1
+        else:
+            mask = _toInt((b"\x00" * shift + b"\xff" * (period - shift)) *
+                          (length // period))
+        moved = value << 8 * shift & mask
+        value = ((value & low) + (moved & low)) ^ ((value ^ moved) & high)
+        shift *= 2
+    return _fromInt(value, length)
+
+
+def _pngAverage(out, width, bpp, first, last):
+    # every byte depends on the one just decoded to its left, so there is
+    # nothing to do but go through them one by one
+    for r in range(first, last):
+        start = r * width
+        for i in range(start, start + width):
+            left = out[i - bpp] if i - start >= bpp else 0
+            out[i] = (out[i] + ((left + out[i - width]) >> 1)) & 0xFF
+
+
+def _pngPaeth(out, width, bpp, first, last):
+    for r in range(first, last):
+        start = r * width
+        for i in range(start, start + width):
+            if i - start >= bpp:
+                a = out[i - bpp]
+                c = out[i - bpp - width]
+            else:
+                a = c = 0
+            b = out[i - width]
+            p = a + b - c
+            pa = abs(p - a)
+            pb = abs(p - b)
+            pc = abs(p - c)
+            if pa <= pb and pa <= pc:
+                out[i] = (out[i] + a) & 0xFF
+            elif pb <= pc:
+                out[i] = (out[i] + b) & 0xFF
+            else:
+                out[i] = (out[i] + c) & 0xFF
+
+
+def _pngUnpredict(data, columns, colors, bitsPerComponent, previous=None):
+    """
+    Undoes PNG prediction (predictors 10 to 15), where every row starts
+    with a byte giving the filter type used for it.  previous is the
+    decoded row above the first one, when data carries on from earlier
+    rows.
+
+    Rows are handled in runs of the same filter type.  Sub and Up are
+    running sums along a row or down the columns, done for all the rows of
+    a run at once by _prefixSums().  Average and Paeth depend on the byte
+    just decoded in a non-linear way and go byte by byte.
+    """
+    data = bytearray(data)
+    # bytes per pixel, rounded up: the left neighbour of a byte is this far
+    # back
+    bpp = max(1, (colors * bitsPerComponent + 7) // 8)
+    width = (colors * bitsPerComponent * columns + 7) // 8
+    rowlength = width + 1
+    assert len(data) % rowlength == 0
+    rows = len(data) // rowlength
+    # the row above, all zeros at the start, followed by the data without
+    # the filter type bytes
+    out = bytearray(previous or width) + bytearray(rows * width)
+    if width < rows:
+        for j in range(width):
+            out[width + j::width] = data[j + 1::rowlength]
+    else:
+        for r in range(rows):
+            out[(r + 1) * width:(r + 2) * width] = \
+                data[r * rowlength + 1:(r + 1) * rowlength]
+    for run in _RUNS.finditer(bytes(data[0::rowlength])):
+        first, last = run.start(), run.end()
+        filterByte = data[first * rowlength]
+        # rows of data are one further down in out
+        start, end = (first + 1) * width, (last + 1) * width
+        if filterByte == 0:
+            pass
+        elif filterByte == 1:
+            out[start:end] = _prefixSums(out[start:end], bpp, width)
+        elif filterByte == 2:
+            out[start - width:end] = _prefixSums(out[start - width:end], width)
+        elif filterByte == 3:
+            _pngAverage(out, width, bpp, first + 1, last + 1)
+        elif filterByte == 4:
+            _pngPaeth(out, width, bpp, first + 1, last + 1)
+        else:
+            # unsupported PNG filter
+            raise PdfReadError("Unsupported PNG filter %r" % filterByte)
+    return bytes(out[width:])
+
+
+def _tiffUnpredict(data, columns, colors, bitsPerComponent):
+    """
+    Undoes TIFF predictor 2: every component is stored as the difference
+    from the same component of the pixel to its left.
+    """
+    if bitsPerComponent != 8:
+        raise PdfReadError("Unsupported TIFF predictor bits per component %r"
+                           % bitsPerComponent)
+    width = colors * columns
+    end = len(data) // width * width
+    return _prefixSums(data[:end], colors, width) + bytes(data[end:])
+
+
+def _predictorParms(decodeParms):
+    # returns the predictor, columns, colors and bits per component
+    predictor = 1
+    if decodeParms:
+        try:
+            predictor = decodeParms.get("/Predictor", 1)
+        except AttributeError:
+            pass    # usually an array with a null object was read
+    if predictor == 1:
+        return predictor, None, None, None
+    columns = decodeParms["/Columns"]
+    colors = decodeParms["/Colors"] if "/Colors" in decodeParms else 1
+    bitsPerComponent = decodeParms["/BitsPerComponent"] \
+        if "/BitsPerComponent" in decodeParms else 8
+    if not (predictor >= 10 and predictor <= 15 or predictor == 2):
+        # unsupported predictor
+        raise PdfReadError("Unsupported flatedecode predictor %r" % predictor)
+    return predictor, columns, colors, bitsPerComponent
+
+
+def _unpredict(data, decodeParms):
+    predictor, columns, colors, bitsPerComponent = _predictorParms(decodeParms)
+    # predictor 1 == no predictor
+    # PNG prediction:
+    if predictor >= 10 and predictor <= 15:
+        data = _pngUnpredict(data, columns, colors, bitsPerComponent)
+    # TIFF prediction:
+    elif predictor == 2:
+        data = _tiffUnpredict(data, columns, colors, bitsPerComponent)
+    return data
+
 
 class FlateDecode(object):
     def decode(data, decodeParms):
-        data = decompress(data)
-        predictor = 1
-        if decodeParms:
-            try:
-                predictor = decodeParms.get("/Predictor", 1)
-            except AttributeError:
-                pass    # usually an array with a null object was read
+        return _unpredict(decompress(data), decodeParms)
+    decode = staticmethod(decode)
 
-        # predictor 1 == no predictor
-        if predictor != 1:
-            columns = decodeParms["/Columns"]
-            # PNG prediction:
-            if predictor >= 10 and predictor <= 15:
-                output = StringIO()
-                # PNG prediction can vary from row to row
-                rowlength = columns + 1
-                assert len(data) % rowlength == 0
-                prev_rowdata = (0,) * rowlength
-                for row in range(len(data) // rowlength):
-                    rowdata = [ord_(x) for x in data[(row*rowlength):((row+1)*rowlength)]]
-                    filterByte = rowdata[0]
-                    if filterByte == 0:
-                        pass
-                    elif filterByte == 1:
-                        for i in range(2, rowlength):
-                            rowdata[i] = (rowdata[i] + rowdata[i-1]) % 256
-                    elif filterByte == 2:
-                        for i in range(1, rowlength):
-                            rowdata[i] = (rowdata[i] + prev_rowdata[i]) % 256
-                    else:
-                        # unsupported PNG filter
-                        raise PdfReadError("Unsupported PNG filter %r" % filterByte)
-                    prev_rowdata = rowdata
-                    output.write(''.join([chr(x) for x in rowdata[1:]]))
-                data = output.getvalue()
+    def iterDecode(chunks, decodeParms, chunkSize):
+        """
+        Decodes data coming in chunks, yielding the decoded data in pieces
+        of about chunkSize bytes as it goes.  Predictors are undone a
+        number of whole rows at a time.
+        """
+        predictor, columns, colors, bitsPerComponent = _predictorParms(decodeParms)
+        if predictor == 1:
+            for data in _inflate(chunks, chunkSize):
+                yield data
+            return
+        if predictor == 2:
+            rowlength = (colors * bitsPerComponent * columns + 7) // 8
+        else:
+            rowlength = (colors * bitsPerComponent * columns + 7) // 8 + 1
+        pending = bytearray()
+        previous = None
+        for data in _inflate(chunks, chunkSize):
+            pending += data
+            end = len(pending) // rowlength * rowlength
+            if not end:
+                continue
+            if predictor == 2:
+                yield _tiffUnpredict(pending[:end], columns, colors, bitsPerComponent)
             else:
-                # unsupported predictor
-                raise PdfReadError("Unsupported flatedecode predictor %r" % predictor)
-        return data
-    decode = staticmethod(decode)
+                data = _pngUnpredict(pending[:end], columns, colors,
+                                     bitsPerComponent, previous)
+                previous = data[-(rowlength - 1):]
+                yield data
+            del pending[:end]
+        if pending:
+            if predictor == 2:
+                yield bytes(pending)
+            else:
+                yield _pngUnpredict(pending, columns, colors, bitsPerComponent, previous)
+    iterDecode = staticmethod(iterDecode)
 
-    def encode(data):
-        return compress(data)
+    def encode(data, level=-1):
+        """
+        Compresses data, at the zlib compression level given (0 to 9, the
+        default of -1 being 6).
+        """
+        return compress(data, level)
     encode = staticmethod(encode)
 
 
+def _asBytes(data):
+    if isinstance(data, memoryview):
+        return data.tobytes()
+    if isinstance(data, bytearray):
+        return bytes(data)
+    return b_(data)
+
+
+# white-space characters, as listed in section 7.2.2 of the PDF Reference
+_WHITESPACE = b"\x00\t\n\x0c\r "
+
+
 class ASCIIHexDecode(object):
     def decode(data, decodeParms=None):
-        retval = ""
-        char = ""
-        x = 0
-        while True:
-            c = data[x]
-            if c == ">":
-                break
-            elif c.isspace():
-                x += 1
-                continue
-            char += c
-            if len(char) == 2:
-                retval += chr(int(char, base=16))
-                char = ""
-            x += 1
-        assert char == ""
-        return retval
+        data = _asBytes(data)
+        end = data.find(b">")
+        if end != -1:
+            data = data[:end]
+        data = data.translate(None, _WHITESPACE)
+        if len(data) % 2:
+            # a missing last digit is taken to be 0
+            data += b"0"
+        try:
+            return unhexlify(data)
+        except (TypeError, ValueError):
+            raise PdfReadError("Invalid character in ASCIIHexDecode stream")
     decode = staticmethod(decode)
 
+    def encode(data):
+        return hexlify(_asBytes(data)).upper() + b">"
+    encode = staticmethod(encode)
+
 
 class LZWDecode(object):
-    """Taken from:
-    http://www.java2s.com/Open-Source/Java-Document/PDF/PDF-Renderer/com/sun/pdfview/decode/LZWDecode.java.htm
     """
-    class decoder(object):
-        def __init__(self, data):
-            self.STOP=257
-            self.CLEARDICT=256
-            self.data=data
-            self.bytepos=0
-            self.bitpos=0
-            self.dict=[""]*4096
-            for i in range(256):
-                self.dict[i]=chr(i)
-            self.resetDict()
-
-        def resetDict(self):
-            self.dictlen=258
-            self.bitspercode=9
-
-        def nextCode(self):
-            fillbits=self.bitspercode
-            value=0
-            while fillbits>0 :
-                if self.bytepos >= len(self.data):
-                    return -1
-                nextbits=ord(self.data[self.bytepos])
-                bitsfromhere=8-self.bitpos
-                if bitsfromhere>fillbits:
-                    bitsfromhere=fillbits
-                value |= (((nextbits >> (8-self.bitpos-bitsfromhere)) &
-                           (0xff >> (8-bitsfromhere))) <<
-                          (fillbits-bitsfromhere))
-                fillbits -= bitsfromhere
-                self.bitpos += bitsfromhere
-                if self.bitpos >=8:
-                    self.bitpos=0
-                    self.bytepos = self.bytepos+1
-            return value
-
-        def decode(self):
-            """ algorithm derived from:
-            http://www.rasip.fer.hr/research/compress/algorithms/fund/lz/lzw.html
-            and the PDFReference
-            """
-            cW = self.CLEARDICT;
-            baos=""
-            while True:
-                pW = cW;
-                cW = self.nextCode();
-                if cW == -1:
-                    raise PdfReadError("Missed the stop code in LZWDecode!")
-                if cW == self.STOP:
-                    break;
-                elif cW == self.CLEARDICT:
-                    self.resetDict();
-                elif pW == self.CLEARDICT:
-                    baos+=self.dict[cW]
-                else:
-                    if cW < self.dictlen:
-                        baos += self.dict[cW]
-                        p=self.dict[pW]+self.dict[cW][0]
-                        self.dict[self.dictlen]=p
-                        self.dictlen+=1
-                    else:
-                        p=self.dict[pW]+self.dict[pW][0]
-                        baos+=p
-                        self.dict[self.dictlen] = p;
-                        self.dictlen+=1
-                    if (self.dictlen >= (1 << self.bitspercode) - 1 and
-                        self.bitspercode < 12):
-                        self.bitspercode+=1
-            return baos
-
-    @staticmethod
-    def decode(data,decodeParams=None):
-        return LZWDecode.decoder(data).decode()
+    Decodes data compressed with the LZW (Lempel-Ziv-Welch) method, as
+    described in section 7.4.4 of the PDF Reference.
+    """
+    CLEARDICT = 256
+    STOP = 257
 
+    # the single byte strings every table starts with
+    _ROOTS = [bytes(bytearray([i])) for i in range(256)]
 
-class ASCII85Decode(object):
-    def decode(data, decodeParms=None):
-        if version_info < ( 3, 0 ):
-            retval = ""
-            group = []
-            x = 0
-            hitEod = False
-            # remove all whitespace from data
-            data = [y for y in data if not (y in ' \n\r\t')]
-            while not hitEod:
-                c = data[x]
-                if len(retval) == 0 and c == "<" and data[x+1] == "~":
-                    x += 2
-                    continue
-                #elif c.isspace():
-                #    x += 1
-                #    continue
-                elif c == 'z':
-                    assert len(group) == 0
-                    retval += '\x00\x00\x00\x00'
-                    x += 1
+    def decode(data, decodeParams=None):
+        """
+        Codes are taken off a bit buffer refilled a byte at a time; as
+        codes are at least 9 bits long, every byte completes at most one.
+        The table is preallocated for all 4096 codes and holds each entry
+        as a byte string, built from the entry of its prefix code and the
+        suffix byte, so that output is extended an entry at a time.
+
+        :param decodeParams: may give ``/EarlyChange`` (1 by default) and a
+            ``/Predictor`` as for FlateDecode.
+        """
+        earlyChange = 1
+        if decodeParams:
+            try:
+                earlyChange = decodeParams.get("/EarlyChange", 1)
+            except AttributeError:
+                pass    # usually an array with a null object was read
+        table = LZWDecode._ROOTS + [None] * (4096 - 256)
+        out = bytearray()
+        nextCode = 258
+        codeLength = 9
+        # the code count at which the next code is one bit longer
+        limit = (1 << codeLength) - earlyChange
+        prefix = None
+        buf = bits = 0
+        for byte in bytearray(data):
+            buf = (buf << 8) | byte
+            bits += 8
+            if bits < codeLength:
+                continue
+            bits -= codeLength
+            code = buf >> bits
+            buf &= (1 << bits) - 1
+            if code >= 256:
+                if code == LZWDecode.CLEARDICT:
+                    nextCode = 258
+                    codeLength = 9
+                    limit = (1 << codeLength) - earlyChange
+                    prefix = None
                     continue
-                elif c == "~" and data[x+1] == ">":
-                    if len(group) != 0:
-                        # cannot have a final group of just 1 char
-                        assert len(group) > 1
-                        cnt = len(group) - 1
-                        group += [ 85, 85, 85 ]
-                        hitEod = cnt
-                    else:
-                        break
-                else:
-                    c = ord(c) - 33
-                    assert c >= 0 and c < 85
-                    group += [ c ]
-                if len(group) >= 5:
-                    b = group[0] * (85**4) + \
-                        group[1] * (85**3) + \
-                        group[2] * (85**2) + \
-                        group[3] * 85 + \
-                        group[4]
-                    assert b < (2**32 - 1)
-                    c4 = chr((b >> 0) % 256)
-                    c3 = chr((b >> 8) % 256)
-                    c2 = chr((b >> 16) % 256)
-                    c1 = chr(b >> 24)
-                    retval += (c1 + c2 + c3 + c4)
-                    if hitEod:
-                        retval = retval[:-4+hitEod]
-                    group = []
-                x += 1
-            return retval
-        else:
-            if isinstance(data, str):
-                data = data.encode('ascii')
-            n = b = 0
-            out = bytearray()
-            for c in data:
-                if ord('!') <= c and c <= ord('u'):
-                    n += 1
-                    b = b*85+(c-33)
-                    if n == 5:
-                        out += struct.pack(b'>L',b)
-                        n = b = 0
-                elif c == ord('z'):
-                    assert n == 0
-                    out += b'\0\0\0\0'
-                elif c == ord('~'):
-                    if n:
-                        for _ in range(5-n):
-                            b = b*85+84
-                        out += struct.pack(b'>L',b)[:n-1]
+                if code == LZWDecode.STOP:
                     break
-            return bytes(out)
+            if code < nextCode:
+                entry = table[code]
+            elif code == nextCode and prefix is not None:
+                entry = prefix + prefix[:1]
+            else:
+                raise PdfReadError("Invalid LZW code %d" % code)
+            if prefix is not None and nextCode < 4096:
+                table[nextCode] = prefix + entry[:1]
+                nextCode += 1
+                if nextCode >= limit and codeLength < 12:
+                    codeLength += 1
+                    limit = (1 << codeLength) - earlyChange
+            out += entry
+            prefix = entry
+        else:
+            raise PdfReadError("Missed the stop code in LZWDecode!")
+        return _unpredict(bytes(out), decodeParams)
     decode = staticmethod(decode)
 
 
-def decodeStreamData(stream):
+_A85_ALPHABET = bytes(bytearray(range(33, 118)))
+# character to digit and digit to character tables
+_A85_DIGITS = bytes(bytearray((c - 33) % 256 for c in range(256)))
+_A85_CHARS = bytes(bytearray((c + 33) % 256 for c in range(256)))
+# digit values that come out as "z" and as nothing at all in _a85encode
+_A85_Z = ord("z") - 33
+_A85_SKIP = 200
+
+
+def _a85decode(data):
+    """
+    Decodes ASCII85 digits, without white-space, delimiters or ``z``.
+
+    All groups of five digits are converted at once, as 5 byte slots of one
+    big integer: the digits of every group are gathered into the low bytes
+    of the slots with extended slices and combined by Horner's rule, which
+    never carries from one slot into the next as ``85 ** 5 < 2 ** 40``.
+    """
+    if data.translate(None, _A85_ALPHABET):
+        raise PdfReadError("Invalid character in ASCII85Decode stream")
+    tail = len(data) % 5
+    if tail == 1:
+        raise PdfReadError("ASCII85Decode stream ends in a single digit")
+    if tail:
+        data += b"u" * (5 - tail)
+    count = len(data) // 5
+    if not count:
+        return b""
+    digits = data.translate(_A85_DIGITS)
+    slots = bytearray(5 * count)
+    value = 0
+    for k in range(5):
+        slots[0::5] = digits[k::5]
+        value = value * 85 + _toInt(slots)
+    slots = _fromInt(value, 5 * count)
+    if slots[4::5].count(b"\x00") != count:
+        raise PdfReadError("Invalid group in ASCII85Decode stream")
+    out = bytearray(4 * count)
+    for k in range(4):
+        out[k::4] = slots[3 - k::5]
+    if tail:
+        del out[tail - 5:]
+    return bytes(out)
+
+
+def _a85encode(data):
+    """
+    Encodes data as ASCII85 digits, without white-space or delimiters.
+
+    As in _a85decode, all 4 byte groups are worked on at once, in 8 byte
+    slots of one big integer; the digits come off as remainders of a
+    division by 85 done as a multiplication by its reciprocal, exact for
+    32 bit values.  Groups of zeros fold into a ``z``.
+    """
+    count, tail = divmod(len(data), 4)
+    if tail:
+        data += b"\x00" * (4 - tail)
+        count += 1
+    if not count:
+        return b""
+    slots = bytearray(8 * count)
+    for k in range(4):
+        slots[3 - k::8] = data[k::4]
+    value = _toInt(slots)
+    low26 = _toInt(b"\xff\xff\xff\x03\x00\x00\x00\x00" * count)
+    zero = 0
+    if b"\x00\x00\x00\x00" in data:
+        # 1 in the slots of all-zero groups, leaving out a partial last group
+        one = _toInt(b"\x01\x00\x00\x00\x00\x00\x00\x00" * count)
+        zero = one - (((value + one * 0xffffffff) >> 32) & one)
+        if tail:
+            zero &= (1 << 64 * (count - 1)) - 1
+    skip = zero * _A85_SKIP
+    digits = []
+    for k in range(4):
+        quotient = ((value * 3233857729) >> 38) & low26
+        digits.append(value - quotient * 85 + skip)
+        value = quotient
+    digits.append(value + zero * _A85_Z)
+    out = bytearray(5 * count)
+    for k in range(5):
+        out[k::5] = _fromInt(digits[4 - k], 8 * count)[0::8]
+    if tail:
+        del out[tail - 4:]
+    return bytes(out).translate(_A85_CHARS, bytes(bytearray([_A85_SKIP])))
+
+
+class ASCII85Decode(object):
+    def decode(data, decodeParms=None):
+        data = _asBytes(data).translate(None, _WHITESPACE)
+        # the prefix goes first, as "<~>" is not the end of "<~>..."
+        if data.startswith(b"<~"):
+            data = data[2:]
+        end = data.find(b"~>")
+        if end != -1:
+            data = data[:end]
+        if b"z" in data:
+            data = data.replace(b"z", b"!!!!!")
+        return _a85decode(data)
+    decode = staticmethod(decode)
+
+    def encode(data):
+        return _a85encode(_asBytes(data)) + b"~>"
+    encode = staticmethod(encode)
+
+
+class Passthrough(object):
+    """
+    Codec for filters whose data is never decoded, such as those of images:
+    decoding a stream stops at the first of them, and the data comes out
+    still encoded with it and any filters after it.  Such streams are copied
+    to the output as they were read.
+    """
+    def decode(data, decodeParms=None):
+        return data
+    decode = staticmethod(decode)
+
+
+class CryptFilter(object):
+    """
+    Codec for the /Crypt filter.  Only the /Identity crypt filter, which is
+    used when /DecodeParms names none, is supported; it leaves the data as
+    it is.  Streams are decrypted as a whole with the document's default
+    crypt filter when they are read.
+    """
+    def decode(data, decodeParms=None):
+        name = "/Identity"
+        if decodeParms:
+            name = decodeParms.get("/Name", name)
+        if name != "/Identity":
+            raise NotImplementedError("/Crypt filter with /Name %s not supported yet" % name)
+        return data
+    decode = staticmethod(decode)
+
+
+# codecs by filter name
+_FILTERS = {}
+
+
+def registerFilter(codec, *names):
+    """
+    Registers a codec for the filters of the given names (usually a full name
+    and its abbreviation, like ``"/FlateDecode"`` and ``"/Fl"``), replacing
+    the codec they had.
+
+    A codec has a ``decode(data, decodeParms)`` static method returning the
+    decoded data, and may have an ``iterDecode(chunks, decodeParms,
+    chunkSize)`` one that decodes a stream incrementally, as
+    :class:`FlateDecode` does.  Registering :class:`Passthrough` leaves data
+    encoded with the filters alone; this is how image filters are set up.
+    """
+    for name in names:
+        _FILTERS[name] = codec
+
+
+registerFilter(FlateDecode, "/FlateDecode", "/Fl")
+registerFilter(ASCIIHexDecode, "/ASCIIHexDecode", "/AHx")
+registerFilter(LZWDecode, "/LZWDecode", "/LZW")
+registerFilter(ASCII85Decode, "/ASCII85Decode", "/A85")
+registerFilter(CryptFilter, "/Crypt")
+registerFilter(Passthrough, "/DCTDecode", "/DCT", "/JPXDecode",
+               "/CCITTFaxDecode", "/CCF", "/JBIG2Decode")
+
+
+def _streamFilters(stream):
     from .generic import NameObject
     filters = stream.get("/Filter", ())
     if len(filters) and not isinstance(filters[0], NameObject):
         # we have a single filter instance
         filters = (filters,)
+    return filters
+
+
+def _decodingSteps(stream):
+    """
+    Returns the codec and decode parameters of each filter of the stream to
+    be decoded, stopping short of the first passthrough filter.
+    """
+    from .generic import ArrayObject
+    decodeParms = stream.get("/DecodeParms")
+    steps = []
+    for i, filterType in enumerate(_streamFilters(stream)):
+        codec = _FILTERS.get(filterType)
+        if codec is None:
+            # unsupported filter
+            raise NotImplementedError("unsupported filter %s" % filterType)
+        if codec is Passthrough:
+            break
+        if isinstance(decodeParms, ArrayObject):
+            # one entry per filter, null for the defaults
+            parms = decodeParms[i].getObject() if i < len(decodeParms) else None
+        else:
+            parms = decodeParms
+        steps.append((codec, parms))
+    return steps
+
+
+def isPassthrough(stream):
+    """
+    Tells whether the data of the stream stays encoded, in part at least,
+    when it is decoded.
+    """
+    return any(_FILTERS.get(filterType) is Passthrough
+               for filterType in _streamFilters(stream))
+
+
+def decodeStreamData(stream):
     data = stream._data
     # If there is not data to decode we should not try to decode the data.
     if data:
-        for filterType in filters:
-            if filterType == "/FlateDecode" or filterType == "/Fl":
-                data = FlateDecode.decode(data, stream.get("/DecodeParms"))
-            elif filterType == "/ASCIIHexDecode" or filterType == "/AHx":
-                data = ASCIIHexDecode.decode(data)
-            elif filterType == "/LZWDecode" or filterType == "/LZW":
-                data = LZWDecode.decode(data, stream.get("/DecodeParms"))
-            elif filterType == "/ASCII85Decode" or filterType == "/A85":
-                data = ASCII85Decode.decode(data)
-            elif filterType == "/Crypt":
-                decodeParams = stream.get("/DecodeParams", {})
-                if "/Name" not in decodeParams and "/Type" not in decodeParams:
-                    pass
-                else:
-                    raise NotImplementedError("/Crypt filter with /Name or /Type not supported yet")
-            else:
-                # unsupported filter
-                raise NotImplementedError("unsupported filter %s" % filterType)
+        for codec, decodeParms in _decodingSteps(stream):
+            data = codec.decode(data, decodeParms)
+        if isinstance(data, memoryview):
+            # passed through, straight from a memory-mapped input file
+            data = data.tobytes()
     return data
+
+
+def _iterChunks(data, chunkSize):
+    for start in range(0, len(data), chunkSize):
+        chunk = data[start:start + chunkSize]
+        if isinstance(chunk, memoryview):
+            chunk = chunk.tobytes()
+        yield chunk
+
+
+def _iterDecodeWhole(codec, chunks, decodeParms, chunkSize):
+    # for codecs that have to see all of their input at once
+    data = codec.decode(b_("").join(chunks), decodeParms)
+    for chunk in _iterChunks(data, chunkSize):
+        yield chunk
+
+
+def iterDecodeStreamData(stream, chunkSize):
+    """
+    Like decodeStreamData(), but yields the decoded data in pieces of about
+    chunkSize bytes.  Codecs that can, like FlateDecode, work through the
+    stream incrementally, so a stream made up of those alone is never held
+    in memory as a whole; other filters decode all of their input in one go.
+    """
+    data = stream._data
+    if not data:
+        return iter(())
+    chunks = _iterChunks(data, chunkSize)
+    for codec, decodeParms in _decodingSteps(stream):
+        if hasattr(codec, "iterDecode"):
+            chunks = codec.iterDecode(chunks, decodeParms, chunkSize)
+        else:
+            chunks = _iterDecodeWhole(codec, chunks, decodeParms, chunkSize)
+    return chunks
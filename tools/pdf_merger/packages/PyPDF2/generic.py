@@ -35,14 +35,15 @@ __author__ = "Mathieu Fenniak"
 __author_email__ = "biziqe@mathieu.fenniak.net"
 
 import re
-from .utils import readNonWhitespace, RC4_encrypt, skipOverComment
+from .utils import readNonWhitespace, skipOverComment
 from .utils import b_, u_, chr_, ord_
 from .utils import PdfStreamError
 import warnings
 from . import filters
+from . import security
 from . import utils
-import decimal
 import codecs
+import binascii
 import sys
 #import debugging
 
@@ -50,8 +51,49 @@ ObjectPrefix = b_('/<[tf(n%')
 NumberSigns = b_('+-')
 IndirectPattern = re.compile(b_(r"(\d+)\s+(\d+)\s+R[^a-zA-Z]"))
 
+# Patterns used by the buffer-based parsers.  WhitespacePattern skips the
+# same bytes as utils.readNonWhitespace, SpacePattern those accepted by
+# bytes.isspace().  _primitiveTokens matches indirect references, numbers
+# and names, which can be built straight from a single match; the reference
+# and number alternatives follow IndirectPattern and NumberObject.NumberPattern.
+_primitiveTokens = (r"(?P<ref>(?P<idnum>\d+)\s+(?P<gen>\d+)\s+R)(?=[^a-zA-Z])"
+                    r"|(?P<num>[+\-.0-9,]+)(?=[^+\-.0-9,])"
+                    r"|(?P<name>/[^\s()<>\[\]{}/%]*)")
+TokenPattern = re.compile(b_(_primitiveTokens))
+# a dictionary key name, and its value if that is a primitive token
+DictEntryPattern = re.compile(b_(
+    r"[ \n\r\t\x00]*(?P<key>/[^\s()<>\[\]{}/%]*)[ \n\r\t\x00]*"
+    r"(?:" + _primitiveTokens + r")?"))
+# content streams additionally have operators, and skip leading whitespace
+ContentTokenPattern = re.compile(b_(
+    r"[ \n\r\t\x00]*(?:" + _primitiveTokens +
+    r"|(?P<op>[A-Za-z'\"][^\s()<>\[\]{}/%]*))?"))
+WhitespacePattern = re.compile(b_(r"[ \n\r\t\x00]*"))
+SpacePattern = re.compile(b_(r"[ \t\n\r\x0b\x0c]*"))
+CommentPattern = re.compile(b_(r"%[^\r\n]*[\r\n]?"))
+StringRunPattern = re.compile(b_(r"[^()\\]*"))
+DigitsPattern = re.compile(b_(r"[0-9]*"))
+HexWhitespace = b_(" \n\r\t\x00")
+# byte constants for the hot loops of the buffer-based parsers
+DictStart = b_("<<")
+ArrayStart, ArrayEnd = b_("["), b_("]")
+StringStart, StringEnd = b_("("), b_(")")
+CommentStart = b_("%")
+StreamKeyword, EndstreamKeyword = b_("stream"), b_("endstream")
+# byte constants of the writeToStream methods
+NullBytes, TrueBytes, FalseBytes = b_("null"), b_("true"), b_("false")
+Space, Newline = b_(" "), b_("\n")
+DictOpen, DictClose = b_("<<\n"), b_(">>")
+ArrayOpen, ArrayClose = b_("["), b_(" ]")
+StreamOpen, StreamClose = b_("\nstream\n"), b_("\nendstream")
+
 
 def readObject(stream, pdf):
+    buf = utils.getStreamBuffer(stream)
+    if buf is not None:
+        obj, pos = readObjectFromBuffer(buf, stream.tell(), pdf)
+        stream.seek(pos, 0)
+        return obj
     tok = stream.read(1)
     stream.seek(-1, 1) # reset to start
     idx = ObjectPrefix.find(tok)
@@ -98,15 +140,120 @@ def readObject(stream, pdf):
             return NumberObject.readFromStream(stream)
 
 
+def readObjectFromBuffer(buf, pos, pdf):
+    """
+    Buffer-based counterpart of readObject.  Parses the object starting at
+    buf[pos] and returns it together with the position just past its end.
+    buf may be anything that supports slicing and regex matching, i.e.
+    bytes or an mmap.
+    """
+    m = TokenPattern.match(buf, pos)
+    if m is not None:
+        return readTokenObject(buf, m, pdf)
+    tok = buf[pos:pos + 1]
+    idx = ObjectPrefix.find(tok)
+    if idx == 0:
+        return NameObject.readFromBuffer(buf, pos, pdf)
+    elif idx == 1:
+        if buf[pos:pos + 2] == DictStart:
+            return DictionaryObject.readFromBuffer(buf, pos, pdf)
+        else:
+            return readHexStringFromBuffer(buf, pos)
+    elif idx == 2:
+        return ArrayObject.readFromBuffer(buf, pos, pdf)
+    elif idx == 3 or idx == 4:
+        return BooleanObject.readFromBuffer(buf, pos)
+    elif idx == 5:
+        return readStringFromBuffer(buf, pos)
+    elif idx == 6:
+        return NullObject.readFromBuffer(buf, pos)
+    elif idx == 7:
+        # comment
+        pos = CommentPattern.match(buf, pos).end()
+        pos = WhitespacePattern.match(buf, pos).end()
+        return readObjectFromBuffer(buf, pos, pdf)
+    else:
+        # not a valid number either, let NumberObject raise the error
+        return NumberObject.readFromBuffer(buf, pos)
+
+
+def readTokenObject(buf, m, pdf):
+    """
+    Builds the object for a match of TokenPattern (or one of the patterns
+    built from it) and returns it together with the position just past it.
+    """
+    kind = m.lastgroup
+    end = m.end()
+    if kind == 'num':
+        num = m.group(kind)
+        if NumberObject.ByteDot in num:
+            return FloatObject(num), end
+        return NumberObject(num), end
+    elif kind == 'name':
+        return NameObject._decode(m.group(kind), pdf), end
+    elif end - m.start(kind) < 20:
+        # indirect reference, if it fits in the 20 bytes readObject peeks at
+        return sharedReference(int(m.group('idnum')), int(m.group('gen')), pdf), end
+    return NumberObject.readFromBuffer(buf, m.start(kind))
+
+
+def sharedReference(idnum, generation, pdf):
+    """
+    Returns an :class:`IndirectObject` for a reference read from pdf.  A
+    reader keeps the references it has read in its ``_references`` table,
+    and all the references to one object share the first one made.
+    """
+    refs = getattr(pdf, "_references", None)
+    if refs is None:
+        return IndirectObject(idnum, generation, pdf)
+    # keyed by the object number alone for generation 0, saving a tuple per
+    # entry
+    key = idnum if generation == 0 else (idnum, generation)
+    ref = refs.get(key)
+    if ref is None:
+        if len(refs) >= _MAX_SHARED_REFERENCES:
+            # starts over rather than outgrowing a bounded object cache
+            refs.clear()
+        ref = refs[key] = IndirectObject(idnum, generation, pdf)
+    return ref
+
+
 class PdfObject(object):
+    # The objects of a file are many and small, so they have no __dict__;
+    # subclasses that need attributes of their own declare __slots__ for them
+    # or leave them out, getting a __dict__ back.
+    __slots__ = ()
+
+    def __getstate__(self):
+        # the slots along with any __dict__, in the form pickle restores for
+        # all protocols; without it only protocol 2 and later would work
+        slots = {}
+        for cls in type(self).__mro__:
+            for name in cls.__dict__.get("__slots__", ()):
+                if name != "__weakref__" and hasattr(self, name):
+                    slots[name] = getattr(self, name)
+        state = getattr(self, "__dict__", None) or None
+        if slots:
+            return state, slots
+        return state
+
     def getObject(self):
         """Resolves indirect references."""
         return self
 
 
 class NullObject(PdfObject):
+    __slots__ = ()
+
+    def __new__(cls):
+        # there is just the one, made below
+        return _null
+
+    def __reduce__(self):
+        return NullObject, ()
+
     def writeToStream(self, stream, encryption_key):
-        stream.write(b_("null"))
+        stream.write(NullBytes)
 
     def readFromStream(stream):
         nulltxt = stream.read(4)
@@ -115,16 +262,30 @@ class NullObject(PdfObject):
         return NullObject()
     readFromStream = staticmethod(readFromStream)
 
+    def readFromBuffer(buf, pos):
+        if buf[pos:pos + 4] != b_("null"):
+            raise utils.PdfReadError("Could not read Null object")
+        return NullObject(), pos + 4
+    readFromBuffer = staticmethod(readFromBuffer)
+
 
 class BooleanObject(PdfObject):
-    def __init__(self, value):
-        self.value = value
+    __slots__ = ("value",)
+
+    def __new__(cls, value):
+        # there are just the two, made below
+        if value:
+            return _true
+        return _false
+
+    def __reduce__(self):
+        return BooleanObject, (self.value,)
 
     def writeToStream(self, stream, encryption_key):
         if self.value:
-            stream.write(b_("true"))
+            stream.write(TrueBytes)
         else:
-            stream.write(b_("false"))
+            stream.write(FalseBytes)
 
     def readFromStream(stream):
         word = stream.read(4)
@@ -137,16 +298,34 @@ class BooleanObject(PdfObject):
             raise utils.PdfReadError('Could not read Boolean object')
     readFromStream = staticmethod(readFromStream)
 
+    def readFromBuffer(buf, pos):
+        word = buf[pos:pos + 4]
+        if word == b_("true"):
+            return BooleanObject(True), pos + 4
+        elif word == b_("fals"):
+            return BooleanObject(False), min(pos + 5, len(buf))
+        else:
+            raise utils.PdfReadError('Could not read Boolean object')
+    readFromBuffer = staticmethod(readFromBuffer)
+
 
 class ArrayObject(list, PdfObject):
+    __slots__ = ()
+
     def writeToStream(self, stream, encryption_key):
-        stream.write(b_("["))
+        write = stream.write
+        write(ArrayStart)
         for data in self:
-            stream.write(b_(" "))
+            write(Space)
             data.writeToStream(stream, encryption_key)
-        stream.write(b_(" ]"))
+        write(ArrayClose)
 
     def readFromStream(stream, pdf):
+        buf = utils.getStreamBuffer(stream)
+        if buf is not None:
+            arr, pos = ArrayObject.readFromBuffer(buf, stream.tell(), pdf)
+            stream.seek(pos, 0)
+            return arr
         arr = ArrayObject()
         tmp = stream.read(1)
         if tmp != b_("["):
@@ -167,8 +346,23 @@ class ArrayObject(list, PdfObject):
         return arr
     readFromStream = staticmethod(readFromStream)
 
+    def readFromBuffer(buf, pos, pdf):
+        if buf[pos:pos + 1] != ArrayStart:
+            raise utils.PdfReadError("Could not read array")
+        arr = ArrayObject()
+        pos += 1
+        while True:
+            pos = SpacePattern.match(buf, pos).end()
+            if buf[pos:pos + 1] == ArrayEnd:
+                return arr, pos + 1
+            obj, pos = readObjectFromBuffer(buf, pos, pdf)
+            arr.append(obj)
+    readFromBuffer = staticmethod(readFromBuffer)
+
 
 class IndirectObject(PdfObject):
+    __slots__ = ("idnum", "generation", "pdf")
+
     def __init__(self, idnum, generation, pdf):
         self.idnum = idnum
         self.generation = generation
@@ -193,7 +387,7 @@ class IndirectObject(PdfObject):
         return not self.__eq__(other)
 
     def writeToStream(self, stream, encryption_key):
-        stream.write(b_("%s %s R" % (self.idnum, self.generation)))
+        stream.write(b_("%d %d R" % (self.idnum, self.generation)))
 
     def readFromStream(stream, pdf):
         idnum = b_("")
@@ -219,36 +413,48 @@ class IndirectObject(PdfObject):
         r = readNonWhitespace(stream)
         if r != b_("R"):
             raise utils.PdfReadError("Error reading indirect object reference at byte %s" % utils.hexStr(stream.tell()))
-        return IndirectObject(int(idnum), int(generation), pdf)
+        return sharedReference(int(idnum), int(generation), pdf)
     readFromStream = staticmethod(readFromStream)
 
 
-class FloatObject(decimal.Decimal, PdfObject):
+class FloatObject(float, PdfObject):
+    """
+    A real number.  One read from a file keeps the text it was read from,
+    which is what it is written back as; others are written with up to five
+    decimal places.
+    """
+    __slots__ = ("_token",)
+
     def __new__(cls, value="0", context=None):
-        try:
-            return decimal.Decimal.__new__(cls, utils.str_(value), context)
-        except:
-            return decimal.Decimal.__new__(cls, str(value))
+        # context is what the decimal.Decimal based FloatObject of earlier
+        # versions took, and is ignored
+        self = float.__new__(cls, value)
+        if isinstance(value, utils.bytes_type):
+            self._token = value
+        elif isinstance(value, FloatObject):
+            self._token = value._token
+        else:
+            self._token = None
+        return self
 
     def __repr__(self):
-        if self == self.to_integral():
-            return str(self.quantize(decimal.Decimal(1)))
-        else:
-            # Standard formatting adds useless extraneous zeros.
-            o = "%.5f" % self
-            # Remove the zeros.
-            while o and o[-1] == '0':
-                o = o[:-1]
-            return o
+        if self.is_integer():
+            return "%d" % self
+        # Standard formatting adds useless extraneous zeros.
+        return ("%.5f" % self).rstrip("0")
 
     def as_numeric(self):
-        return float(b_(repr(self)))
+        return float(self)
 
     def writeToStream(self, stream, encryption_key):
-        stream.write(b_(repr(self)))
+        token = self._token
+        if token is None:
+            token = b_(repr(self))
+        stream.write(token)
 
 
 class NumberObject(int, PdfObject):
+    __slots__ = ()
     NumberPattern = re.compile(b_('[^+-.0-9]'))
     ByteDot = b_(".")
 
@@ -263,7 +469,10 @@ class NumberObject(int, PdfObject):
         return int(b_(repr(self)))
 
     def writeToStream(self, stream, encryption_key):
-        stream.write(b_(repr(self)))
+        if 0 <= self < _SMALL_NUMBERS:
+            stream.write(_numberBytes[self])
+        else:
+            stream.write(b_("%d" % self))
 
     def readFromStream(stream):
         num = utils.readUntilRegex(stream, NumberObject.NumberPattern)
@@ -273,6 +482,19 @@ class NumberObject(int, PdfObject):
             return NumberObject(num)
     readFromStream = staticmethod(readFromStream)
 
+    def readFromBuffer(buf, pos):
+        m = NumberObject.NumberPattern.search(buf, pos)
+        if m is None:
+            # stream has truncated prematurely
+            raise PdfStreamError("Stream has ended unexpectedly")
+        end = m.start()
+        num = buf[pos:end]
+        if num.find(NumberObject.ByteDot) != -1:
+            return FloatObject(num), end
+        else:
+            return NumberObject(num), end
+    readFromBuffer = staticmethod(readFromBuffer)
+
 
 ##
 # Given a string (either a "str" or "unicode"), create a ByteStringObject or a
@@ -301,6 +523,11 @@ def createStringObject(string):
 
 
 def readHexStringFromStream(stream):
+    buf = utils.getStreamBuffer(stream)
+    if buf is not None:
+        obj, pos = readHexStringFromBuffer(buf, stream.tell())
+        stream.seek(pos, 0)
+        return obj
     stream.read(1)
     txt = ""
     x = b_("")
@@ -322,7 +549,23 @@ def readHexStringFromStream(stream):
     return createStringObject(b_(txt))
 
 
+def readHexStringFromBuffer(buf, pos):
+    end = buf.find(b_(">"), pos + 1)
+    if end == -1:
+        # stream has truncated prematurely
+        raise PdfStreamError("Stream has ended unexpectedly")
+    x = buf[pos + 1:end].translate(None, HexWhitespace)
+    if len(x) % 2:
+        x += b_("0")
+    return createStringObject(binascii.unhexlify(x)), end + 1
+
+
 def readStringFromStream(stream):
+    buf = utils.getStreamBuffer(stream)
+    if buf is not None:
+        obj, pos = readStringFromBuffer(buf, stream.tell())
+        stream.seek(pos, 0)
+        return obj
     tok = stream.read(1)
     parens = 1
     txt = b_("")
@@ -374,6 +617,10 @@ def readStringFromStream(stream):
                     if ntok.isdigit():
                         tok += ntok
                     else:
+                        if ntok:
+                            # not part of the escape, such as the closing
+                            # parenthesis in "(\7)"
+                            stream.seek(-1, 1)
                         break
                 tok = b_(chr(int(tok, base=8)))
             elif tok in b_("\n\r"):
@@ -392,12 +639,78 @@ def readStringFromStream(stream):
     return createStringObject(txt)
 
 
+# Escape sequences understood by readStringFromStream, including the odd or
+# unnecessary ones we have encountered.
+StringEscapes = {
+    b_("n"): b_("\n"), b_("r"): b_("\r"), b_("t"): b_("\t"),
+    b_("b"): b_("\b"), b_("f"): b_("\f"), b_("c"): b_("\\c"),
+}
+for _c in "()/\\ %<>[]#_&$":
+    StringEscapes[b_(_c)] = b_(_c)
+del _c
+
+
+def readStringFromBuffer(buf, pos):
+    """
+    Buffer-based counterpart of readStringFromStream.  Unescaped runs are
+    sliced out in one go; only parentheses and escapes are looked at
+    individually.
+    """
+    pos += 1
+    end = StringRunPattern.match(buf, pos).end()
+    if buf[end:end + 1] == StringEnd:
+        # the common case: no escapes or nested parentheses
+        return createStringObject(buf[pos:end]), end + 1
+    parens = 1
+    parts = []
+    while True:
+        end = StringRunPattern.match(buf, pos).end()
+        if end > pos:
+            parts.append(buf[pos:end])
+            pos = end
+        tok = buf[pos:pos + 1]
+        pos += 1
+        if not tok:
+            # stream has truncated prematurely
+            raise PdfStreamError("Stream has ended unexpectedly")
+        if tok == StringStart:
+            parens += 1
+        elif tok == StringEnd:
+            parens -= 1
+            if parens == 0:
+                break
+        else:
+            # backslash
+            tok = buf[pos:pos + 1]
+            pos += 1
+            if not tok:
+                raise PdfStreamError("Stream has ended unexpectedly")
+            if tok in StringEscapes:
+                tok = StringEscapes[tok]
+            elif tok.isdigit():
+                # up to three octal digits, see readStringFromStream
+                end = DigitsPattern.match(buf, pos, pos + 2).end()
+                tok += buf[pos:end]
+                pos = end
+                tok = b_(chr(int(tok, base=8)))
+            elif tok in b_("\n\r"):
+                # escaped line break, possibly a two character one
+                if buf[pos:pos + 1] in (b_("\n"), b_("\r")):
+                    pos += 1
+                tok = b_('')
+            else:
+                raise utils.PdfReadError(r"Unexpected escaped string: %s" % tok)
+        parts.append(tok)
+    return createStringObject(b_('').join(parts)), pos
+
+
 ##
 # Represents a string object where the text encoding could not be determined.
 # This occurs quite often, as the PDF spec doesn't provide an alternate way to
 # represent strings -- for example, the encryption data stored in files (like
 # /O) is clearly not text, but is still stored in a "String" object.
 class ByteStringObject(utils.bytes_type, PdfObject):
+    __slots__ = ()
 
     ##
     # For compatibility with TextStringObject.original_bytes.  This method
@@ -407,10 +720,8 @@ class ByteStringObject(utils.bytes_type, PdfObject):
     def writeToStream(self, stream, encryption_key):
         bytearr = self
         if encryption_key:
-            bytearr = RC4_encrypt(encryption_key, bytearr)
-        stream.write(b_("<"))
-        stream.write(utils.hexencode(bytearr))
-        stream.write(b_(">"))
+            bytearr = security.encrypt(encryption_key, bytearr)
+        stream.write(b_("<") + binascii.hexlify(bytearr) + b_(">"))
 
 
 ##
@@ -419,8 +730,13 @@ class ByteStringObject(utils.bytes_type, PdfObject):
 # PDFDocEncoding, or contained a UTF-16BE BOM mark to cause UTF-16 decoding to
 # occur.
 class TextStringObject(utils.string_type, PdfObject):
-    autodetect_pdfdocencoding = False
-    autodetect_utf16 = False
+    __slots__ = ("autodetect_pdfdocencoding", "autodetect_utf16")
+
+    def __new__(cls, *args):
+        self = utils.string_type.__new__(cls, *args)
+        self.autodetect_pdfdocencoding = False
+        self.autodetect_utf16 = False
+        return self
 
     ##
     # It is occasionally possible that a text string object gets created where
@@ -451,27 +767,33 @@ class TextStringObject(utils.string_type, PdfObject):
         except UnicodeEncodeError:
             bytearr = codecs.BOM_UTF16_BE + self.encode("utf-16be")
         if encryption_key:
-            bytearr = RC4_encrypt(encryption_key, bytearr)
+            bytearr = security.encrypt(encryption_key, bytearr)
             obj = ByteStringObject(bytearr)
             obj.writeToStream(stream, None)
         else:
-            stream.write(b_("("))
-            for c in bytearr:
-                if not chr_(c).isalnum() and c != b_(' '):
-                    stream.write(b_("\\%03o" % ord_(c)))
-                else:
-                    stream.write(b_(chr_(c)))
-            stream.write(b_(")"))
+            escaped = [_stringEscapes[c] for c in bytearray(bytearr)]
+            stream.write(StringStart + b_("").join(escaped) + StringEnd)
 
 
 class NameObject(str, PdfObject):
+    __slots__ = ()
     delimiterPattern = re.compile(b_(r"\s+|[\(\)<>\[\]{}/%]"))
     surfix = b_("/")
 
     def writeToStream(self, stream, encryption_key):
-        stream.write(b_(self))
+        data = _nameBytes.get(self)
+        if data is None:
+            data = b_(self)
+            if len(_nameBytes) < _NAME_BYTES_SIZE:
+                _nameBytes[self] = data
+        stream.write(data)
 
     def readFromStream(stream, pdf):
+        buf = utils.getStreamBuffer(stream)
+        if buf is not None:
+            name, pos = NameObject.readFromBuffer(buf, stream.tell(), pdf)
+            stream.seek(pos, 0)
+            return name
         debug = False
         if debug: print((stream.tell()))
         name = stream.read(1)
@@ -480,8 +802,29 @@ class NameObject(str, PdfObject):
         name += utils.readUntilRegex(stream, NameObject.delimiterPattern, 
             ignore_eof=True)
         if debug: print(name)
+        return NameObject._decode(name, pdf)
+
+    readFromStream = staticmethod(readFromStream)
+
+    def readFromBuffer(buf, pos, pdf):
+        if buf[pos:pos + 1] != NameObject.surfix:
+            raise utils.PdfReadError("name read error")
+        m = NameObject.delimiterPattern.search(buf, pos + 1)
+        end = len(buf) if m is None else m.start()
+        return NameObject._decode(buf[pos:end], pdf), end
+
+    readFromBuffer = staticmethod(readFromBuffer)
+
+    def _decode(name, pdf):
+        # the names read are interned: each is made once, and shared
+        obj = _names.get(name)
+        if obj is not None:
+            return obj
         try:
-            return NameObject(name.decode('utf-8'))
+            obj = NameObject(name.decode('utf-8'))
+            if len(_names) < _MAX_NAMES:
+                _names[name] = obj
+            return obj
         except (UnicodeEncodeError, UnicodeDecodeError) as e:
             # Name objects should represent irregular characters
             # with a '#' followed by the symbol's hex number
@@ -491,10 +834,13 @@ class NameObject(str, PdfObject):
             else:
                 raise utils.PdfReadError("Illegal character in Name Object")
 
-    readFromStream = staticmethod(readFromStream)
+    _decode = staticmethod(_decode)
 
 
 class DictionaryObject(dict, PdfObject):
+    # weak references are taken by cache.ObjectCache
+    __slots__ = ("__weakref__",)
+
     def raw_get(self, key):
         return dict.__getitem__(self, key)
 
@@ -542,15 +888,21 @@ class DictionaryObject(dict, PdfObject):
     xmpMetadata = property(lambda self: self.getXmpMetadata(), None, None)
 
     def writeToStream(self, stream, encryption_key):
-        stream.write(b_("<<\n"))
+        write = stream.write
+        write(DictOpen)
         for key, value in list(self.items()):
             key.writeToStream(stream, encryption_key)
-            stream.write(b_(" "))
+            write(Space)
             value.writeToStream(stream, encryption_key)
-            stream.write(b_("\n"))
-        stream.write(b_(">>"))
+            write(Newline)
+        write(DictClose)
 
     def readFromStream(stream, pdf):
+        buf = utils.getStreamBuffer(stream)
+        if buf is not None:
+            obj, pos = DictionaryObject.readFromBuffer(buf, stream.tell(), pdf)
+            stream.seek(pos, 0)
+            return obj
         debug = False
         tmp = stream.read(2)
         if tmp != b_("<<"):
@@ -608,7 +960,7 @@ class DictionaryObject(dict, PdfObject):
                 t = stream.tell()
                 length = pdf.getObject(length)
                 stream.seek(t, 0)
-            data["__streamdata__"] = stream.read(length)
+            data["__streamdata__"] = utils.readStreamData(stream, length)
             if debug: print("here")
             #if debug: print(binascii.hexlify(data["__streamdata__"]))
             e = readNonWhitespace(stream)
@@ -640,6 +992,81 @@ class DictionaryObject(dict, PdfObject):
             return retval
     readFromStream = staticmethod(readFromStream)
 
+    def readFromBuffer(buf, pos, pdf):
+        if buf[pos:pos + 2] != DictStart:
+            raise utils.PdfReadError("Dictionary read error at byte %s: stream must begin with '<<'" % utils.hexStr(pos + 2))
+        pos += 2
+        data = {}
+        while True:
+            m = DictEntryPattern.match(buf, pos)
+            if m is not None:
+                # the usual "/Key value" entry
+                key = NameObject._decode(m.group('key'), pdf)
+                if m.lastgroup == 'key':
+                    value, pos = readObjectFromBuffer(buf, m.end(), pdf)
+                else:
+                    value, pos = readTokenObject(buf, m, pdf)
+            else:
+                pos = WhitespacePattern.match(buf, pos).end()
+                tok = buf[pos:pos + 1]
+                if tok == CommentStart:
+                    pos = CommentPattern.match(buf, pos).end()
+                    continue
+                if not tok:
+                    # stream has truncated prematurely
+                    raise PdfStreamError("Stream has ended unexpectedly")
+                if tok == b_(">"):
+                    pos += 2
+                    break
+                key, pos = readObjectFromBuffer(buf, pos, pdf)
+                pos = WhitespacePattern.match(buf, pos).end()
+                value, pos = readObjectFromBuffer(buf, pos, pdf)
+            if not data.get(key):
+                data[key] = value
+            elif pdf.strict:
+                # multiple definitions of key not permitted
+                raise utils.PdfReadError("Multiple definitions in dictionary at byte %s for key %s" \
+                                           % (utils.hexStr(pos), key))
+            else:
+                warnings.warn("Multiple definitions in dictionary at byte %s for key %s" \
+                                           % (utils.hexStr(pos), key), utils.PdfReadWarning)
+
+        start = WhitespacePattern.match(buf, pos).end()
+        if buf[start:start + 6] == StreamKeyword:
+            start += 6
+            # odd PDF file output has spaces after 'stream' keyword but before EOL.
+            while buf[start:start + 1] == b_(' '):
+                start += 1
+            eol = buf[start:start + 1]
+            start += 1
+            assert eol in (b_("\n"), b_("\r"))
+            if eol == b_("\r") and buf[start:start + 1] == b_("\n"):
+                start += 1
+            # this is a stream object, not a dictionary
+            assert "/Length" in data
+            length = data["/Length"]
+            if isinstance(length, IndirectObject):
+                length = pdf.getObject(length)
+            streamdata = utils.sliceBuffer(buf, start, start + length)
+            end = WhitespacePattern.match(buf, start + len(streamdata)).end()
+            if buf[end:end + 9] == EndstreamKeyword:
+                pos = end + 9
+            else:
+                # the length is too long, see readFromStream
+                pos = min(end + 9, len(buf))
+                if pos >= 10 and buf[pos - 10:pos - 1] == EndstreamKeyword:
+                    streamdata = streamdata[:-1]
+                    pos -= 1
+                else:
+                    raise utils.PdfReadError("Unable to find 'endstream' marker after stream at byte %s." % utils.hexStr(pos))
+            data["__streamdata__"] = streamdata
+            return StreamObject.initializeFromDictionary(data), pos
+        else:
+            retval = DictionaryObject()
+            retval.update(data)
+            return retval, pos
+    readFromBuffer = staticmethod(readFromBuffer)
+
 
 class TreeObject(DictionaryObject):
     def __init__(self):
@@ -778,15 +1205,15 @@ class StreamObject(DictionaryObject):
         self.decodedSelf = None
 
     def writeToStream(self, stream, encryption_key):
-        self[NameObject("/Length")] = NumberObject(len(self._data))
-        DictionaryObject.writeToStream(self, stream, encryption_key)
-        del self["/Length"]
-        stream.write(b_("\nstream\n"))
         data = self._data
         if encryption_key:
-            data = RC4_encrypt(encryption_key, data)
+            data = security.encrypt(encryption_key, data)
+        self[NameObject("/Length")] = NumberObject(len(data))
+        DictionaryObject.writeToStream(self, stream, encryption_key)
+        del self["/Length"]
+        stream.write(StreamOpen)
         stream.write(data)
-        stream.write(b_("\nendstream"))
+        stream.write(StreamClose)
 
     def initializeFromDictionary(data):
         if "/Filter" in data:
@@ -801,49 +1228,98 @@ class StreamObject(DictionaryObject):
     initializeFromDictionary = staticmethod(initializeFromDictionary)
 
     def flateEncode(self):
+        return self._encode("/FlateDecode", filters.FlateDecode.encode)
+
+    def asciiHexEncode(self):
+        return self._encode("/ASCIIHexDecode", filters.ASCIIHexDecode.encode)
+
+    def ascii85Encode(self):
+        return self._encode("/ASCII85Decode", filters.ASCII85Decode.encode)
+
+    def _encode(self, filterName, encode):
         if "/Filter" in self:
             f = self["/Filter"]
             if isinstance(f, ArrayObject):
-                f.insert(0, NameObject("/FlateDecode"))
+                f.insert(0, NameObject(filterName))
             else:
                 newf = ArrayObject()
-                newf.append(NameObject("/FlateDecode"))
+                newf.append(NameObject(filterName))
                 newf.append(f)
                 f = newf
         else:
-            f = NameObject("/FlateDecode")
+            f = NameObject(filterName)
         retval = EncodedStreamObject()
         retval[NameObject("/Filter")] = f
-        retval._data = filters.FlateDecode.encode(self._data)
+        retval._data = encode(self._data)
         return retval
 
 
 class DecodedStreamObject(StreamObject):
     def getData(self):
+        if isinstance(self._data, memoryview):
+            # payload still lives in a memory-mapped input file
+            return self._data.tobytes()
         return self._data
 
+    def iterData(self, chunkSize=65536):
+        """
+        Yields the data of this stream in pieces of at most chunkSize bytes.
+        """
+        data = self._data
+        if data:
+            for start in range(0, len(data), chunkSize):
+                chunk = data[start:start + chunkSize]
+                if isinstance(chunk, memoryview):
+                    chunk = chunk.tobytes()
+                yield chunk
+
     def setData(self, data):
         self._data = data
 
 
 class EncodedStreamObject(StreamObject):
+    """
+    A stream whose data is encoded with one or more filters.
+
+    :meth:`getData()<getData>` decodes the data every time it is called,
+    unless ``cacheDecodedData`` is set (on the class or on a single stream),
+    in which case the decoded data is kept in ``decodedSelf`` for the life of
+    the stream.  :meth:`iterData()<iterData>` decodes the data
+    incrementally and never keeps it.
+
+    Data encoded with a passthrough filter, like the image filters
+    ``/DCTDecode`` and ``/JPXDecode``, is only decoded up to that filter;
+    see :func:`filters.registerFilter()<PyPDF2.filters.registerFilter>`.
+    """
+    cacheDecodedData = False
+
     def __init__(self):
         self.decodedSelf = None
 
     def getData(self):
-        if self.decodedSelf:
+        if self.decodedSelf is not None:
             # cached version of decoded object
             return self.decodedSelf.getData()
-        else:
-            # create decoded object
+        data = filters.decodeStreamData(self)
+        if self.cacheDecodedData and not filters.isPassthrough(self):
             decoded = DecodedStreamObject()
-
-            decoded._data = filters.decodeStreamData(self)
+            decoded._data = data
             for key, value in list(self.items()):
                 if not key in ("/Length", "/Filter", "/DecodeParms"):
                     decoded[key] = value
             self.decodedSelf = decoded
-            return decoded._data
+        return data
+
+    def iterData(self, chunkSize=65536):
+        """
+        Yields the decoded data of this stream in pieces of about chunkSize
+        bytes, so that large streams can be processed in bounded memory.
+        Streams compressed with FlateDecode alone are decompressed
+        incrementally; other filters need all of their input at once.
+        """
+        if self.decodedSelf is not None:
+            return self.decodedSelf.iterData(chunkSize)
+        return filters.iterDecodeStreamData(self, chunkSize)
 
     def setData(self, data):
         raise utils.PdfReadError("Creating EncodedStreamObject is not currently supported")
@@ -859,6 +1335,8 @@ class RectangleObject(ArrayObject):
         * :attr:`mediaBox <PyPDF2.pdf.PageObject.mediaBox>`
         * :attr:`trimBox <PyPDF2.pdf.PageObject.trimBox>`
     """
+    __slots__ = ()
+
     def __init__(self, arr):
         # must have four points
         assert len(arr) == 4
@@ -1160,25 +1638,14 @@ class Bookmark(Destination):
 
 
 def encode_pdfdocencoding(unicode_string):
-    retval = b_('')
-    for c in unicode_string:
-        try:
-            retval += b_(chr(_pdfDocEncoding_rev[c]))
-        except KeyError:
-            raise UnicodeEncodeError("pdfdocencoding", c, -1, -1,
-                    "does not exist in translation table")
-    return retval
+    # characters without a mapping raise a UnicodeEncodeError
+    return codecs.charmap_encode(unicode_string, 'strict', _pdfDocEncodingTable)[0]
 
 
 def decode_pdfdocencoding(byte_array):
-    retval = u_('')
-    for b in byte_array:
-        c = _pdfDocEncoding[ord_(b)]
-        if c == u_('\u0000'):
-            raise UnicodeDecodeError("pdfdocencoding", utils.barray(b), -1, -1,
-                    "does not exist in translation table")
-        retval += c
-    return retval
+    # bytes without a mapping decode to U+FFFE, which charmap_decode rejects
+    # with a UnicodeDecodeError
+    return codecs.charmap_decode(byte_array, 'strict', _pdfDocDecodingTable)[0]
 
 _pdfDocEncoding = (
   u_('\u0000'), u_('\u0000'), u_('\u0000'), u_('\u0000'), u_('\u0000'), u_('\u0000'), u_('\u0000'), u_('\u0000'),
@@ -1215,6 +1682,9 @@ _pdfDocEncoding = (
   u_('\u00f8'), u_('\u00f9'), u_('\u00fa'), u_('\u00fb'), u_('\u00fc'), u_('\u00fd'), u_('\u00fe'), u_('\u00ff')
 )
 
+_pdfDocDecodingTable = u_('').join(
+    c if c != u_('\u0000') else u_('\ufffe') for c in _pdfDocEncoding)
+
 assert len(_pdfDocEncoding) == 256
 
 _pdfDocEncoding_rev = {}
@@ -1224,3 +1694,33 @@ for i in range(256):
         continue
     assert char not in _pdfDocEncoding_rev
     _pdfDocEncoding_rev[char] = i
+_pdfDocEncodingTable = dict((ord(char), i) for char, i in _pdfDocEncoding_rev.items())
+
+
+# the encodings of the numbers and names written most, and how each byte of
+# a string is written: letters, digits and the other characters str.isalnum()
+# accepts as they are, everything else as an octal escape
+_SMALL_NUMBERS = 1024
+_numberBytes = [b_(str(i)) for i in range(_SMALL_NUMBERS)]
+_NAME_BYTES_SIZE = 4096
+_nameBytes = {}
+_stringEscapes = []
+for c in bytes(bytearray(range(256))):
+    if not chr_(c).isalnum() and c != b_(' '):
+        _stringEscapes.append(b_("\\%03o" % ord_(c)))
+    else:
+        _stringEscapes.append(b_(chr_(c)))
+del c
+
+# the null object and the booleans, of which there is one each
+_null = object.__new__(NullObject)
+_true = object.__new__(BooleanObject)
+_true.value = True
+_false = object.__new__(BooleanObject)
+_false.value = False
+
+# the interned names, by the bytes they were read from, and how many
+# references a reader shares through sharedReference()
+_MAX_NAMES = 1 << 14
+_names = {}
+_MAX_SHARED_REFERENCES = 1 << 18
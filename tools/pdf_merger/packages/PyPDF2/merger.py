@@ -65,16 +65,45 @@ class PdfFileMerger(object):
     :param bool strict: Determines whether user should be warned of all
             problems and also causes some correctable problems to be fatal.
             Defaults to ``True``.
+    :param bool useMmap: Memory-map input files instead of copying them into
+            memory. The page data is then written out straight from the
+            mapped files. Defaults to ``False``.
+    :param bool streamOutput: Write each page to the output file as soon as
+            the next one has been added, instead of keeping the whole output
+            document in memory until it is complete. See
+            :meth:`PdfFileWriter.beginWrite()<PyPDF2.PdfFileWriter.beginWrite>`.
+            The merger lets go of an input file once all of its pages have
+            been written, so that its reader and the objects read from it
+            can be freed.  Streaming only starts in :meth:`write()<write>`
+            though, as :meth:`merge()<merge>` may still insert pages
+            anywhere: until then every input file stays open, with its page
+            tree, bookmarks and named destinations read.
+            Defaults to ``False``.
+    :param bool objectStreams: Write the output with compressed object
+            streams and a cross-reference stream, which makes it smaller. See
+            :meth:`PdfFileWriter.useObjectStreams()<PyPDF2.PdfFileWriter.useObjectStreams>`.
+            Defaults to ``False``.
+    :param bool deduplicate: Write a single copy of the fonts, images and
+            other resources that the merged files have in common. See
+            :meth:`PdfFileWriter.useDeduplication()<PyPDF2.PdfFileWriter.useDeduplication>`.
+            Defaults to ``False``.
     """
 
-    def __init__(self, strict=True):
+    def __init__(self, strict=True, useMmap=False, streamOutput=False, objectStreams=False,
+                 deduplicate=False):
         self.inputs = []
         self.pages = []
         self.output = PdfFileWriter()
+        if objectStreams:
+            self.output.useObjectStreams()
+        if deduplicate:
+            self.output.useDeduplication()
         self.bookmarks = []
         self.named_dests = []
         self.id_count = 0
         self.strict = strict
+        self.useMmap = useMmap
+        self.streamOutput = streamOutput
 
     def merge(self, position, fileobj, bookmark=None, pages=None, import_bookmarks=True):
         """
@@ -109,11 +138,13 @@ class PdfFileMerger(object):
         # it is a PdfFileReader, copy that reader's stream into a
         # BytesIO (or StreamIO) stream.
         # If fileobj is none of the above types, it is not modified
+        # In mmap mode paths and files are handed to the reader as they are;
+        # the reader maps them and the map lives as long as its objects do.
         decryption_key = None
-        if isString(fileobj):
+        if isString(fileobj) and not self.useMmap:
             fileobj = file(fileobj, 'rb')
             my_file = True
-        elif isinstance(fileobj, file):
+        elif isinstance(fileobj, file) and not self.useMmap:
             fileobj.seek(0)
             filecontent = fileobj.read()
             fileobj = StreamIO(filecontent)
@@ -130,7 +161,7 @@ class PdfFileMerger(object):
 
         # Create a new PdfFileReader instance using the stream
         # (either file or BytesIO or StringIO) created above
-        pdfr = PdfFileReader(fileobj, strict=self.strict)
+        pdfr = PdfFileReader(fileobj, strict=self.strict, useMmap=self.useMmap)
         if decryption_key is not None:
             pdfr._decryption_key = decryption_key
 
@@ -214,13 +245,27 @@ class PdfFileMerger(object):
             fileobj = file(fileobj, 'wb')
             my_file = True
 
+        if self.streamOutput:
+            self.output.beginWrite(fileobj)
+            # from here on the readers, and the in-memory copies of input
+            # files they read from, are only held through their pages, and
+            # go once the last of them has been written out; files opened
+            # here are still closed by close()
+            self.inputs = [(fo, None, mine) for fo, pdfr, mine in self.inputs
+                           if mine and isinstance(fo, file)]
+
         # Add pages to the PdfFileWriter
         # The commented out line below was replaced with the two lines below it to allow PdfFileMerger to work with PyPdf 1.13
+        previous = None
         for page in self.pages:
             self.output.addPage(page.pagedata)
             page.out_pagedata = self.output.getReference(self.output._pages.getObject()["/Kids"][-1].getObject())
             #idnum = self.output._objects.index(self.output._pages.getObject()["/Kids"][-1].getObject()) + 1
             #page.out_pagedata = IndirectObject(idnum, 0, self.output)
+            if self.streamOutput and previous is not None:
+                # written out when this page was added
+                previous.pagedata = previous.src = None
+            previous = page
 
         # Once all pages are added, create bookmarks to point at those pages
         self._write_dests()
@@ -228,6 +273,8 @@ class PdfFileMerger(object):
 
         # Write the output to the file
         self.output.write(fileobj)
+        if self.streamOutput and previous is not None:
+            previous.pagedata = previous.src = None
 
         if my_file:
             fileobj.close()
@@ -44,9 +44,13 @@ __maintainer_email = "PyPDF2@phaseit.net"
 
 import string
 import math
+import mmap
+import os
+import re
 import struct
 import sys
 import uuid
+import weakref
 from sys import version_info
 if version_info < ( 3, 0 ):
     from cStringIO import StringIO
@@ -60,8 +64,17 @@ else:
 
 from . import filters
 from . import utils
+from . import xref
+from . import security
+from .cache import LRUCache, ObjectCache
+from .text import fontMap
 import warnings
 import codecs
+from collections import deque
+try:
+    from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+except ImportError:  # Py2
+    ThreadPoolExecutor = ProcessPoolExecutor = None
 from .generic import *
 from .utils import readNonWhitespace, readUntilWhitespace, ConvertFunctionsToVirtualList
 from .utils import isString, b_, u_, ord_, chr_, str_, formatWarning
@@ -73,9 +86,54 @@ if version_info < ( 2, 5 ):
     from md5 import md5
 else:
     from hashlib import md5
+from hashlib import sha256, sha384, sha512
 import uuid
 
 
+# objects that are never shared by PdfFileWriter.useDeduplication(), being
+# part of the structure of their document
+_UNSHARED_TYPES = ("/Page", "/Pages", "/Catalog", "/Annot", "/Outlines")
+# how many references deep PdfFileWriter.useDeduplication() follows
+_MAX_DIGEST_DEPTH = 64
+
+
+class _DigestSink(object):
+    # lets objects write themselves into a hash
+    def __init__(self, digest):
+        self.write = digest.update
+
+
+# how much output PdfFileWriter collects before writing it to the file
+_OUTPUT_BUFFER_SIZE = 1 << 16
+_ENDOBJ = b_("\nendobj\n")
+
+
+class _OutputBuffer(object):
+    """
+    Collects what is written to a file in a bytearray, which the file is
+    given in large pieces by flush(), rather than in the many small ones
+    objects are written in.  tell() counts what is still in the buffer.
+    """
+    def __init__(self, stream):
+        self.stream = stream
+        self.buffer = bytearray()
+        self.write = self.buffer.extend
+        self.offset = stream.tell()
+
+    def tell(self):
+        return self.offset + len(self.buffer)
+
+    def flush(self, size=0):
+        # hands the buffer to the file if it holds at least size bytes, and
+        # starts a new one
+        buf = self.buffer
+        if buf and len(buf) >= size:
+            self.stream.write(buf)
+            self.offset += len(buf)
+            self.buffer = bytearray()
+            self.write = self.buffer.extend
+
+
 class PdfFileWriter(object):
     """
     This class supports writing PDF files out, given pages produced by another
@@ -84,6 +142,7 @@ class PdfFileWriter(object):
     def __init__(self):
         self._header = b_("%PDF-1.3")
         self._objects = []  # array of indirect objects
+        self._objectIds = {}  # id() of the objects above -> object number
 
         # The root of our page tree node.
         pages = DictionaryObject()
@@ -110,10 +169,34 @@ class PdfFileWriter(object):
         self._root = None
         self._root_object = root
 
+        # set while writing incrementally, see beginWrite()
+        self._stream = None
+        self._flushing = False
+
+        # objects per object stream, see useObjectStreams()
+        self._objStmSize = None
+        self._compressionLevel = -1
+
+        # copies of other files' objects by content digest, and the digests
+        # of those objects by file, see useDeduplication(); weakly keyed, as
+        # the files may go while the file is being written
+        self._dedupIndex = None
+        self._digests = weakref.WeakKeyDictionary()
+
     def _addObject(self, obj):
         self._objects.append(obj)
+        if obj is not None:
+            self._objectIds.setdefault(id(obj), len(self._objects))
         return IndirectObject(len(self._objects), 0, self)
 
+    def _setObject(self, idnum, obj):
+        old = self._objects[idnum - 1]
+        if old is not None and self._objectIds.get(id(old)) == idnum:
+            del self._objectIds[id(old)]
+        self._objects[idnum - 1] = obj
+        if obj is not None:
+            self._objectIds.setdefault(id(obj), idnum)
+
     def getObject(self, ido):
         if ido.pdf != self:
             raise ValueError("pdf must be self")
@@ -122,7 +205,11 @@ class PdfFileWriter(object):
     def _addPage(self, page, action):
         assert page["/Type"] == "/Page"
         page[NameObject("/Parent")] = self._pages
-        page = self._addObject(page)
+        if self._stream is None:
+            page = self._addObject(page)
+        else:
+            self._flushPages()
+            page = self._addStreamedPage(page)
         pages = self.getObject(self._pages)
         action(pages["/Kids"], page)
         pages[NameObject("/Count")] = NumberObject(pages["/Count"] + 1)
@@ -156,10 +243,20 @@ class PdfFileWriter(object):
             (pages begin at zero)
         :return: the page at the index given by *pageNumber*
         :rtype: :class:`PageObject<pdf.PageObject>`
+        :raises PdfWriteError: if the page was already written out, see
+            :meth:`beginWrite()<beginWrite>`
         """
-        pages = self.getObject(self._pages)
-        # XXX: crude hack
-        return pages["/Kids"][pageNumber].getObject()
+        return self._pageObject(pageNumber)
+
+    def _pageObject(self, pageNumber):
+        # the page at the index, unless beginWrite() has let go of it
+        ref = self.getObject(self._pages)["/Kids"][pageNumber]
+        page = self.getObject(ref)
+        if page is None:
+            raise utils.PdfWriteError(
+                "page %d was already written out in streaming mode and can "
+                "no longer be retrieved or changed" % pageNumber)
+        return page
 
     def getNumPages(self):
         """
@@ -395,7 +492,8 @@ class PdfFileWriter(object):
         self.cloneReaderDocumentRoot(reader)
         self.appendPagesFromReader(reader, after_page_append)
 
-    def encrypt(self, user_pwd, owner_pwd = None, use_128bit = True):
+    def encrypt(self, user_pwd, owner_pwd = None, use_128bit = True,
+                algorithm = None):
         """
         Encrypt this PDF file with the PDF Standard encryption handler.
 
@@ -407,40 +505,297 @@ class PdfFileWriter(object):
         :param bool use_128bit: flag as to whether to use 128bit
             encryption.  When false, 40bit encryption will be used.  By default,
             this flag is on.
+        :param str algorithm: one of ``"RC4-40"``, ``"RC4-128"``, ``"AES-128"``
+            (the AESV2 crypt filter) and ``"AES-256"`` (AESV3, revision 6 of
+            the handler).  Takes precedence over ``use_128bit``.
         """
         import time, random
         if owner_pwd == None:
             owner_pwd = user_pwd
-        if use_128bit:
+        if algorithm is None:
+            algorithm = "RC4-128" if use_128bit else "RC4-40"
+        if algorithm == "AES-256":
+            V = 5
+            rev = 6
+            keylen = int(256 / 8)
+            method = "/AESV3"
+        elif algorithm == "AES-128":
+            V = 4
+            rev = 4
+            keylen = int(128 / 8)
+            method = "/AESV2"
+        elif algorithm == "RC4-128":
             V = 2
             rev = 3
             keylen = int(128 / 8)
-        else:
+            method = "/V2"
+        elif algorithm == "RC4-40":
             V = 1
             rev = 2
             keylen = int(40 / 8)
+            method = "/V2"
+        else:
+            raise ValueError("unknown encryption algorithm %r" % algorithm)
         # permit everything:
         P = -1
-        O = ByteStringObject(_alg33(owner_pwd, user_pwd, rev, keylen))
         ID_1 = ByteStringObject(md5(b_(repr(time.time()))).digest())
         ID_2 = ByteStringObject(md5(b_(repr(random.random()))).digest())
         self._ID = ArrayObject((ID_1, ID_2))
-        if rev == 2:
-            U, key = _alg34(user_pwd, O, P, ID_1)
-        else:
-            assert rev == 3
-            U, key = _alg35(user_pwd, rev, keylen, O, P, ID_1, False)
         encrypt = DictionaryObject()
+        if rev == 6:
+            key, O, U, OE, UE, perms = _alg8to10(user_pwd, owner_pwd, P)
+            encrypt[NameObject("/OE")] = ByteStringObject(OE)
+            encrypt[NameObject("/UE")] = ByteStringObject(UE)
+            encrypt[NameObject("/Perms")] = ByteStringObject(perms)
+        else:
+            O = ByteStringObject(_alg33(owner_pwd, user_pwd, rev, keylen))
+            if rev == 2:
+                U, key = _alg34(user_pwd, O, P, ID_1)
+            else:
+                U, key = _alg35(user_pwd, rev, keylen, O, P, ID_1, True)
         encrypt[NameObject("/Filter")] = NameObject("/Standard")
         encrypt[NameObject("/V")] = NumberObject(V)
-        if V == 2:
+        if V >= 2:
             encrypt[NameObject("/Length")] = NumberObject(keylen * 8)
+        if V >= 4:
+            cryptFilter = DictionaryObject()
+            cryptFilter[NameObject("/CFM")] = NameObject(method)
+            cryptFilter[NameObject("/AuthEvent")] = NameObject("/DocOpen")
+            cryptFilter[NameObject("/Length")] = NumberObject(keylen)
+            encrypt[NameObject("/CF")] = DictionaryObject(
+                {NameObject("/StdCF"): cryptFilter})
+            encrypt[NameObject("/StmF")] = NameObject("/StdCF")
+            encrypt[NameObject("/StrF")] = NameObject("/StdCF")
         encrypt[NameObject("/R")] = NumberObject(rev)
         encrypt[NameObject("/O")] = ByteStringObject(O)
         encrypt[NameObject("/U")] = ByteStringObject(U)
         encrypt[NameObject("/P")] = NumberObject(P)
         self._encrypt = self._addObject(encrypt)
         self._encrypt_key = key
+        self._cryptMethod = method
+
+    def useObjectStreams(self, objectsPerStream=100, compressionLevel=-1):
+        """
+        Makes this file pack its objects, except for streams, into compressed
+        object streams, and write its cross-reference section as a compressed
+        cross-reference stream instead of a table.  Files come out smaller,
+        the more so the more small objects (pages, fonts, annotations) they
+        have, and need PDF 1.5 to be read.  Has to be called before
+        :meth:`beginWrite()<beginWrite>`.
+
+        :param int objectsPerStream: Number of objects packed into one object
+            stream.  Larger streams compress better; a reader has to decode a
+            whole stream to get at any object in it.
+        :param int compressionLevel: zlib compression level of the object
+            streams and the cross-reference stream, from 1 (fastest) to 9
+            (smallest); -1 for zlib's default.
+        """
+        if self._stream is not None:
+            raise ValueError("the file is already being written")
+        if not 1 <= objectsPerStream <= 65535:
+            raise ValueError("objectsPerStream must be from 1 to 65535")
+        self._objStmSize = objectsPerStream
+        self._compressionLevel = compressionLevel
+        if self._header < b_("%PDF-1.5"):
+            self._header = b_("%PDF-1.5")
+
+    def useDeduplication(self):
+        """
+        Makes this file keep a single copy of equal objects brought in from
+        other files, such as the fonts, images and resource dictionaries of
+        documents made from the same template.  Each object is identified by
+        a digest of its contents and of everything it refers to, and objects
+        whose digest was seen before are not copied again but referred to.
+
+        Pages, the page tree, annotations, outlines and other objects that
+        belong to a place in their document are always copied, as are
+        objects referring to them.
+        """
+        if self._dedupIndex is None:
+            self._dedupIndex = {}
+
+    def beginWrite(self, stream):
+        """
+        Starts writing this PDF file to stream right away, instead of keeping
+        everything in memory until :meth:`write()<write>`.  Every page is
+        written out, along with the objects it brings in from other files,
+        when the next page is added; from then on only its position in the
+        file is kept.  Call :meth:`write()<write>` with the same stream to
+        write the remaining objects and finish the file.
+
+        A page must not be changed once the next page has been added, and
+        pages that were written out can no longer be retrieved with
+        :meth:`getPage()<getPage>`, which raises
+        :class:`PdfWriteError<PyPDF2.utils.PdfWriteError>` for them.  :meth:`encrypt()<encrypt>` has to be
+        called before this method.
+
+        :param stream: An object to write the file to.  The object must support
+            the write method and the tell method, similar to a file object.
+        """
+        if self._stream is not None:
+            raise ValueError("already writing to a stream")
+        if hasattr(stream, 'mode') and 'b' not in stream.mode:
+            warnings.warn("File <%s> to write to is not in binary mode. It may not be written to correctly." % stream.name)
+        self._stream = stream
+        self._output = _OutputBuffer(stream)
+        self._offsets = []
+        self._compressed = {}
+        self._objStmPending = []
+        # weakly keyed, so that other files can go once their pages have been
+        # written
+        self._externMap = weakref.WeakKeyDictionary()
+        self._unflushedPages = []
+        # objects of other files' pages that the pages written so far refer
+        # to, keyed by their number here, in case the page is added later
+        self._deferredPages = {}
+        self._output.write(self._header + b_("\n"))
+
+    def _addStreamedPage(self, page):
+        ref = None
+        if isinstance(page, PageObject) and page.indirectRef != None:
+            orig = page.indirectRef
+            ref = self._externMap.get(orig.pdf, {}).get((orig.generation, orig.idnum))
+        if ref is not None and ref.idnum in self._deferredPages:
+            # a page written earlier refers to this one: it takes the object
+            # number reserved for it
+            del self._deferredPages[ref.idnum]
+            self._setObject(ref.idnum, page)
+        else:
+            ref = self._addObject(page)
+            if isinstance(page, PageObject) and page.indirectRef != None:
+                self._mapExternal(self._externMap, page.indirectRef, ref)
+        self._unflushedPages.append(ref)
+        return ref
+
+    def _mapExternal(self, externMap, data, ref):
+        # the map holds a dict for each other file, keyed by the file and
+        # mapping (generation, object number) to the reference here
+        refs = externMap.get(data.pdf)
+        if refs is None:
+            refs = externMap[data.pdf] = {}
+        refs[(data.generation, data.idnum)] = ref
+
+    def _flushPages(self):
+        """
+        Writes the pages added since the last flush to the output stream,
+        together with the objects copied from other files for them, and lets
+        go of them.  Other objects of this writer that the pages refer to are
+        left alone; they may still change and are written by write().
+        """
+        if not self._unflushedPages:
+            return
+        first = len(self._objects)
+        pages = self._unflushedPages
+        self._unflushedPages = []
+        self._flushing = True
+        try:
+            for page in pages:
+                self._sweepIndirectReferences(self._externMap, self.getObject(page))
+        finally:
+            self._flushing = False
+        idnums = [page.idnum for page in pages]
+        idnums.extend(idnum for idnum in range(first + 1, len(self._objects) + 1)
+                      if idnum not in self._deferredPages)
+        for idnum in idnums:
+            self._writeObject(self._output, idnum)
+            self._setObject(idnum, None)
+
+    def _writeObject(self, stream, idnum):
+        if self._objStmSize is not None:
+            obj = self._objects[idnum - 1]
+            if not isinstance(obj, StreamObject) and \
+                    not (hasattr(self, "_encrypt") and idnum == self._encrypt.idnum):
+                self._packObject(stream, idnum, obj)
+                return
+        offsets = self._offsets
+        if len(offsets) < idnum:
+            offsets.extend([None] * (idnum - len(offsets)))
+        offsets[idnum - 1] = stream.tell()
+        stream.write(b_("%d 0 obj\n" % idnum))
+        key = None
+        if hasattr(self, "_encrypt") and idnum != self._encrypt.idnum:
+            key = _objectKey(self._encrypt_key, self._cryptMethod, idnum, 0)
+        self._objects[idnum - 1].writeToStream(stream, key)
+        stream.write(_ENDOBJ)
+        stream.flush(_OUTPUT_BUFFER_SIZE)
+
+    def _packObject(self, stream, idnum, obj):
+        # Queues the object for the next object stream, which is written out
+        # once it is full.  Objects in object streams are not encrypted on
+        # their own; the object stream is, as a whole.
+        data = BytesIO()
+        obj.writeToStream(data, None)
+        self._objStmPending.append((idnum, data.getvalue()))
+        self._compressed[idnum] = None
+        if len(self._objStmPending) >= self._objStmSize:
+            self._writeObjectStream(stream)
+
+    def _writeObjectStream(self, stream):
+        pending = self._objStmPending
+        if not pending:
+            return
+        self._objStmPending = []
+        offsets = []
+        offset = 0
+        for idnum, data in pending:
+            offsets.append("%d %d" % (idnum, offset))
+            offset += len(data) + 1
+        header = b_(" ".join(offsets) + "\n")
+        objStm = DecodedStreamObject()
+        objStm.update({
+            NameObject("/Type"): NameObject("/ObjStm"),
+            NameObject("/N"): NumberObject(len(pending)),
+            NameObject("/First"): NumberObject(len(header)),
+            NameObject("/Filter"): NameObject("/FlateDecode"),
+            })
+        objStm._data = filters.FlateDecode.encode(
+            header + b_("\n").join([data for idnum, data in pending]),
+            self._compressionLevel)
+        ref = self._addObject(objStm)
+        self._writeObject(stream, ref.idnum)
+        self._setObject(ref.idnum, None)
+        for index, (idnum, data) in enumerate(pending):
+            self._compressed[idnum] = (ref.idnum, index)
+
+    def _writeXrefStream(self, stream, trailer):
+        # the cross-reference stream takes the place of both the table and
+        # the trailer, and is not encrypted
+        ref = self._addObject(None)
+        self._offsets.extend([None] * (ref.idnum - len(self._offsets)))
+        xrefLocation = stream.tell()
+        self._offsets[ref.idnum - 1] = xrefLocation
+        size = len(self._objects) + 1
+        # field widths: entry type, offset or object stream number, and
+        # generation or index in the object stream
+        width = 1
+        while max(xrefLocation, size) >> (8 * width):
+            width += 1
+        pack = struct.pack
+        entries = [pack(">BQH", 0, 0, 65535)]
+        for idnum in range(1, size):
+            compressed = self._compressed.get(idnum)
+            if compressed is not None:
+                entries.append(pack(">BQH", 2, compressed[0], compressed[1]))
+            else:
+                entries.append(pack(">BQH", 1, self._offsets[idnum - 1], 0))
+        if width < 8:
+            # cut the offsets down from the 8 bytes they were packed in
+            entries = [entry[:1] + entry[9 - width:] for entry in entries]
+        xrefStream = DecodedStreamObject()
+        xrefStream.update(trailer)
+        xrefStream.update({
+            NameObject("/Type"): NameObject("/XRef"),
+            NameObject("/Size"): NumberObject(size),
+            NameObject("/W"): ArrayObject([NumberObject(1), NumberObject(width),
+                                           NumberObject(2)]),
+            NameObject("/Filter"): NameObject("/FlateDecode"),
+            })
+        xrefStream._data = filters.FlateDecode.encode(b_("").join(entries),
+                                                      self._compressionLevel)
+        stream.write(b_("%d 0 obj\n" % ref.idnum))
+        xrefStream.writeToStream(stream, None)
+        stream.write(_ENDOBJ)
+        return xrefLocation
 
     def write(self, stream):
         """
@@ -448,16 +803,24 @@ class PdfFileWriter(object):
 
         :param stream: An object to write the file to.  The object must support
             the write method and the tell method, similar to a file object.
+            After :meth:`beginWrite()<beginWrite>` this has to be the stream
+            given there, and the file is finished.
         """
-        if hasattr(stream, 'mode') and 'b' not in stream.mode:
+        streaming = self._stream is not None
+        if streaming and stream is not self._stream:
+            raise ValueError("the file is being written to another stream")
+        if not streaming and hasattr(stream, 'mode') and 'b' not in stream.mode:
             warnings.warn("File <%s> to write to is not in binary mode. It may not be written to correctly." % stream.name)
         debug = False
-        import struct
 
         if not self._root:
             self._root = self._addObject(self._root_object)
 
-        externalReferenceMap = {}
+        if streaming:
+            self._flushPages()
+            externalReferenceMap = self._externMap
+        else:
+            externalReferenceMap = {}
 
         # PDF objects sometimes have circular references to their /Page objects
         # inside their object tree (for example, annotations).  Those will be
@@ -470,47 +833,39 @@ class PdfFileWriter(object):
         for objIndex in range(len(self._objects)):
             obj = self._objects[objIndex]
             if isinstance(obj, PageObject) and obj.indirectRef != None:
-                data = obj.indirectRef
-                if data.pdf not in externalReferenceMap:
-                    externalReferenceMap[data.pdf] = {}
-                if data.generation not in externalReferenceMap[data.pdf]:
-                    externalReferenceMap[data.pdf][data.generation] = {}
-                externalReferenceMap[data.pdf][data.generation][data.idnum] = IndirectObject(objIndex + 1, 0, self)
-
-        self.stack = []
+                self._mapExternal(externalReferenceMap, obj.indirectRef,
+                                  IndirectObject(objIndex + 1, 0, self))
+
+        self._visited = set()
         if debug: print(("ERM:", externalReferenceMap, "root:", self._root))
+        if streaming:
+            # pages that were referred to but never added are copied, as
+            # they are without streaming
+            for idnum, data in list(self._deferredPages.items()):
+                del self._deferredPages[idnum]
+                newobj = data.pdf.getObject(data)
+                self._setObject(idnum, self._sweepIndirectReferences(externalReferenceMap, newobj))
         self._sweepIndirectReferences(externalReferenceMap, self._root)
-        del self.stack
+        del self._visited
 
         # Begin writing:
-        object_positions = []
-        stream.write(self._header + b_("\n"))
-        for i in range(len(self._objects)):
-            idnum = (i + 1)
-            obj = self._objects[i]
-            object_positions.append(stream.tell())
-            stream.write(b_(str(idnum) + " 0 obj\n"))
-            key = None
-            if hasattr(self, "_encrypt") and idnum != self._encrypt.idnum:
-                pack1 = struct.pack("<i", i + 1)[:3]
-                pack2 = struct.pack("<i", 0)[:2]
-                key = self._encrypt_key + pack1 + pack2
-                assert len(key) == (len(self._encrypt_key) + 5)
-                md5_hash = md5(key).digest()
-                key = md5_hash[:min(16, len(self._encrypt_key) + 5)]
-            obj.writeToStream(stream, key)
-            stream.write(b_("\nendobj\n"))
-
-        # xref table
-        xref_location = stream.tell()
-        stream.write(b_("xref\n"))
-        stream.write(b_("0 %s\n" % (len(self._objects) + 1)))
-        stream.write(b_("%010d %05d f \n" % (0, 65535)))
-        for offset in object_positions:
-            stream.write(b_("%010d %05d n \n" % (offset, 0)))
-
-        # trailer
-        stream.write(b_("trailer\n"))
+        if streaming:
+            output = self._output
+        else:
+            output = _OutputBuffer(stream)
+            self._offsets = []
+            self._compressed = {}
+            self._objStmPending = []
+            output.write(self._header + b_("\n"))
+        # object and cross-reference streams are added to the objects while
+        # writing, and taken off again afterwards
+        numObjects = len(self._objects)
+        for i in range(numObjects):
+            if (i >= len(self._offsets) or self._offsets[i] is None) and \
+                    i + 1 not in self._compressed:
+                self._writeObject(output, i + 1)
+        object_positions = self._offsets
+
         trailer = DictionaryObject()
         trailer.update({
                 NameObject("/Size"): NumberObject(len(self._objects) + 1),
@@ -521,10 +876,31 @@ class PdfFileWriter(object):
             trailer[NameObject("/ID")] = self._ID
         if hasattr(self, "_encrypt"):
             trailer[NameObject("/Encrypt")] = self._encrypt
-        trailer.writeToStream(stream, None)
+
+        if self._objStmSize is not None:
+            self._writeObjectStream(output)
+            xref_location = self._writeXrefStream(output, trailer)
+        else:
+            # xref table
+            xref_location = output.tell()
+            entries = ["xref\n0 %s\n%010d %05d f \n" % (len(self._objects) + 1, 0, 65535)]
+            entries.extend(["%010d 00000 n \n" % offset for offset in object_positions])
+            output.write(b_("".join(entries)))
+
+            # trailer
+            output.write(b_("trailer\n"))
+            trailer.writeToStream(output, None)
 
         # eof
-        stream.write(b_("\nstartxref\n%s\n%%%%EOF\n" % (xref_location)))
+        output.write(b_("\nstartxref\n%s\n%%%%EOF\n" % (xref_location)))
+        output.flush()
+        if streaming:
+            self._stream = None
+            del self._output, self._offsets, self._externMap, self._deferredPages
+            del self._unflushedPages
+        else:
+            del self._objects[numObjects:]
+        del self._compressed, self._objStmPending
 
     def addMetadata(self, infos):
         """
@@ -539,62 +915,171 @@ class PdfFileWriter(object):
         self.getObject(self._info).update(args)
 
     def _sweepIndirectReferences(self, externMap, data):
-        debug = False
-        if debug: print((data, "TYPE", data.__class__.__name__))
+        """
+        Makes data and everything it refers to part of this PDF file:
+        objects of other files are copied in (once each, as recorded in
+        externMap) and references to them replaced, and streams that are not
+        indirect objects are made indirect.  Returns what data is to be
+        replaced with.
+
+        The object graph is walked with a stack of the containers being
+        swept rather than by recursion, so deep outline or annotation trees
+        do not hit the recursion limit.
+        """
+        stack = []
+        data = self._sweepValue(externMap, data, stack, None, None)
+        while stack:
+            depth = len(stack)
+            container, items, parent, key, idnum = stack[-1]
+            for k, value in items:
+                newvalue = self._sweepValue(externMap, value, stack, container, k)
+                if newvalue is not value:
+                    container[k] = newvalue
+                if len(stack) > depth:
+                    # sweep the container just found first; this one goes
+                    # on where it left off afterwards
+                    break
+            else:
+                stack.pop()
+                if idnum is not None:
+                    self._setObject(idnum, container)
+                elif parent is not None and isinstance(container, StreamObject):
+                    # streams must be indirect objects, so we need to change
+                    # this value
+                    parent[key] = self._addObject(container)
+        return data
+
+    def _sweepValue(self, externMap, data, stack, parent, key):
+        """
+        Sweeps a single value for _sweepIndirectReferences() and returns its
+        replacement.  Containers that still have to be swept are pushed on
+        stack along with where they came from: parent and key for direct
+        objects, the object number for copies of other files' objects.
+        """
         if isinstance(data, DictionaryObject):
-            for key, value in list(data.items()):
-                origvalue = value
-                value = self._sweepIndirectReferences(externMap, value)
-                if isinstance(value, StreamObject):
-                    # a dictionary value is a stream.  streams must be indirect
-                    # objects, so we need to change this value.
-                    value = self._addObject(value)
-                data[key] = value
+            stack.append((data, iter(list(data.items())), parent, key, None))
             return data
         elif isinstance(data, ArrayObject):
-            for i in range(len(data)):
-                value = self._sweepIndirectReferences(externMap, data[i])
-                if isinstance(value, StreamObject):
-                    # an array value is a stream.  streams must be indirect
-                    # objects, so we need to change this value
-                    value = self._addObject(value)
-                data[i] = value
+            stack.append((data, enumerate(data), parent, key, None))
             return data
-        elif isinstance(data, IndirectObject):
-            # internal indirect references are fine
-            if data.pdf == self:
-                if data.idnum in self.stack:
-                    return data
-                else:
-                    self.stack.append(data.idnum)
-                    realdata = self.getObject(data)
-                    self._sweepIndirectReferences(externMap, realdata)
-                    return data
-            else:
-                newobj = externMap.get(data.pdf, {}).get(data.generation, {}).get(data.idnum, None)
-                if newobj == None:
-                    try:
-                        newobj = data.pdf.getObject(data)
-                        self._objects.append(None) # placeholder
-                        idnum = len(self._objects)
-                        newobj_ido = IndirectObject(idnum, 0, self)
-                        if data.pdf not in externMap:
-                            externMap[data.pdf] = {}
-                        if data.generation not in externMap[data.pdf]:
-                            externMap[data.pdf][data.generation] = {}
-                        externMap[data.pdf][data.generation][data.idnum] = newobj_ido
-                        newobj = self._sweepIndirectReferences(externMap, newobj)
-                        self._objects[idnum-1] = newobj
-                        return newobj_ido
-                    except ValueError:
-                        # Unable to resolve the Object, returning NullObject instead.
-                        return NullObject()
-                return newobj
-        else:
+        elif not isinstance(data, IndirectObject):
+            return data
+        elif data.pdf is self:
+            # internal indirect references are fine; while flushing pages
+            # the objects they point to are swept when the file is finished
+            if not self._flushing and data.idnum not in self._visited:
+                self._visited.add(data.idnum)
+                self._sweepValue(externMap, self.getObject(data), stack, None, None)
             return data
+        refs = externMap.get(data.pdf)
+        if refs is not None:
+            newobj_ido = refs.get((data.generation, data.idnum))
+            if newobj_ido is not None:
+                return newobj_ido
+        digest = None
+        if self._dedupIndex is not None:
+            digest = self._contentDigest(data, 0)
+            newobj_ido = self._dedupIndex.get(digest)
+            if newobj_ido is not None:
+                # an equal object was copied before
+                self._mapExternal(externMap, data, newobj_ido)
+                return newobj_ido
+        try:
+            newobj = data.pdf.getObject(data)
+        except ValueError:
+            # Unable to resolve the Object, returning NullObject instead.
+            return NullObject()
+        newobj_ido = self._addObject(None) # placeholder
+        idnum = newobj_ido.idnum
+        self._mapExternal(externMap, data, newobj_ido)
+        if digest is not None:
+            self._dedupIndex[digest] = newobj_ido
+        if self._flushing and isinstance(newobj, DictionaryObject) and \
+                newobj.get("/Type") == "/Page":
+            # the page may be added later on; keep its number free for it
+            # until the file is finished
+            self._deferredPages[idnum] = data
+        elif isinstance(newobj, DictionaryObject):
+            stack.append((newobj, iter(list(newobj.items())), None, None, idnum))
+        elif isinstance(newobj, ArrayObject):
+            stack.append((newobj, enumerate(newobj), None, None, idnum))
+        else:
+            self._setObject(idnum, newobj)
+        return newobj_ido
+
+    def _contentDigest(self, ref, depth):
+        """
+        Returns a digest of the object of another file that ref refers to,
+        covering the objects it refers to in turn, for useDeduplication().
+        Equal objects of any files have equal digests.  Returns None for
+        objects that are not to be shared, for objects in reference cycles
+        and for graphs deeper than _MAX_DIGEST_DEPTH.
+        """
+        key = (ref.generation, ref.idnum)
+        digests = self._digests.get(ref.pdf)
+        if digests is None:
+            digests = self._digests[ref.pdf] = {}
+        if key in digests:
+            return digests[key]
+        # what a reference back to the object finds while it is hashed
+        digests[key] = None
+        if depth > _MAX_DIGEST_DEPTH:
+            return None
+        try:
+            obj = ref.pdf.getObject(ref)
+        except ValueError:
+            return None
+        digest = sha256()
+        if self._hashValue(obj, _DigestSink(digest), depth):
+            digest = digest.digest()
+        else:
+            digest = None
+        digests[key] = digest
+        return digest
+
+    def _hashValue(self, value, sink, depth):
+        # Feeds the canonical form of value to sink: dictionaries with sorted
+        # keys, the digests of referred objects in place of the references.
+        # Returns False if value is not to be shared.
+        if isinstance(value, IndirectObject):
+            if value.pdf is self:
+                sink.write(b_("W%d " % value.idnum))
+                return True
+            digest = self._contentDigest(value, depth + 1)
+            if digest is None:
+                return False
+            sink.write(b_("R"))
+            sink.write(digest)
+        elif isinstance(value, DictionaryObject):
+            if value.get("/Type") in _UNSHARED_TYPES or "/Parent" in value or \
+                    "/P" in value:
+                return False
+            sink.write(b_("<<"))
+            for key in sorted(value.keys()):
+                key.writeToStream(sink, None)
+                if not self._hashValue(value.raw_get(key), sink, depth):
+                    return False
+            sink.write(b_(">>"))
+            if isinstance(value, StreamObject):
+                data = value._data or b_("")
+                sink.write(b_("stream%d " % len(data)))
+                sink.write(data)
+        elif isinstance(value, ArrayObject):
+            sink.write(b_("["))
+            for item in value:
+                if not self._hashValue(item, sink, depth):
+                    return False
+            sink.write(b_("]"))
+        else:
+            value.writeToStream(sink, None)
+            sink.write(b_(" "))
+        return True
 
     def getReference(self, obj):
-        idnum = self._objects.index(obj) + 1
+        idnum = self._objectIds.get(id(obj))
+        if idnum is None:
+            # not one of the objects themselves, maybe an equal one
+            idnum = self._objects.index(obj) + 1
         ref = IndirectObject(idnum, 0, self)
         assert ref.getObject() == obj
         return ref
@@ -602,9 +1087,7 @@ class PdfFileWriter(object):
     def getOutlineRoot(self):
         if '/Outlines' in self._root_object:
             outline = self._root_object['/Outlines']
-            idnum = self._objects.index(outline) + 1
-            outlineRef = IndirectObject(idnum, 0, self)
-            assert outlineRef.getObject() == outline
+            outlineRef = self.getReference(outline)
         else:
             outline = TreeObject()
             outline.update({ })
@@ -616,14 +1099,10 @@ class PdfFileWriter(object):
     def getNamedDestRoot(self):
         if '/Names' in self._root_object and isinstance(self._root_object['/Names'], DictionaryObject):
             names = self._root_object['/Names']
-            idnum = self._objects.index(names) + 1
-            namesRef = IndirectObject(idnum, 0, self)
-            assert namesRef.getObject() == names
+            namesRef = self.getReference(names)
             if '/Dests' in names and isinstance(names['/Dests'], DictionaryObject):
                 dests = names['/Dests']
-                idnum = self._objects.index(dests) + 1
-                destsRef = IndirectObject(idnum, 0, self)
-                assert destsRef.getObject() == dests
+                destsRef = self.getReference(dests)
                 if '/Names' in dests:
                     nd = dests['/Names']
                 else:
@@ -776,8 +1255,8 @@ class PdfFileWriter(object):
         Removes links and annotations from this output.
         """
         pages = self.getObject(self._pages)['/Kids']
-        for page in pages:
-            pageRef = self.getObject(page)
+        for j in range(len(pages)):
+            pageRef = self._pageObject(j)
             if "/Annots" in pageRef:
                 del pageRef['/Annots']
 
@@ -790,15 +1269,14 @@ class PdfFileWriter(object):
         """
         pages = self.getObject(self._pages)['/Kids']
         for j in range(len(pages)):
-            page = pages[j]
-            pageRef = self.getObject(page)
+            pageRef = self._pageObject(j)
             content = pageRef['/Contents'].getObject()
             if not isinstance(content, ContentStream):
                 content = ContentStream(content, pageRef)
 
             _operations = []
             seq_graphics = False
-            for operands, operator in content.operations:
+            for operands, operator in content.iterOperations():
                 if operator == b_('Tj'):
                     text = operands[0]
                     if ignoreByteStringObject:
@@ -845,12 +1323,13 @@ class PdfFileWriter(object):
         """
         pages = self.getObject(self._pages)['/Kids']
         for j in range(len(pages)):
-            page = pages[j]
-            pageRef = self.getObject(page)
+            pageRef = self._pageObject(j)
             content = pageRef['/Contents'].getObject()
             if not isinstance(content, ContentStream):
                 content = ContentStream(content, pageRef)
-            for operands,operator in content.operations:
+            _operations = []
+            for operands, operator in content.iterOperations():
+                _operations.append((operands, operator))
                 if operator == b_('Tj'):
                     text = operands[0]
                     if not ignoreByteStringObject:
@@ -888,6 +1367,7 @@ class PdfFileWriter(object):
                                     isinstance(operands[0][i], ByteStringObject):
                                 operands[0][i] = TextStringObject()
 
+            content.operations = _operations
             pageRef.__setitem__(NameObject('/Contents'), content)
 
     def addLink(self, pagenum, pagedest, rect, border=None, fit='/Fit', *args):
@@ -918,7 +1398,7 @@ class PdfFileWriter(object):
 
         pageLink = self.getObject(self._pages)['/Kids'][pagenum]
         pageDest = self.getObject(self._pages)['/Kids'][pagedest] #TODO: switch for external link
-        pageRef = self.getObject(pageLink)
+        pageRef = self._pageObject(pagenum)
 
         if border is not None:
             borderArr = [NameObject(n) for n in border[:3]]
@@ -1041,6 +1521,13 @@ class PdfFileWriter(object):
     and :meth:`setPageMode()<PdfFileWriter.setPageMode>` methods."""
 
 
+# "<idnum> <generation> obj" header, matching what the byte-wise parsing in
+# PdfFileReader.readObjectHeader accepts
+ObjectHeaderPattern = re.compile(b_(
+    r"(?:%[^\r\n]*[\r\n])?([ \n\r\t\x00]*)(\d+)[ \t\n\r\x0b\x0c]"
+    r"([ \n\r\t\x00]*)(\d+)[ \t\n\r\x0b\x0c]obj[ \n\r\t\x00]*"))
+
+
 class PdfFileReader(object):
     """
     Initializes a PdfFileReader object.  This operation can take some time, as
@@ -1057,8 +1544,27 @@ class PdfFileReader(object):
     :param bool overwriteWarnings: Determines whether to override Python's
         ``warnings.py`` module with a custom implementation (defaults to
         ``True``).
+    :param bool useMmap: Map the file read-only into memory instead of
+        reading it into a buffer.  Stream payloads are then kept as slices
+        of the map rather than copies, so resident memory follows the pages
+        that are actually touched.  Applies to paths and real file objects;
+        other streams are read as usual.  Defaults to ``False``.
+    :param bool lazyXref: Read only the newest cross reference section and
+        trailer when opening the file, and older ``/Prev`` sections only when
+        an object is not found in the ones read so far.  Opening an
+        incrementally updated file then costs one section instead of all of
+        them.  Defaults to ``False``.
+    :param int objStmCacheBytes: Budget, in bytes of decoded data, for the
+        object streams kept decoded and indexed between lookups of the
+        objects they hold; least recently used streams are dropped first.
+        Defaults to 8 MiB.
+    :param objectCache: Cache for the resolved indirect objects, available
+        as ``resolvedObjects``; an :class:`ObjectCache<PyPDF2.cache.ObjectCache>`
+        or another object with the same mapping methods.  Defaults to an
+        unbounded ``ObjectCache``, which keeps every object resolved for
+        the life of the reader.
     """
-    def __init__(self, stream, strict=True, warndest = None, overwriteWarnings = True):
+    def __init__(self, stream, strict=True, warndest = None, overwriteWarnings = True, useMmap = False, lazyXref = False, objStmCacheBytes = 8 << 20, objectCache = None):
         if overwriteWarnings:
             # have to dynamically override the default showwarning since there are no
             # public methods that specify the 'file' parameter
@@ -1072,15 +1578,45 @@ class PdfFileReader(object):
             warnings.showwarning = _showwarning
         self.strict = strict
         self.flattenedPages = None
-        self.resolvedObjects = {}
+        if objectCache is None:
+            objectCache = ObjectCache()
+        self.resolvedObjects = objectCache
+        # the references read, shared by the objects referring to the same
+        # object, see generic.sharedReference()
+        self._references = {}
         self.xrefIndex = 0
+        # whether the entries of a generation are corrected for a table that
+        # is not zero-indexed, by generation, once found out
+        self._xrefZeroed = {}
+        self.lazyXref = lazyXref
+        self.objectStreamCache = LRUCache(maxBytes=objStmCacheBytes,
+                                          sizeOf=lambda entry: len(entry[0]))
+        # decryption keys of the objects read last
+        self._objectKeyCache = LRUCache(maxEntries=1024)
+        # text maps of the fonts met by extractAllText, by object
+        self._fontMaps = LRUCache(maxEntries=256)
         self._pageId2Num = None # map page IndirectRef number to Page Number
         if hasattr(stream, 'mode') and 'b' not in stream.mode:
             warnings.warn("PdfFileReader stream/file object is not in binary mode. It may not be read correctly.", utils.PdfReadWarning)
+        mapped = None
+        # the file on disk, for the worker processes of extractAllText to
+        # open again; only known when it was opened here, as a file object's
+        # name need not be a path to the same data
+        self._path = None
         if isString(stream):
+            self._path = stream
             fileobj = open(stream, 'rb')
-            stream = BytesIO(b_(fileobj.read()))
-            fileobj.close()
+            try:
+                if useMmap:
+                    mapped = utils.mapFile(fileobj)
+                if mapped is None:
+                    stream = BytesIO(b_(fileobj.read()))
+            finally:
+                fileobj.close()
+        elif useMmap:
+            mapped = utils.mapFile(stream)
+        if mapped is not None:
+            stream = mapped
         self.read(stream)
         self.stream = stream
 
@@ -1155,6 +1691,100 @@ class PdfFileReader(object):
                 self._flatten()
             return len(self.flattenedPages)
 
+    def peekPageCount(self):
+        """
+        Reads the number of pages from the ``/Count`` entry of the page tree
+        root, without flattening the page tree into page objects the way
+        :meth:`getNumPages()<PdfFileReader.getNumPages>` does.  The
+        ``/Count`` of every node below is checked down to the nodes whose
+        ``/Kids`` are all pages, which are not read; the page tree is walked
+        instead if any of them is missing or does not add up.
+
+        :return: number of pages
+        :rtype: int
+        :raises PdfReadError: if file is encrypted and restrictions prevent
+            this action.
+        """
+        if self.isEncrypted:
+            return int(self.getNumPages())
+        if self.flattenedPages != None:
+            return len(self.flattenedPages)
+        pages = self.trailer["/Root"].getObject().raw_get("/Pages")
+        count = self._checkedPageCount(pages)
+        if count is None:
+            count = self._countPageLeaves(pages)
+        return count
+
+    def _checkedPageCount(self, pages):
+        # the /Count of pages, if it adds up with the /Count of the nodes
+        # below; None otherwise.  A node with as many kids as its /Count has
+        # only pages below it, as every node holds at least one page.
+        total = None
+        seen = {_nodeKey(pages): pages}
+        nodes = [pages.getObject()]
+        while nodes:
+            node = nodes.pop()
+            if not isinstance(node, DictionaryObject):
+                return None
+            count = node.get("/Count")
+            kids = node.get("/Kids")
+            if count is None or kids is None:
+                return None
+            count, kids = count.getObject(), kids.getObject()
+            if not isinstance(count, NumberObject) or not isinstance(kids, ArrayObject) \
+                    or len(kids) > count or (count == 0) != (len(kids) == 0):
+                return None
+            if total is None:
+                total = int(count)
+            if len(kids) == count:
+                continue
+            # the nodes among the kids make up the pages not counted by the
+            # pages among them
+            for ref in kids:
+                key = _nodeKey(ref)
+                kid = ref.getObject()
+                if key in seen or not isinstance(kid, DictionaryObject):
+                    return None
+                seen[key] = ref
+                t = "/Pages"
+                if "/Type" in kid:
+                    t = kid["/Type"]
+                if t == "/Page":
+                    count -= 1
+                elif t == "/Pages" and isinstance(kid.get("/Count"), NumberObject):
+                    count -= kid["/Count"]
+                    nodes.append(kid)
+                else:
+                    return None
+            if count != 0:
+                return None
+        return total
+
+    def _countPageLeaves(self, pages):
+        # counts the /Page nodes below pages, like _flatten() without
+        # building page objects; nodes reached twice are counted once
+        count = 0
+        seen = {}
+        nodes = [pages]
+        while nodes:
+            ref = nodes.pop()
+            key = _nodeKey(ref)
+            if key in seen:
+                continue
+            seen[key] = ref
+            node = ref.getObject()
+            if not isinstance(node, DictionaryObject):
+                continue
+            t = "/Pages"
+            if "/Type" in node:
+                t = node["/Type"]
+            if t == "/Pages":
+                if "/Kids" in node:
+                    nodes.extend(node["/Kids"])
+            elif t == "/Page":
+                count += 1
+        return count
+
     numPages = property(lambda self: self.getNumPages(), None, None)
     """
     Read-only property that accesses the
@@ -1528,41 +2158,45 @@ class PdfFileReader(object):
             pageObj.update(pages)
             self.flattenedPages.append(pageObj)
 
+    def _getObjectStream(self, stmnum):
+        """
+        Returns the decoded data of object stream stmnum, the offset of its
+        first object and a dict mapping the object numbers in the stream to
+        their (index, offset) pairs.  Kept in ``self.objectStreamCache``.
+        """
+        entry = self.objectStreamCache.get(stmnum)
+        if entry is not None:
+            return entry
+        objStm = IndirectObject(stmnum, 0, self).getObject()
+        # This is an xref to a stream, so its type better be a stream
+        assert objStm['/Type'] == '/ObjStm'
+        data = b_(objStm.getData())
+        first = objStm['/First']
+        # /N is the number of indirect objects in the stream; the header
+        # holds a pair of object number and offset for each of them
+        n = objStm['/N']
+        header = data[:first].split()[:2 * n]
+        offsets = {}
+        for i in range(len(header) // 2):
+            # the first of duplicate object numbers wins
+            offsets.setdefault(int(header[2 * i]), (i, int(header[2 * i + 1])))
+        entry = data, first, n, offsets
+        self.objectStreamCache[stmnum] = entry
+        return entry
+
     def _getObjectFromStream(self, indirectReference):
         # indirect reference to object in object stream
-        # read the entire object stream into memory
         debug = False
-        stmnum, idx = self.xref_objStm[indirectReference.idnum]
+        xref_type, stmnum, idx = self.xref.get(indirectReference.idnum, 0)
         if debug: print(("Here1: %s %s"%(stmnum, idx)))
-        objStm = IndirectObject(stmnum, 0, self).getObject()
-        if debug: print(("Here2: objStm=%s.. stmnum=%s data=%s"%(objStm, stmnum, objStm.getData())))
-        # This is an xref to a stream, so its type better be a stream
-        assert objStm['/Type'] == '/ObjStm'
-        # /N is the number of indirect objects in the stream
-        assert idx < objStm['/N']
-        streamData = BytesIO(b_(objStm.getData()))
-        for i in range(objStm['/N']):
-            readNonWhitespace(streamData)
-            streamData.seek(-1, 1)
-            objnum = NumberObject.readFromStream(streamData)
-            readNonWhitespace(streamData)
-            streamData.seek(-1, 1)
-            offset = NumberObject.readFromStream(streamData)
-            readNonWhitespace(streamData)
-            streamData.seek(-1, 1)
-            if objnum != indirectReference.idnum:
-                # We're only interested in one object
-                continue
+        data, first, n, offsets = self._getObjectStream(stmnum)
+        assert idx < n
+        if indirectReference.idnum in offsets:
+            i, offset = offsets[indirectReference.idnum]
             if self.strict and idx != i:
                 raise utils.PdfReadError("Object is in wrong index.")
-            streamData.seek(objStm['/First']+offset, 0)
-            if debug:
-                pos = streamData.tell()
-                streamData.seek(0, 0)
-                lines = streamData.readlines()
-                for i in range(0, len(lines)):
-                    print((lines[i]))
-                streamData.seek(pos, 0)
+            streamData = BytesIO(data)
+            streamData.seek(first+offset, 0)
             try:
                 obj = readObject(streamData, self)
             except utils.PdfStreamError as e:
@@ -1588,12 +2222,21 @@ class PdfFileReader(object):
                                                 indirectReference.idnum)
         if retval != None:
             return retval
-        if indirectReference.generation == 0 and \
-                        indirectReference.idnum in self.xref_objStm:
+        entry = self.xref.get(indirectReference.idnum,
+                              indirectReference.generation)
+        while entry is None and self._nextXref is not None:
+            # lazily opened; the object may be in an older section
+            self._readPrevXref()
+            entry = self.xref.get(indirectReference.idnum,
+                                  indirectReference.generation)
+        if entry is not None and entry[0] == xref.COMPRESSED:
             retval = self._getObjectFromStream(indirectReference)
-        elif indirectReference.generation in self.xref and \
-                indirectReference.idnum in self.xref[indirectReference.generation]:
-            start = self.xref[indirectReference.generation][indirectReference.idnum]
+        elif entry is not None and entry[0] == xref.FREE:
+            # PDF spec 7.3.10: a reference to a free object is a reference
+            # to the null object
+            retval = NullObject()
+        elif entry is not None:
+            start = entry[1]
             if debug: print(("  Uncompressed Object", indirectReference.idnum, indirectReference.generation, ":", start))
             self.stream.seek(start, 0)
             idnum, generation = self.readObjectHeader(self.stream)
@@ -1616,14 +2259,9 @@ class PdfFileReader(object):
                 if not hasattr(self, '_decryption_key'):
                     raise utils.PdfReadError("file has not been decrypted")
                 # otherwise, decrypt here...
-                import struct
-                pack1 = struct.pack("<i", indirectReference.idnum)[:3]
-                pack2 = struct.pack("<i", indirectReference.generation)[:2]
-                key = self._decryption_key + pack1 + pack2
-                assert len(key) == (len(self._decryption_key) + 5)
-                md5_hash = md5(key).digest()
-                key = md5_hash[:min(16, len(self._decryption_key) + 5)]
-                retval = self._decryptObject(retval, key)
+                stringKey, streamKey = self._objectKeys(
+                    indirectReference.idnum, indirectReference.generation)
+                retval = self._decryptObject(retval, stringKey, streamKey)
         else:
             warnings.warn("Object %d %d not defined."%(indirectReference.idnum,
                         indirectReference.generation), utils.PdfReadWarning)
@@ -1633,17 +2271,34 @@ class PdfFileReader(object):
                     indirectReference.idnum, retval)
         return retval
 
-    def _decryptObject(self, obj, key):
+    def _objectKeys(self, idnum, generation):
+        # the decryption keys of the strings and the streams of an object,
+        # derived from that of the file
+        keys = self._objectKeyCache.get((idnum, generation))
+        if keys is None:
+            keys = (_objectKey(self._decryption_key, self._stringMethod,
+                               idnum, generation),
+                    _objectKey(self._decryption_key, self._streamMethod,
+                               idnum, generation))
+            self._objectKeyCache[(idnum, generation)] = keys
+        return keys
+
+    def _decryptObject(self, obj, stringKey, streamKey):
         if isinstance(obj, ByteStringObject) or isinstance(obj, TextStringObject):
-            obj = createStringObject(utils.RC4_encrypt(key, obj.original_bytes))
+            if stringKey is not None:
+                obj = createStringObject(security.decrypt(stringKey, obj.original_bytes))
         elif isinstance(obj, StreamObject):
-            obj._data = utils.RC4_encrypt(key, obj._data)
+            if streamKey is not None and (self._encryptMetadata or
+                                          obj.get("/Type") != "/Metadata"):
+                obj._data = security.decrypt(streamKey, obj._data)
+            for dictkey, value in list(obj.items()):
+                obj[dictkey] = self._decryptObject(value, stringKey, streamKey)
         elif isinstance(obj, DictionaryObject):
             for dictkey, value in list(obj.items()):
-                obj[dictkey] = self._decryptObject(value, key)
+                obj[dictkey] = self._decryptObject(value, stringKey, streamKey)
         elif isinstance(obj, ArrayObject):
             for i in range(len(obj)):
-                obj[i] = self._decryptObject(obj[i], key)
+                obj[i] = self._decryptObject(obj[i], stringKey, streamKey)
         return obj
 
     def readObjectHeader(self, stream):
@@ -1651,6 +2306,17 @@ class PdfFileReader(object):
         # cross-reference table should put us in the right spot to read the
         # object header.  In reality... some files have stupid cross reference
         # tables that are off by whitespace bytes.
+        buf = utils.getStreamBuffer(stream)
+        if buf is not None:
+            m = ObjectHeaderPattern.match(buf, stream.tell())
+            if m is not None:
+                stream.seek(m.end(), 0)
+                if (m.group(1) or m.group(3)) and self.strict:
+                    #not a fatal error
+                    warnings.warn("Superfluous whitespace found in object header %s %s" % \
+                                  (m.group(2), m.group(4)), utils.PdfReadWarning)
+                return int(m.group(2)), int(m.group(4))
+            # anything unusual is left to the byte-wise reader below
         extra = False
         utils.skipOverComment(stream)
         extra |= utils.skipOverWhitespace(stream); stream.seek(-1, 1)
@@ -1712,10 +2378,27 @@ class PdfFileReader(object):
             if line[:9] != b_("startxref"):
                 raise utils.PdfReadError("startxref not found")
 
-        # read all cross reference tables and their trailers
-        self.xref = {}
-        self.xref_objStm = {}
+        # read the cross reference tables and their trailers, newest first;
+        # in lazy mode only the newest one, the rest is read on demand
+        self.xref = xref.XrefTable()
         self.trailer = DictionaryObject()
+        self._xrefSeen = set([startxref])
+        self._nextXref = startxref
+        while self._nextXref is not None:
+            self._readXrefSection(stream, self.xref)
+            if self.lazyXref:
+                break
+        self._checkXrefIndex(stream, self.xref)
+
+    def _readXrefSection(self, stream, table):
+        """
+        Reads the cross reference table or stream at ``self._nextXref`` into
+        table and its trailer, and moves ``self._nextXref`` on to the
+        previous section (``None`` after the oldest one).
+        """
+        debug = False
+        startxref = self._nextXref
+        self._nextXref = None
         while True:
             # load the xref table
             stream.seek(startxref, 0)
@@ -1742,6 +2425,14 @@ class PdfFileReader(object):
                     size = readObject(stream, self)
                     readNonWhitespace(stream)
                     stream.seek(-1, 1)
+                    buf = utils.getStreamBuffer(stream)
+                    entries = None
+                    if buf is not None:
+                        entries = xref.readXrefTableEntries(buf, stream.tell(), size)
+                    if entries is not None:
+                        table.addSection(num, *entries)
+                        stream.seek(20 * size, 1)
+                        size = 0
                     cnt = 0
                     while cnt < size:
                         line = stream.read(20)
@@ -1767,16 +2458,15 @@ class PdfFileReader(object):
 
                         offset, generation = line[:16].split(b_(" "))
                         offset, generation = int(offset), int(generation)
-                        if generation not in self.xref:
-                            self.xref[generation] = {}
-                        if num in self.xref[generation]:
-                            # It really seems like we should allow the last
-                            # xref table in the file to override previous
-                            # ones. Since we read the file backwards, assume
-                            # any existing key is already set correctly.
-                            pass
+                        if line[17:18] == b_("f"):
+                            xref_type = xref.FREE
                         else:
-                            self.xref[generation][num] = offset
+                            xref_type = xref.UNCOMPRESSED
+                        # It really seems like we should allow the last
+                        # xref table in the file to override previous
+                        # ones. Since we read the file backwards, assume
+                        # any existing key is already set correctly.
+                        table.add(num, generation, xref_type, offset, generation)
                         cnt += 1
                         num += 1
                     readNonWhitespace(stream)
@@ -1794,17 +2484,17 @@ class PdfFileReader(object):
                     if key not in self.trailer:
                         self.trailer[key] = value
                 if "/Prev" in newTrailer:
-                    startxref = newTrailer["/Prev"]
-                else:
-                    break
+                    self._setPrevXref(newTrailer["/Prev"])
+                return
             elif x.isdigit():
                 # PDF 1.5+ Cross-Reference Stream
                 stream.seek(-1, 1)
                 idnum, generation = self.readObjectHeader(stream)
                 xrefstream = readObject(stream, self)
                 assert xrefstream["/Type"] == "/XRef"
-                self.cacheIndirectObject(generation, idnum, xrefstream)
-                streamData = BytesIO(b_(xrefstream.getData()))
+                if self.cacheGetIndirectObject(generation, idnum) is None:
+                    self.cacheIndirectObject(generation, idnum, xrefstream)
+                streamData = b_(xrefstream.getData())
                 # Index pairs specify the subsections in the dictionary. If
                 # none create one subsection that spans everything.
                 idx_pairs = xrefstream.get("/Index", [0, xrefstream.get("/Size")])
@@ -1814,68 +2504,36 @@ class PdfFileReader(object):
                 if self.strict and len(entrySizes) > 3:
                     raise utils.PdfReadError("Too many entry sizes: %s" %entrySizes)
 
-                def getEntry(i):
-                    # Reads the correct number of bytes for each entry. See the
-                    # discussion of the W parameter in PDF spec table 17.
-                    if entrySizes[i] > 0:
-                        d = streamData.read(entrySizes[i])
-                        return convertToInt(d, entrySizes[i])
-
-                    # PDF Spec Table 17: A value of zero for an element in the
-                    # W array indicates...the default value shall be used
-                    if i == 0:  return 1 # First value defaults to 1
-                    else:       return 0
-
-                def used_before(num, generation):
-                    # We move backwards through the xrefs, don't replace any.
-                    return num in self.xref.get(generation, []) or \
-                            num in self.xref_objStm
+                # Decode the entries of all subsections in one go; see the
+                # discussion of the W parameter in PDF spec table 17.
+                subsections = list(self._pairs(idx_pairs))
+                types, field2, field3, rawTypes = xref.readXrefStreamEntries(
+                        streamData, entrySizes, sum(size for start, size in subsections))
+                if self.strict:
+                    unknown = rawTypes.translate(None, b_("\x00\x01\x02"))
+                    if unknown:
+                        raise utils.PdfReadError("Unknown xref type: %s"%
+                                                    unknown[0])
 
                 # Iterate through each subsection
                 last_end = 0
-                for start, size in self._pairs(idx_pairs):
+                first = 0
+                for start, size in subsections:
                     # The subsections must increase
                     assert start >= last_end
                     last_end = start + size
-                    for num in range(start, start+size):
-                        # The first entry is the type
-                        xref_type = getEntry(0)
-                        # The rest of the elements depend on the xref_type
-                        if xref_type == 0:
-                            # linked list of free objects
-                            next_free_object = getEntry(1)
-                            next_generation = getEntry(2)
-                        elif xref_type == 1:
-                            # objects that are in use but are not compressed
-                            byte_offset = getEntry(1)
-                            generation = getEntry(2)
-                            if generation not in self.xref:
-                                self.xref[generation] = {}
-                            if not used_before(num, generation):
-                                self.xref[generation][num] = byte_offset
-                                if debug: print(("XREF Uncompressed: %s %s"%(
-                                                num, generation)))
-                        elif xref_type == 2:
-                            # compressed objects
-                            objstr_num = getEntry(1)
-                            obstr_idx = getEntry(2)
-                            generation = 0 # PDF spec table 18, generation is 0
-                            if not used_before(num, generation):
-                                if debug: print(("XREF Compressed: %s %s %s"%(
-                                        num, objstr_num, obstr_idx)))
-                                self.xref_objStm[num] = (objstr_num, obstr_idx)
-                        elif self.strict:
-                            raise utils.PdfReadError("Unknown xref type: %s"%
-                                                        xref_type)
+                    # We move backwards through the xrefs, don't replace any.
+                    table.addSection(start, types[first:first+size],
+                            field2[first:first+size], field3[first:first+size])
+                    first += size
 
                 trailerKeys = "/Root", "/Encrypt", "/Info", "/ID"
                 for key in trailerKeys:
                     if key in xrefstream and key not in self.trailer:
                         self.trailer[NameObject(key)] = xrefstream.raw_get(key)
                 if "/Prev" in xrefstream:
-                    startxref = xrefstream["/Prev"]
-                else:
-                    break
+                    self._setPrevXref(xrefstream["/Prev"])
+                return
             else:
                 # bad xref character at startxref.  Let's see if we can find
                 # the xref table nearby, as we've observed this error with an
@@ -1899,25 +2557,58 @@ class PdfFileReader(object):
                     continue
                 # no xref table found at specified location
                 raise utils.PdfReadError("Could not find xref table at specified location")
+
+    def _setPrevXref(self, startxref):
+        # a /Prev chain looping back on itself ends where it repeats
+        if startxref not in self._xrefSeen:
+            self._xrefSeen.add(startxref)
+            self._nextXref = startxref
+
+    def _readPrevXref(self):
+        """
+        Reads the next older cross reference section of a lazily opened
+        document.
+        """
+        loc = self.stream.tell()
+        # the section is corrected on its own, so that the entries already
+        # read are not shifted again, and then goes under the newer ones
+        section = xref.XrefTable()
+        self._readXrefSection(self.stream, section)
+        self._checkXrefIndex(self.stream, section)
+        self.xref.update(section)
+        self.stream.seek(loc, 0)
+
+    def _checkXrefIndex(self, stream, table):
         #if not zero-indexed, verify that the table is correct; change it if necessary
         if self.xrefIndex and not self.strict:
             loc = stream.tell()
-            for gen in self.xref:
+            entries = [e for e in table.entries() if e[2] != xref.COMPRESSED]
+            for gen in sorted(set(e[1] for e in entries)):
                 if gen == 65535: continue
-                for id in self.xref[gen]:
-                    stream.seek(self.xref[gen][id], 0)
-                    try:
-                        pid, pgen = self.readObjectHeader(stream)
-                    except ValueError:
-                        break
-                    if pid == id - self.xrefIndex:
-                        self._zeroXref(gen)
-                        break
-                    #if not, then either it's just plain wrong, or the non-zero-index is actually correct
+                # a generation is checked until the headers tell either way,
+                # later sections just get the same correction
+                zero = self._xrefZeroed.get(gen)
+                if zero is None:
+                    for id, generation, xref_type, offset, _ in entries:
+                        if generation != gen: continue
+                        stream.seek(offset, 0)
+                        try:
+                            pid, pgen = self.readObjectHeader(stream)
+                        except ValueError:
+                            zero = False
+                            break
+                        if pid == id - self.xrefIndex:
+                            zero = True
+                            break
+                        #if not, then either it's just plain wrong, or the non-zero-index is actually correct
+                    if zero is None: continue
+                    self._xrefZeroed[gen] = zero
+                if zero:
+                    self._zeroXref(table, gen)
             stream.seek(loc, 0) #return to where it was
 
-    def _zeroXref(self, generation):
-        self.xref[generation] = dict( (k-self.xrefIndex, v) for (k, v) in list(self.xref[generation].items()) )
+    def _zeroXref(self, table, generation):
+        table.renumber(generation, -self.xrefIndex)
 
     def _pairs(self, array):
         i = 0
@@ -1992,18 +2683,28 @@ class PdfFileReader(object):
         encrypt = self.trailer['/Encrypt'].getObject()
         if encrypt['/Filter'] != '/Standard':
             raise NotImplementedError("only Standard PDF encryption handler is available")
-        if not (encrypt['/V'] in (1, 2)):
-            raise NotImplementedError("only algorithm code 1 and 2 are supported")
+        if not (encrypt['/V'] in (1, 2, 4, 5)):
+            raise NotImplementedError("only algorithm code 1, 2, 4 and 5 are supported")
+        if encrypt['/V'] == 5:
+            result, key = _alg2a(password, encrypt)
+        else:
+            result, key = self._authenticate(password, encrypt)
+        if result:
+            self._decryption_key = key
+            self._stringMethod = _cryptMethod(encrypt, "/StrF")
+            self._streamMethod = _cryptMethod(encrypt, "/StmF")
+            self._encryptMetadata = encrypt.get(
+                "/EncryptMetadata", BooleanObject(True)).getObject().value
+            self._objectKeyCache.clear()
+        return result
+
+    def _authenticate(self, password, encrypt):
         user_password, key = self._authenticateUserPassword(password)
         if user_password:
-            self._decryption_key = key
-            return 1
+            return 1, key
         else:
             rev = encrypt['/R'].getObject()
-            if rev == 2:
-                keylen = 5
-            else:
-                keylen = encrypt['/Length'].getObject() // 8
+            keylen = _keyLength(encrypt)
             key = _alg33_1(password, rev, keylen)
             real_O = encrypt["/O"].getObject()
             if rev == 2:
@@ -2018,9 +2719,8 @@ class PdfFileReader(object):
                 userpass = val
             owner_password, key = self._authenticateUserPassword(userpass)
             if owner_password:
-                self._decryption_key = key
-                return 2
-        return 0
+                return 2, key
+        return 0, None
 
     def _authenticateUserPassword(self, password):
         encrypt = self.trailer['/Encrypt'].getObject()
@@ -2033,13 +2733,77 @@ class PdfFileReader(object):
         if rev == 2:
             U, key = _alg34(password, owner_entry, p_entry, id1_entry)
         elif rev >= 3:
-            U, key = _alg35(password, rev,
-                    encrypt["/Length"].getObject() // 8, owner_entry,
+            U, key = _alg35(password, rev, _keyLength(encrypt), owner_entry,
                     p_entry, id1_entry,
-                    encrypt.get("/EncryptMetadata", BooleanObject(False)).getObject())
+                    encrypt.get("/EncryptMetadata", BooleanObject(True)).getObject().value)
             U, real_U = U[:16], real_U[:16]
         return U == real_U, key
 
+    def extractAllText(self, workers=None, chunkSize=16):
+        """
+        Extracts the text of every page, the way
+        :meth:`PageObject.extractText()<PageObject.extractText>` does, but
+        decoding the strings through the ``/ToUnicode`` CMap or the encoding
+        of their font where it has one.  The map of a font is built once and
+        kept by the reader for all pages using the font.
+
+        :param int workers: Number of processes to extract the text in, each
+            of which opens the file again and takes ``chunkSize`` consecutive
+            pages at a time.  No more processes are started than there are
+            CPUs to run them.  With ``None`` or 1, on a single CPU, or where
+            processes are not available, the pages are extracted in this
+            process.
+        :param int chunkSize: Number of pages handed to a process at once.
+        :return: an iterator over the text of the pages, in order.  Pages are
+            extracted as it is consumed, by processes a few chunks ahead.
+        """
+        numPages = self.getNumPages()
+        if ProcessPoolExecutor is not None and workers is not None:
+            # processes sharing a CPU only add the cost of opening the file
+            # and building the font maps again in each of them
+            workers = min(workers, _availableCpus())
+        if ProcessPoolExecutor is None or workers is None or workers < 2 or \
+                numPages <= chunkSize:
+            return (self.getPage(i)._extractText(self._fontMaps)
+                    for i in range(numPages))
+        return self._extractAllTextInProcesses(workers, chunkSize, numPages)
+
+    def _extractAllTextInProcesses(self, workers, chunkSize, numPages):
+        if isString(self._path) and os.path.isfile(self._path):
+            source = (self._path, None)
+        elif isinstance(self.stream, mmap.mmap):
+            source = (None, self.stream[:])
+        else:
+            self.stream.seek(0, 0)
+            source = (None, self.stream.read())
+        decryption = None
+        if self.isEncrypted and hasattr(self, "_decryption_key"):
+            decryption = (self._decryption_key, self._stringMethod,
+                          self._streamMethod, self._encryptMetadata)
+        chunks = iter([(start, min(start + chunkSize, numPages))
+                       for start in range(0, numPages, chunkSize)])
+        executor = ProcessPoolExecutor(workers, initializer=_textWorkerInit,
+                                       initargs=source + (self.strict, decryption))
+        # keep two chunks per process on the go, no more, so that the text
+        # of a large document isn't all held at once
+        pending = deque()
+        try:
+            for chunk in chunks:
+                pending.append(executor.submit(_textWorkerPages, *chunk))
+                if len(pending) == 2 * workers:
+                    break
+            while pending:
+                texts = pending.popleft().result()
+                chunk = next(chunks, None)
+                if chunk is not None:
+                    pending.append(executor.submit(_textWorkerPages, *chunk))
+                for pageText in texts:
+                    yield pageText
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown()
+
     def getIsEncrypted(self):
         return "/Encrypt" in self.trailer
 
@@ -2051,6 +2815,87 @@ class PdfFileReader(object):
     """
 
 
+def countPages(stream, strict=True):
+    """
+    Returns the number of pages of a PDF file, using
+    :meth:`peekPageCount()<PdfFileReader.peekPageCount>` on a lazily opened,
+    memory-mapped reader.  Only the trailer, the newest cross reference
+    section and the page tree root are read in the common case.
+
+    :param stream: A File object or an object that supports the standard
+        read and seek methods similar to a File object. Could also be a
+        string representing a path to a PDF file.
+    :param bool strict: Passed on to :class:`PdfFileReader<PdfFileReader>`.
+    :rtype: int
+    """
+    reader = PdfFileReader(stream, strict=strict, useMmap=True, lazyXref=True)
+    try:
+        return reader.peekPageCount()
+    finally:
+        if isinstance(reader.stream, mmap.mmap) and reader.stream is not stream:
+            try:
+                reader.stream.close()
+            except BufferError:
+                # stream data still refers to the map; it goes with them
+                pass
+
+
+def countPagesBatch(streams, strict=True, maxWorkers=None):
+    """
+    Returns the page counts of several PDF files, in order, probing the
+    files concurrently with :func:`countPages()<countPages>` on a thread
+    pool.  Errors are raised as for :func:`countPages()<countPages>`.
+
+    :param streams: File paths or file objects.
+    :param bool strict: Passed on to :class:`PdfFileReader<PdfFileReader>`.
+    :param int maxWorkers: Number of threads, see
+        ``concurrent.futures.ThreadPoolExecutor`` (defaults to its default).
+    :rtype: list
+    """
+    streams = list(streams)
+    if ThreadPoolExecutor is None or len(streams) < 2:
+        return [countPages(stream, strict) for stream in streams]
+    with ThreadPoolExecutor(maxWorkers) as executor:
+        return list(executor.map(lambda stream: countPages(stream, strict), streams))
+
+
+def _nodeKey(node):
+    # identifies a page tree node while it is walked: by its reference, as
+    # the node read for it may be freed and its id() reused if the reader
+    # caches it weakly, or else by the id() of a direct node, which the
+    # walk keeps alive along with the key
+    if isinstance(node, IndirectObject):
+        return (node.idnum, node.generation)
+    return id(node)
+
+
+def _availableCpus():
+    # the number of CPUs this process may run on
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+# the reader of a worker process of PdfFileReader.extractAllText
+_textReader = None
+
+
+def _textWorkerInit(path, data, strict, decryption):
+    global _textReader
+    if path is not None:
+        _textReader = PdfFileReader(path, strict=strict, useMmap=True)
+    else:
+        _textReader = PdfFileReader(BytesIO(data), strict=strict)
+    if decryption is not None:
+        (_textReader._decryption_key, _textReader._stringMethod,
+         _textReader._streamMethod, _textReader._encryptMetadata) = decryption
+
+
+def _textWorkerPages(start, stop):
+    return [_textReader.getPage(i)._extractText(_textReader._fontMaps)
+            for i in range(start, stop)]
+
+
 def getRectangle(self, name, defaults):
     retval = self.get(name)
     if isinstance(retval, RectangleObject):
@@ -2589,36 +3434,113 @@ class PageObject(DictionaryObject):
 
         :return: a unicode string object.
         """
-        text = u_("")
+        return self._extractText(None)
+
+    def _extractText(self, fontMaps):
+        # With fontMaps, a cache of the font maps of the document by object,
+        # strings shown in a font that has a map are decoded through it.
+        text = []
         content = self["/Contents"].getObject()
         if not isinstance(content, ContentStream):
             content = ContentStream(content, self.pdf)
-        # Note: we check all strings are TextStringObjects.  ByteStringObjects
-        # are strings where the byte->string encoding was unknown, so adding
-        # them to the text here would be gibberish.
-        for operands, operator in content.operations:
-            if operator == b_("Tj"):
-                _text = operands[0]
-                if isinstance(_text, TextStringObject):
-                    text += _text
-            elif operator == b_("T*"):
-                text += "\n"
-            elif operator == b_("'"):
-                text += "\n"
-                _text = operands[0]
-                if isinstance(_text, TextStringObject):
-                    text += operands[0]
-            elif operator == b_('"'):
-                _text = operands[2]
-                if isinstance(_text, TextStringObject):
-                    text += "\n"
-                    text += _text
-            elif operator == b_("TJ"):
+        showText, nextLine, moveShowText, moveShowTextSpaced, showTexts = \
+            b_("Tj"), b_("T*"), b_("'"), b_('"'), b_("TJ")
+        setFont, save, restore = b_("Tf"), b_("q"), b_("Q")
+        fonts = None
+        # the maps of the fonts the page has used so far, by name
+        pageMaps = {}
+        currentMap = None
+        savedMaps = []
+
+        def show(string):
+            # Note: without a map, we check all strings are
+            # TextStringObjects.  ByteStringObjects are strings where the
+            # byte->string encoding was unknown, so adding them to the text
+            # here would be gibberish.
+            if currentMap is not None:
+                raw = None
+                if isinstance(string, ByteStringObject):
+                    raw = string
+                elif isinstance(string, TextStringObject) and \
+                        (string.autodetect_utf16 or
+                         string.autodetect_pdfdocencoding):
+                    # a TextStringObject that wasn't read from the file has
+                    # no original bytes, and one edited since may not encode
+                    try:
+                        raw = string.original_bytes
+                    except UnicodeEncodeError:
+                        pass
+                if raw is not None:
+                    text.append(currentMap.decode(raw))
+                    return
+            if isinstance(string, TextStringObject):
+                text.append(string)
+
+        for operands, operator in content.iterOperations():
+            if operator == showText:
+                show(operands[0])
+            elif operator == nextLine:
+                text.append("\n")
+            elif operator == moveShowText:
+                text.append("\n")
+                show(operands[0])
+            elif operator == moveShowTextSpaced:
+                if currentMap is not None or isinstance(operands[2], TextStringObject):
+                    text.append("\n")
+                show(operands[2])
+            elif operator == showTexts:
                 for i in operands[0]:
-                    if isinstance(i, TextStringObject):
-                        text += i
-                text += "\n"
-        return text
+                    show(i)
+                text.append("\n")
+            elif fontMaps is None:
+                continue
+            elif operator == setFont and operands:
+                name = operands[0]
+                if name not in pageMaps:
+                    if fonts is None:
+                        fonts = self._fonts()
+                    pageMaps[name] = self._fontMap(fonts, name, fontMaps)
+                currentMap = pageMaps[name]
+            elif operator == save:
+                savedMaps.append(currentMap)
+            elif operator == restore and savedMaps:
+                currentMap = savedMaps.pop()
+        # joined once: appending to a str is quadratic when the pieces are
+        # TextStringObjects rather than plain strs
+        return u_("").join(text)
+
+    def _fonts(self):
+        # the /Font resources of the page
+        resources = self.get("/Resources")
+        if resources is not None:
+            fonts = resources.getObject().get("/Font")
+            if fonts is not None and isinstance(fonts.getObject(), DictionaryObject):
+                return fonts.getObject()
+        return DictionaryObject()
+
+    def _fontMap(self, fonts, name, fontMaps):
+        # the map of the font of the page's resources called name, from the
+        # cache if the font is an indirect object; None if it has none
+        if name not in fonts:
+            return None
+        font = fonts.raw_get(name)
+        key = None
+        if isinstance(font, IndirectObject):
+            key = (font.idnum, font.generation)
+            cached = fontMaps.get(key)
+            if cached is not None:
+                return cached or None
+            font = font.getObject()
+        result = None
+        if isinstance(font, DictionaryObject):
+            try:
+                result = fontMap(font)
+            except (utils.PdfReadError, ValueError):
+                warnings.warn("Could not read the text map of font %s" % name,
+                              utils.PdfReadWarning)
+        if key is not None:
+            fontMaps[key] = result or False
+        return result
 
     mediaBox = createRectangleAccessor("/MediaBox", ())
     """
@@ -2657,105 +3579,203 @@ class PageObject(DictionaryObject):
     """
 
 
+# The number of colour components of the colour spaces an inline image may
+# name directly, under their abbreviated and full names.
+_INLINE_IMAGE_COMPONENTS = {
+    "/G": 1, "/DeviceGray": 1, "/RGB": 3, "/DeviceRGB": 3,
+    "/CMYK": 4, "/DeviceCMYK": 4, "/I": 1, "/Indexed": 1}
+# What may follow the "EI" at the end of an inline image whose length is
+# known: white-space, or the end of the content stream.
+_INLINE_IMAGE_END = re.compile(b_(r"[ \n\r\t\x00]|\Z"))
+# An "EI" found by scanning only ends the image if it is followed by
+# white-space and then by a "Q", by the end of the stream, or by 16 bytes of
+# text (more content stream operations rather than binary image data).
+_INLINE_IMAGE_SCANNED_END = re.compile(b_(
+    r"[ \n\r\t\x00]+(?:Q|[\t\n\r\x0c -~]{16}|[\t\n\r\x0c -~]*\Z)|\Z"))
+
+
+def _inlineImageSetting(settings, short, name, default=None):
+    # inline image dictionaries may use abbreviated keys
+    value = settings.get(short, settings.get(name, default))
+    if isinstance(value, IndirectObject):
+        return default
+    return value
+
+
+def _inlineImageLength(settings):
+    # the length of the data of an unfiltered inline image, or None if the
+    # dictionary doesn't tell it
+    width = _inlineImageSetting(settings, "/W", "/Width")
+    height = _inlineImageSetting(settings, "/H", "/Height")
+    if not isinstance(width, NumberObject) or not isinstance(height, NumberObject):
+        return None
+    mask = _inlineImageSetting(settings, "/IM", "/ImageMask")
+    if isinstance(mask, BooleanObject) and mask.value:
+        bits, components = 1, 1
+    else:
+        bits = _inlineImageSetting(settings, "/BPC", "/BitsPerComponent")
+        colorSpace = _inlineImageSetting(settings, "/CS", "/ColorSpace")
+        if isinstance(colorSpace, ArrayObject) and len(colorSpace) > 0:
+            colorSpace = colorSpace[0]
+        if not isinstance(bits, NumberObject) or \
+                colorSpace not in _INLINE_IMAGE_COMPONENTS:
+            return None
+        components = _INLINE_IMAGE_COMPONENTS[colorSpace]
+    # each row is padded to a whole number of bytes
+    return height * ((width * components * bits + 7) // 8)
+
+
+def _inlineImageEnd(settings, data, start):
+    # The position of the "EI" closing the inline image whose data begins at
+    # data[start].  The data itself may contain "EI", so where possible the
+    # end is told from the image's length or its filter's end-of-data
+    # marker, and otherwise each "EI" found is checked against what follows.
+    filters = _inlineImageSetting(settings, "/F", "/Filter")
+    if isinstance(filters, ArrayObject):
+        filters = filters[0] if len(filters) > 0 else None
+    end = -1
+    if filters is None:
+        length = _inlineImageLength(settings)
+        if length is not None and 0 <= length <= len(data) - start:
+            end = start + length
+    elif filters in ("/AHx", "/ASCIIHexDecode"):
+        end = data.find(b_(">"), start)
+        end = -1 if end == -1 else end + 1
+    elif filters in ("/A85", "/ASCII85Decode"):
+        end = data.find(b_("~>"), start)
+        end = -1 if end == -1 else end + 2
+    if end != -1:
+        end = WhitespacePattern.match(data, end).end()
+        if data[end:end + 2] == b_("EI") and \
+                _INLINE_IMAGE_END.match(data, end + 2):
+            return end
+    end = data.find(b_("EI"), start)
+    while end != -1:
+        if _INLINE_IMAGE_SCANNED_END.match(data, end + 2):
+            return end
+        end = data.find(b_("EI"), end + 1)
+    raise utils.PdfStreamError("Stream has ended unexpectedly")
+
+
 class ContentStream(DecodedStreamObject):
+    """
+    The content stream of a page, as a sequence of ``(operands, operator)``
+    pairs.
+
+    The stream is parsed lazily: :meth:`iterOperations()<iterOperations>`
+    reads the operations as they are asked for, and the
+    :attr:`operations` list is only built when it is accessed, for instance
+    to modify it.  Until then the stream is written out unchanged.
+    """
     def __init__(self, stream, pdf):
         self.pdf = pdf
-        self.operations = []
+        self._operations = None
         # stream may be a StreamObject or an ArrayObject containing
         # multiple StreamObjects to be cat'd together.
         stream = stream.getObject()
         if isinstance(stream, ArrayObject):
-            data = b_("")
-            for s in stream:
-                data += s.getObject().getData()
-            stream = BytesIO(b_(data))
+            data = b_("").join([b_(s.getObject().getData()) for s in stream])
         else:
-            stream = BytesIO(b_(stream.getData()))
-        self.__parseContentStream(stream)
+            data = b_(stream.getData())
+        self._content = data
+
+    def iterOperations(self):
+        """
+        Iterates over the ``(operands, operator)`` pairs of the content
+        stream, parsing each one only when it is reached.  Inline images are
+        yielded as ``({"settings": ..., "data": ...}, b"INLINE IMAGE")``.
+        """
+        if self._operations is not None:
+            return iter(self._operations)
+        return self.__parseContentStream(self._content)
+
+    def _getOperations(self):
+        if self._operations is None:
+            self._operations = list(self.__parseContentStream(self._content))
+            self._content = None
+        return self._operations
 
-    def __parseContentStream(self, stream):
-        # file("f:\\tmp.txt", "w").write(stream.read())
-        stream.seek(0, 0)
+    def _setOperations(self, operations):
+        self._operations = operations
+        self._content = None
+
+    operations = property(_getOperations, _setOperations)
+    """
+    The list of ``(operands, operator)`` pairs of the content stream, parsed
+    on first access.  Changes to it are written out with the stream.
+    """
+
+    def __parseContentStream(self, data):
+        # The whole content stream is tokenized in one pass over the bytes;
+        # only inline images still go through a stream.
+        match = ContentTokenPattern.match
+        beginImage = b_("BI")
+        comment = b_('%')
+        pos = 0
         operands = []
         while True:
-            peek = readNonWhitespace(stream)
-            if peek == b_('') or ord_(peek) == 0:
-                break
-            stream.seek(-1, 1)
-            if peek.isalpha() or peek == b_("'") or peek == b_('"'):
-                operator = utils.readUntilRegex(stream,
-                        NameObject.delimiterPattern, True)
-                if operator == b_("BI"):
+            m = match(data, pos)
+            kind = m.lastgroup
+            if kind is None:
+                # not a name, number or operator, or the end of the data
+                pos = m.end()
+                peek = data[pos:pos + 1]
+                if not peek:
+                    break
+                elif peek == comment:
+                    # If we encounter a comment in the content stream, we have to
+                    # handle it here.  Typically, readObject will handle
+                    # encountering a comment -- but readObject assumes that
+                    # following the comment must be the object we're trying to
+                    # read.  In this case, it could be an operator instead.
+                    pos = CommentPattern.match(data, pos).end()
+                else:
+                    operand, pos = readObjectFromBuffer(data, pos, None)
+                    operands.append(operand)
+            elif kind == 'op':
+                operator = m.group(kind)
+                pos = m.end()
+                if operator == beginImage:
                     # begin inline image - a completely different parsing
                     # mechanism is required, of course... thanks buddy...
                     assert operands == []
-                    ii = self._readInlineImage(stream)
-                    self.operations.append((ii, b_("INLINE IMAGE")))
+                    ii, pos = self._readInlineImage(data, pos)
+                    yield (ii, b_("INLINE IMAGE"))
                 else:
-                    self.operations.append((operands, operator))
+                    yield (operands, operator)
                     operands = []
-            elif peek == b_('%'):
-                # If we encounter a comment in the content stream, we have to
-                # handle it here.  Typically, readObject will handle
-                # encountering a comment -- but readObject assumes that
-                # following the comment must be the object we're trying to
-                # read.  In this case, it could be an operator instead.
-                while peek not in (b_('\r'), b_('\n')):
-                    peek = stream.read(1)
             else:
-                operands.append(readObject(stream, None))
+                operand, pos = readTokenObject(data, m, None)
+                operands.append(operand)
 
-    def _readInlineImage(self, stream):
+    def _readInlineImage(self, data, pos):
         # begin reading just after the "BI" - begin image
         # first read the dictionary of settings.
         settings = DictionaryObject()
         while True:
-            tok = readNonWhitespace(stream)
-            stream.seek(-1, 1)
+            pos = WhitespacePattern.match(data, pos).end()
+            tok = data[pos:pos + 1]
             if tok == b_("I"):
                 # "ID" - begin of image data
                 break
-            key = readObject(stream, self.pdf)
-            tok = readNonWhitespace(stream)
-            stream.seek(-1, 1)
-            value = readObject(stream, self.pdf)
+            elif not tok:
+                raise utils.PdfStreamError("Stream has ended unexpectedly")
+            key, pos = readObjectFromBuffer(data, pos, self.pdf)
+            pos = WhitespacePattern.match(data, pos).end()
+            value, pos = readObjectFromBuffer(data, pos, self.pdf)
             settings[key] = value
-        # left at beginning of ID
-        tmp = stream.read(3)
-        assert tmp[:2] == b_("ID")
-        data = b_("")
-        while True:
-            # Read the inline image, while checking for EI (End Image) operator.
-            tok = stream.read(1)
-            if tok == b_("E"):
-                # Check for End Image
-                tok2 = stream.read(1)
-                if tok2 == b_("I"):
-                    # Data can contain EI, so check for the Q operator.
-                    tok3 = stream.read(1)
-                    info = tok + tok2
-                    # We need to find whitespace between EI and Q.
-                    has_q_whitespace = False
-                    while tok3 in utils.WHITESPACES:
-                        has_q_whitespace = True
-                        info += tok3
-                        tok3 = stream.read(1)
-                    if tok3 == b_("Q") and has_q_whitespace:
-                        stream.seek(-1, 1)
-                        break
-                    else:
-                        stream.seek(-1,1)
-                        data += info
-                else:
-                    stream.seek(-1, 1)
-                    data += tok
-            else:
-                data += tok
-        return {"settings": settings, "data": data}
+        # left at beginning of ID, which is followed by a single white-space
+        assert data[pos:pos + 2] == b_("ID")
+        start = pos + 3
+        end = _inlineImageEnd(settings, data, start)
+        return {"settings": settings, "data": data[start:end]}, end + 2
 
     def _getData(self):
+        if self._operations is None:
+            # never parsed into a list, so nothing can have changed
+            return self._content
         newdata = BytesIO()
-        for operands, operator in self.operations:
+        for operands, operator in self._operations:
             if operator == b_("INLINE IMAGE"):
                 newdata.write(b_("BI"))
                 dicttext = BytesIO()
@@ -2773,7 +3793,8 @@ class ContentStream(DecodedStreamObject):
         return newdata.getvalue()
 
     def _setData(self, value):
-        self.__parseContentStream(BytesIO(b_(value)))
+        self._content = b_(value)
+        self._operations = None
 
     _data = property(_getData, _setData)
 
@@ -2855,6 +3876,64 @@ _encryption_padding = b_('\x28\xbf\x4e\x5e\x4e\x75\x8a\x41\x64\x00\x4e\x56') + \
         b_('\xa9\xfe\x64\x53\x69\x7a')
 
 
+# Implementation of algorithm 3.1 of the PDF standard security handler,
+# section 3.5.1 of the PDF 1.6 reference: the key of a single object, for RC4
+# or, with aes, for the AESV2 crypt filter.
+def _alg31(key, idnum, generation, aes=False):
+    pack1 = struct.pack("<i", idnum)[:3]
+    pack2 = struct.pack("<i", generation)[:2]
+    salt = b_("sAlT") if aes else b_("")
+    md5_hash = md5(key + pack1 + pack2 + salt).digest()
+    return md5_hash[:min(16, len(key) + 5)]
+
+
+def _objectKey(key, method, idnum, generation):
+    # the key of an object for the crypt filter method (/CFM) given, or None
+    # if the object is not encrypted with it
+    if method == "/V2":
+        return _alg31(key, idnum, generation)
+    elif method == "/AESV2":
+        return security.AESKey(_alg31(key, idnum, generation, aes=True))
+    elif method == "/AESV3":
+        # revisions 5 and 6 use the file key for every object
+        return security.AESKey(key)
+    return None
+
+
+def _cryptMethod(encrypt, name):
+    # the method of the crypt filter the encryption dictionary entry name
+    # (/StmF or /StrF) refers to; RC4 before version 4 of the handler
+    if encrypt["/V"] < 4:
+        return "/V2"
+    filterName = encrypt.get(name, "/Identity")
+    if filterName == "/Identity":
+        return None
+    cryptFilter = encrypt.get("/CF", {}).get(filterName)
+    if cryptFilter is None:
+        raise utils.PdfReadError("crypt filter %s is not defined" % filterName)
+    method = cryptFilter.get("/CFM", "/None")
+    if method not in ("/None", "/V2", "/AESV2", "/AESV3"):
+        raise NotImplementedError("crypt filter method %s is not supported" % method)
+    return None if method == "/None" else method
+
+
+def _keyLength(encrypt):
+    # the length of the file key in bytes, for revisions 2 to 4
+    if encrypt["/R"] == 2:
+        return 5
+    length = encrypt.get("/Length", 40)
+    if encrypt["/V"] == 4:
+        method = _cryptMethod(encrypt, "/StmF")
+        if method == "/AESV2":
+            return 16
+        cryptFilter = encrypt.get("/CF", {}).get(encrypt.get("/StmF"), {})
+        length = cryptFilter.get("/Length", length)
+        if length <= 16:
+            # given in bytes, as Acrobat writes it
+            length *= 8
+    return length // 8
+
+
 # Implementation of algorithm 3.2 of the PDF standard security handler,
 # section 3.5.2 of the PDF 1.6 reference.
 def _alg32(password, rev, keylen, owner_entry, p_entry, id1_entry, metadata_encrypt=True):
@@ -2873,14 +3952,14 @@ def _alg32(password, rev, keylen, owner_entry, p_entry, id1_entry, metadata_encr
     m.update(owner_entry.original_bytes)
     # 4. Treat the value of the /P entry as an unsigned 4-byte integer and pass
     # these bytes to the MD5 hash function, low-order byte first.
-    p_entry = struct.pack('<i', p_entry)
+    p_entry = struct.pack('<I', p_entry & 0xffffffff)
     m.update(p_entry)
     # 5. Pass the first element of the file's file identifier array to the MD5
     # hash function.
     m.update(id1_entry.original_bytes)
-    # 6. (Revision 3 or greater) If document metadata is not being encrypted,
+    # 6. (Revision 4 or greater) If document metadata is not being encrypted,
     # pass 4 bytes with the value 0xFFFFFFFF to the MD5 hash function.
-    if rev >= 3 and not metadata_encrypt:
+    if rev >= 4 and not metadata_encrypt:
         m.update(b_("\xff\xff\xff\xff"))
     # 7. Finish the hash.
     md5_hash = m.digest()
@@ -2970,7 +4049,8 @@ def _alg34(password, owner_entry, p_entry, id1_entry):
 def _alg35(password, rev, keylen, owner_entry, p_entry, id1_entry, metadata_encrypt):
     # 1. Create an encryption key based on the user password string, as
     # described in Algorithm 3.2.
-    key = _alg32(password, rev, keylen, owner_entry, p_entry, id1_entry)
+    key = _alg32(password, rev, keylen, owner_entry, p_entry, id1_entry,
+                 metadata_encrypt)
     # 2. Initialize the MD5 hash function and pass the 32-byte padding string
     # shown in step 1 of Algorithm 3.2 as input to this function.
     m = md5()
@@ -3002,3 +4082,62 @@ def _alg35(password, rev, keylen, owner_entry, p_entry, id1_entry, metadata_encr
     # mean, so I have used null bytes.  This seems to match a few other
     # people's implementations)
     return val + (b_('\x00') * 16), key
+
+
+# Revisions 5 and 6 of the standard security handler, with 256 bit AES keys,
+# after section 7.6.4.3 of ISO 32000-2.
+def _aesPassword(password):
+    # passwords are UTF-8, of at most 127 bytes
+    if not isinstance(password, bytes):
+        password = password.encode("utf-8")
+    return password[:127]
+
+
+# Implementation of algorithm 2.B of ISO 32000-2: the hash of a password for
+# revision 6; revision 5 uses plain SHA-256.
+def _alg2b(password, salt, udata, rev):
+    k = sha256(password + salt + udata).digest()
+    if rev < 6:
+        return k
+    i = 0
+    while True:
+        e = security.cbcEncrypt(k[:16], k[16:32], (password + k + udata) * 64)
+        k = (sha256, sha384, sha512)[sum(bytearray(e[:16])) % 3](e).digest()
+        i += 1
+        if i >= 64 and bytearray(e[-1:])[0] <= i - 32:
+            return k[:32]
+
+
+# Implementation of algorithm 2.A of ISO 32000-2: authenticates the password
+# as the user or the owner password and retrieves the file key.
+def _alg2a(password, encrypt):
+    password = _aesPassword(password)
+    rev = encrypt["/R"]
+    O = encrypt["/O"].original_bytes[:48]
+    U = encrypt["/U"].original_bytes[:48]
+    zero = b_("\x00") * 16
+    if _alg2b(password, U[32:40], b_(""), rev) == U[:32]:
+        key = _alg2b(password, U[40:48], b_(""), rev)
+        return 1, security.cbcDecrypt(key, zero, encrypt["/UE"].original_bytes[:32])
+    if _alg2b(password, O[32:40], U, rev) == O[:32]:
+        key = _alg2b(password, O[40:48], U, rev)
+        return 2, security.cbcDecrypt(key, zero, encrypt["/OE"].original_bytes[:32])
+    return 0, None
+
+
+# Implementation of algorithms 8 to 10 of ISO 32000-2, for revision 6: a new
+# file key and the /O, /U, /OE, /UE and /Perms entries protecting it.
+def _alg8to10(user_pwd, owner_pwd, p_entry):
+    user_pwd = _aesPassword(user_pwd)
+    owner_pwd = _aesPassword(owner_pwd)
+    key = os.urandom(32)
+    zero = b_("\x00") * 16
+    salts = os.urandom(16)
+    U = _alg2b(user_pwd, salts[:8], b_(""), 6) + salts
+    UE = security.cbcEncrypt(_alg2b(user_pwd, salts[8:], b_(""), 6), zero, key)
+    salts = os.urandom(16)
+    O = _alg2b(owner_pwd, salts[:8], U, 6) + salts
+    OE = security.cbcEncrypt(_alg2b(owner_pwd, salts[8:], U, 6), zero, key)
+    perms = struct.pack("<I", p_entry & 0xffffffff) + b_("\xff\xff\xff\xffTadb") + os.urandom(4)
+    perms = security.cbcEncrypt(key, zero, perms)
+    return key, O, U, OE, UE, perms
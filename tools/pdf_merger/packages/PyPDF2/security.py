@@ -0,0 +1,237 @@
+"""
+Ciphers of the standard security handler: RC4 (see
+:func:`utils.RC4_encrypt()<PyPDF2.utils.RC4_encrypt>`) and AES, the latter
+in CBC mode with a leading initialization vector and PKCS#5 padding, as the
+AESV2 and AESV3 crypt filters use it for strings and streams.
+
+AES goes through the ``cryptography`` package when it is installed.
+Otherwise a table-driven pure Python implementation is used, which deciphers
+all the blocks of a string or stream in one pass and applies the chaining
+to all of them at once.
+"""
+
+import os
+import struct
+from .utils import RC4_encrypt, b_, _toInt, _fromInt
+
+try:
+    from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+except ImportError:
+    Cipher = None
+
+
+class AESKey(bytes):
+    """
+    The key of an object encrypted with AES rather than RC4.
+    """
+    pass
+
+
+def encrypt(key, data):
+    """
+    Encrypts a string or stream of an object with the object's key: with
+    AES for an :class:`AESKey`, with RC4 for any other key.
+    """
+    if isinstance(key, AESKey):
+        return aesEncrypt(key, data)
+    return RC4_encrypt(key, data)
+
+
+def decrypt(key, data):
+    """
+    Decrypts a string or stream of an object, like :func:`encrypt`.
+    """
+    if isinstance(key, AESKey):
+        return aesDecrypt(key, data)
+    return RC4_encrypt(key, data)
+
+
+def aesEncrypt(key, data):
+    """
+    Encrypts data with AES in CBC mode under a random initialization vector,
+    which comes first in the result, padding it to whole blocks.
+    """
+    iv = os.urandom(16)
+    pad = 16 - len(data) % 16
+    return iv + cbcEncrypt(key, iv, bytes(data) + b_(chr(pad)) * pad)
+
+
+def aesDecrypt(key, data):
+    """
+    Decrypts data encrypted by :func:`aesEncrypt`.  A partial last block is
+    ignored, and so is padding that is not valid.
+    """
+    end = len(data) - len(data) % 16
+    if end < 32:
+        return b_("")
+    data = cbcDecrypt(key, data[:16], data[16:end])
+    pad = bytearray(data[-1:])[0]
+    if 1 <= pad <= 16 and data[-pad:] == b_(chr(pad)) * pad:
+        data = data[:-pad]
+    return data
+
+
+def cbcEncrypt(key, iv, data):
+    """
+    Encrypts whole blocks of data with AES in CBC mode, without padding.
+    """
+    if Cipher is not None:
+        encryptor = Cipher(algorithms.AES(bytes(key)), modes.CBC(bytes(iv))).encryptor()
+        return encryptor.update(bytes(data)) + encryptor.finalize()
+    rk, rounds = _keySchedule(key)
+    words = struct.unpack(">%dI" % (len(data) // 4), data)
+    out = []
+    s0, s1, s2, s3 = struct.unpack(">4I", iv)
+    for i in range(0, len(words), 4):
+        s0, s1, s2, s3 = _encryptBlock(rk, rounds, s0 ^ words[i], s1 ^ words[i + 1],
+                                       s2 ^ words[i + 2], s3 ^ words[i + 3])
+        out += (s0, s1, s2, s3)
+    return struct.pack(">%dI" % len(out), *out)
+
+
+def cbcDecrypt(key, iv, data):
+    """
+    Decrypts whole blocks of data with AES in CBC mode, without removing
+    padding.
+    """
+    if Cipher is not None:
+        decryptor = Cipher(algorithms.AES(bytes(key)), modes.CBC(bytes(iv))).decryptor()
+        return decryptor.update(bytes(data)) + decryptor.finalize()
+    dk, rounds = _inverseKeySchedule(key)
+    count = len(data) // 4
+    words = struct.unpack(">%dI" % count, data)
+    out = []
+    for i in range(0, count, 4):
+        out += _decryptBlock(dk, rounds, words[i], words[i + 1],
+                             words[i + 2], words[i + 3])
+    # the chaining for all blocks at once: each deciphered block is XORed
+    # with the block of ciphertext before it
+    length = 4 * count
+    out = struct.pack(">%dI" % count, *out)
+    chain = bytes(iv) + bytes(data[:length - 16])
+    return _fromInt(_toInt(out) ^ _toInt(chain), length)
+
+
+# S-boxes and lookup tables, each table entry being a column of a round's
+# output for one byte of its input
+def _xtime(x):
+    return ((x << 1) ^ 0x11b) if x & 0x80 else (x << 1)
+
+
+def _mul(x, y):
+    product = 0
+    while y:
+        if y & 1:
+            product ^= x
+        x = _xtime(x)
+        y >>= 1
+    return product
+
+
+def _makeTables():
+    exp, log = [0] * 255, [0] * 256
+    x = 1
+    for i in range(255):
+        exp[i] = x
+        log[x] = i
+        x ^= _xtime(x)
+    sbox, inverse = [0] * 256, [0] * 256
+    for a in range(256):
+        b = exp[-log[a] % 255] if a else 0
+        s = b
+        for shift in range(1, 5):
+            s ^= ((b << shift) | (b >> (8 - shift))) & 0xff
+        s ^= 0x63
+        sbox[a] = s
+        inverse[s] = a
+    te, td = [[0] * 256 for i in range(4)], [[0] * 256 for i in range(4)]
+    for a in range(256):
+        s = sbox[a]
+        word = _mul(s, 2) << 24 | s << 16 | s << 8 | _mul(s, 3)
+        s = inverse[a]
+        iword = _mul(s, 14) << 24 | _mul(s, 9) << 16 | _mul(s, 13) << 8 | _mul(s, 11)
+        for t in range(4):
+            te[t][a] = word
+            td[t][a] = iword
+            word = (word >> 8) | ((word & 0xff) << 24)
+            iword = (iword >> 8) | ((iword & 0xff) << 24)
+    return sbox, inverse, te, td
+
+_SBOX, _INVERSE_SBOX, _TE, _TD = _makeTables()
+
+
+def _keySchedule(key):
+    # returns the round keys as 32 bit words, and the number of rounds
+    S = _SBOX
+    nk = len(key) // 4
+    rounds = nk + 6
+    w = list(struct.unpack(">%dI" % nk, key))
+    rcon = 1
+    for i in range(nk, 4 * (rounds + 1)):
+        t = w[i - 1]
+        if i % nk == 0:
+            t = (S[(t >> 16) & 255] << 24 | S[(t >> 8) & 255] << 16 |
+                 S[t & 255] << 8 | S[t >> 24]) ^ (rcon << 24)
+            rcon = _xtime(rcon)
+        elif nk > 6 and i % nk == 4:
+            t = (S[t >> 24] << 24 | S[(t >> 16) & 255] << 16 |
+                 S[(t >> 8) & 255] << 8 | S[t & 255])
+        w.append(w[i - nk] ^ t)
+    return w, rounds
+
+
+def _inverseKeySchedule(key):
+    # the round keys in reverse order, with InvMixColumns applied to all but
+    # the first and last, for the equivalent inverse cipher
+    w, rounds = _keySchedule(key)
+    S = _SBOX
+    Td0, Td1, Td2, Td3 = _TD
+    dk = w[4 * rounds:]
+    for r in range(rounds - 1, 0, -1):
+        for t in w[4 * r:4 * r + 4]:
+            dk.append(Td0[S[t >> 24]] ^ Td1[S[(t >> 16) & 255]] ^
+                      Td2[S[(t >> 8) & 255]] ^ Td3[S[t & 255]])
+    dk += w[:4]
+    return dk, rounds
+
+
+def _encryptBlock(rk, rounds, s0, s1, s2, s3):
+    Te0, Te1, Te2, Te3 = _TE
+    s0 ^= rk[0]
+    s1 ^= rk[1]
+    s2 ^= rk[2]
+    s3 ^= rk[3]
+    for k in range(4, 4 * rounds, 4):
+        s0, s1, s2, s3 = (
+            Te0[s0 >> 24] ^ Te1[(s1 >> 16) & 255] ^ Te2[(s2 >> 8) & 255] ^ Te3[s3 & 255] ^ rk[k],
+            Te0[s1 >> 24] ^ Te1[(s2 >> 16) & 255] ^ Te2[(s3 >> 8) & 255] ^ Te3[s0 & 255] ^ rk[k + 1],
+            Te0[s2 >> 24] ^ Te1[(s3 >> 16) & 255] ^ Te2[(s0 >> 8) & 255] ^ Te3[s1 & 255] ^ rk[k + 2],
+            Te0[s3 >> 24] ^ Te1[(s0 >> 16) & 255] ^ Te2[(s1 >> 8) & 255] ^ Te3[s2 & 255] ^ rk[k + 3])
+    S = _SBOX
+    k = 4 * rounds
+    return (
+        (S[s0 >> 24] << 24 | S[(s1 >> 16) & 255] << 16 | S[(s2 >> 8) & 255] << 8 | S[s3 & 255]) ^ rk[k],
+        (S[s1 >> 24] << 24 | S[(s2 >> 16) & 255] << 16 | S[(s3 >> 8) & 255] << 8 | S[s0 & 255]) ^ rk[k + 1],
+        (S[s2 >> 24] << 24 | S[(s3 >> 16) & 255] << 16 | S[(s0 >> 8) & 255] << 8 | S[s1 & 255]) ^ rk[k + 2],
+        (S[s3 >> 24] << 24 | S[(s0 >> 16) & 255] << 16 | S[(s1 >> 8) & 255] << 8 | S[s2 & 255]) ^ rk[k + 3])
+
+
+def _decryptBlock(dk, rounds, s0, s1, s2, s3):
+    Td0, Td1, Td2, Td3 = _TD
+    s0 ^= dk[0]
+    s1 ^= dk[1]
+    s2 ^= dk[2]
+    s3 ^= dk[3]
+    for k in range(4, 4 * rounds, 4):
+        s0, s1, s2, s3 = (
+            Td0[s0 >> 24] ^ Td1[(s3 >> 16) & 255] ^ Td2[(s2 >> 8) & 255] ^ Td3[s1 & 255] ^ dk[k],
+            Td0[s1 >> 24] ^ Td1[(s0 >> 16) & 255] ^ Td2[(s3 >> 8) & 255] ^ Td3[s2 & 255] ^ dk[k + 1],
+            Td0[s2 >> 24] ^ Td1[(s1 >> 16) & 255] ^ Td2[(s0 >> 8) & 255] ^ Td3[s3 & 255] ^ dk[k + 2],
+            Td0[s3 >> 24] ^ Td1[(s2 >> 16) & 255] ^ Td2[(s1 >> 8) & 255] ^ Td3[s0 & 255] ^ dk[k + 3])
+    S = _INVERSE_SBOX
+    k = 4 * rounds
+    return (
+        (S[s0 >> 24] << 24 | S[(s3 >> 16) & 255] << 16 | S[(s2 >> 8) & 255] << 8 | S[s1 & 255]) ^ dk[k],
+        (S[s1 >> 24] << 24 | S[(s0 >> 16) & 255] << 16 | S[(s3 >> 8) & 255] << 8 | S[s2 & 255]) ^ dk[k + 1],
+        (S[s2 >> 24] << 24 | S[(s1 >> 16) & 255] << 16 | S[(s0 >> 8) & 255] << 8 | S[s3 & 255]) ^ dk[k + 2],
+        (S[s3 >> 24] << 24 | S[(s2 >> 16) & 255] << 16 | S[(s1 >> 8) & 255] << 8 | S[s0 & 255]) ^ dk[k + 3])
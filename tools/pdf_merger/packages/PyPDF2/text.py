@@ -0,0 +1,247 @@
+"""
+Decoding of the strings shown by content streams.  A :class:`FontMap` maps
+the character codes of one font to Unicode, as told by the font's
+``/ToUnicode`` CMap or, for simple fonts, by its ``/Encoding``.
+
+Building a map parses the font's CMap, so readers keep the maps of the
+fonts they have seen (see
+:meth:`PdfFileReader.extractAllText()<PyPDF2.PdfFileReader.extractAllText>`)
+and share them between the pages using the same font.
+"""
+
+import binascii
+import re
+import struct
+from .generic import ArrayObject, DictionaryObject, NameObject, NumberObject, StreamObject
+from .utils import b_, u_
+
+
+# glyph names of the printable ASCII characters and of some common
+# typographic ones, for the /Differences of simple fonts; names of a single
+# character and uniXXXX names are understood as well
+_GLYPH_NAMES = {
+    "/space": " ", "/exclam": "!", "/quotedbl": '"', "/numbersign": "#",
+    "/dollar": "$", "/percent": "%", "/ampersand": "&", "/quotesingle": "'",
+    "/parenleft": "(", "/parenright": ")", "/asterisk": "*", "/plus": "+",
+    "/comma": ",", "/hyphen": "-", "/period": ".", "/slash": "/",
+    "/zero": "0", "/one": "1", "/two": "2", "/three": "3", "/four": "4",
+    "/five": "5", "/six": "6", "/seven": "7", "/eight": "8", "/nine": "9",
+    "/colon": ":", "/semicolon": ";", "/less": "<", "/equal": "=",
+    "/greater": ">", "/question": "?", "/at": "@", "/bracketleft": "[",
+    "/backslash": "\\", "/bracketright": "]", "/asciicircum": "^",
+    "/underscore": "_", "/grave": "`", "/braceleft": "{", "/bar": "|",
+    "/braceright": "}", "/asciitilde": "~",
+    "/fi": "fi", "/fl": "fl", "/ff": "ff", "/ffi": "ffi", "/ffl": "ffl",
+    "/quoteleft": u_("\u2018"), "/quoteright": u_("\u2019"),
+    "/quotedblleft": u_("\u201c"), "/quotedblright": u_("\u201d"),
+    "/endash": u_("\u2013"), "/emdash": u_("\u2014"),
+    "/bullet": u_("\u2022"), "/ellipsis": u_("\u2026"),
+    "/nbspace": u_("\u00a0"),
+}
+
+# the codecs standing in for the base encodings of simple fonts
+_ENCODINGS = {
+    "/WinAnsiEncoding": "cp1252",
+    "/MacRomanEncoding": "mac_roman",
+    "/StandardEncoding": "latin-1",
+}
+
+# tokens of a CMap: hex strings, names, arrays and the section keywords
+_CMAP_TOKENS = re.compile(b_(
+    r"<(?P<hex>[0-9A-Fa-f\s]*)>|(?P<name>/[^\s()<>\[\]{}/%]+)"
+    r"|(?P<open>\[)|(?P<close>\])"
+    r"|(?P<op>begincodespacerange|endcodespacerange|beginbfchar|endbfchar"
+    r"|beginbfrange|endbfrange)"))
+_HEX_WHITESPACE = re.compile(b_(r"\s+"))
+
+
+def _unhex(h):
+    h = _HEX_WHITESPACE.sub(b_(""), h)
+    if len(h) % 2:
+        h += b_("0")
+    return binascii.unhexlify(h)
+
+
+def _utf16(data):
+    return data.decode("utf-16-be", "replace")
+
+
+def _glyph(name):
+    # the text of a glyph name, or None
+    text = _GLYPH_NAMES.get(name)
+    if text is not None:
+        return text
+    if len(name) == 2:
+        return u_(name[1:])
+    if name.startswith("/uni") and len(name) == 8:
+        try:
+            return _utf16(binascii.unhexlify(b_(name[4:])))
+        except (TypeError, ValueError):
+            return None
+    return None
+
+
+class FontMap(object):
+    """
+    Maps the character codes of a font to Unicode.
+
+    :param dict codes: Text of each code, as byte strings.
+    :param list ranges: ``(low, high)`` code space ranges as byte strings,
+        telling how many bytes each code takes; single byte codes if empty.
+    """
+    def __init__(self, codes, ranges=()):
+        self.codes = codes
+        self.ranges = list(ranges)
+        lengths = set(len(low) for low, high in self.ranges) or set([1])
+        self._width = lengths.pop() if len(lengths) == 1 else None
+        if self._width == 1:
+            # translate the string as latin-1 text in one go
+            self._table = _Dropping((bytearray(code)[0], text)
+                                    for code, text in codes.items() if len(code) == 1)
+
+    def decode(self, data):
+        """
+        Returns the text of the string data, dropping codes without text.
+        """
+        if self._width == 1:
+            return data.decode("latin-1").translate(self._table)
+        get = self.codes.get
+        if self._width is not None:
+            width = self._width
+            return u_("").join([get(data[i:i + width], u_(""))
+                                for i in range(0, len(data), width)])
+        # codes of several lengths: each takes the length of the code space
+        # range it falls into
+        parts = []
+        pos = 0
+        while pos < len(data):
+            width = self._codeWidth(data, pos)
+            parts.append(get(data[pos:pos + width], u_("")))
+            pos += width
+        return u_("").join(parts)
+
+    def _codeWidth(self, data, pos):
+        for low, high in self.ranges:
+            code = data[pos:pos + len(low)]
+            if len(code) == len(low) and low <= code <= high:
+                return len(low)
+        return min(len(low) for low, high in self.ranges)
+
+
+class _Dropping(dict):
+    # translation table that drops the characters it doesn't know
+    def __missing__(self, key):
+        return None
+
+
+def parseCMap(data):
+    """
+    Parses the code space ranges and the bfchar and bfrange mappings of a
+    ToUnicode CMap into a :class:`FontMap`.
+    """
+    codes = {}
+    ranges = []
+    section = None
+    operands = []
+    array = None
+    for m in _CMAP_TOKENS.finditer(data):
+        kind = m.lastgroup
+        if kind == "hex":
+            value = _unhex(m.group(kind))
+        elif kind == "name":
+            value = m.group(kind).decode("latin-1")
+        elif kind == "open":
+            array = []
+            continue
+        elif kind == "close":
+            value, array = array, None
+        else:
+            section = m.group(kind)
+            operands = []
+            continue
+        if array is not None:
+            array.append(value)
+            continue
+        operands.append(value)
+        if section == b_("begincodespacerange") and len(operands) == 2:
+            ranges.append(tuple(operands))
+            operands = []
+        elif section == b_("beginbfchar") and len(operands) == 2:
+            src, dst = operands
+            if isinstance(dst, bytes):
+                codes[src] = _utf16(dst)
+            operands = []
+        elif section == b_("beginbfrange") and len(operands) == 3:
+            _addRange(codes, *operands)
+            operands = []
+    return FontMap(codes, ranges)
+
+
+def _addRange(codes, low, high, dst):
+    if not isinstance(low, bytes) or not isinstance(high, bytes) or \
+            len(low) != len(high) or not low:
+        return
+    width = len(low)
+    first = int(binascii.hexlify(low), 16)
+    last = int(binascii.hexlify(high), 16)
+    if last - first > 0xffff:
+        return
+    for offset in range(last - first + 1):
+        code = binascii.unhexlify(b_("%0*x" % (2 * width, first + offset)))
+        if isinstance(dst, list):
+            # one destination string for each code
+            if offset < len(dst) and isinstance(dst[offset], bytes):
+                codes[code] = _utf16(dst[offset])
+        elif isinstance(dst, bytes) and len(dst) >= 2:
+            # destinations follow on from the first one
+            unit = struct.unpack(">H", dst[-2:])[0] + offset
+            if unit > 0xffff:
+                break
+            codes[code] = _utf16(dst[:-2] + struct.pack(">H", unit))
+
+
+def _encodingMap(encoding):
+    # the map of a simple font's /Encoding, or None for the default
+    # encoding
+    differences = None
+    if isinstance(encoding, DictionaryObject):
+        differences = encoding.get("/Differences")
+        encoding = encoding.get("/BaseEncoding", NameObject("/StandardEncoding"))
+    codec = _ENCODINGS.get(encoding)
+    if codec is None or (encoding == "/StandardEncoding" and differences is None):
+        return None
+    codes = {}
+    for code in range(256):
+        char = bytes(bytearray([code]))
+        codes[char] = char.decode(codec, "replace")
+    if isinstance(differences, ArrayObject):
+        code = 0
+        for item in differences:
+            item = item.getObject()
+            if isinstance(item, NumberObject):
+                code = int(item)
+            elif isinstance(item, NameObject):
+                text = _glyph(item)
+                if text is not None and 0 <= code < 256:
+                    codes[bytes(bytearray([code]))] = text
+                code += 1
+    return FontMap(codes)
+
+
+def fontMap(font):
+    """
+    Returns the :class:`FontMap` of a font dictionary, or ``None`` if the font
+    has neither a ToUnicode CMap nor an encoding other than the standard
+    one, in which case its strings are best taken as they were read.
+    """
+    toUnicode = font.get("/ToUnicode")
+    if toUnicode is not None:
+        toUnicode = toUnicode.getObject()
+        if isinstance(toUnicode, StreamObject):
+            return parseCMap(b_(toUnicode.getData()))
+    if font.get("/Subtype") == "/Type0":
+        return None
+    encoding = font.get("/Encoding")
+    if encoding is not None:
+        return _encodingMap(encoding.getObject())
+    return None
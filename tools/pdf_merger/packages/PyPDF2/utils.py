@@ -32,13 +32,32 @@ __author__ = "Mathieu Fenniak"
 __author_email__ = "biziqe@mathieu.fenniak.net"
 
 
+import mmap
 import sys
+from binascii import hexlify, unhexlify
 
 try:
     import __builtin__ as builtins
 except ImportError:  # Py3
     import builtins
 
+try:
+    from cryptography.hazmat.decrepit.ciphers.algorithms import ARC4
+    from cryptography.hazmat.primitives.ciphers import Cipher
+except ImportError:
+    try:  # cryptography < 43
+        from cryptography.hazmat.primitives.ciphers.algorithms import ARC4
+        from cryptography.hazmat.primitives.ciphers import Cipher
+    except ImportError:
+        ARC4 = None
+
+
+if sys.version_info[0] < 3:
+    # cStringIO/StringIO copy their contents on every getvalue() call
+    _BytesIO = None
+else:
+    from io import BytesIO as _BytesIO
+
 
 xrange_fn = getattr(builtins, "xrange", range)
 _basestring = getattr(builtins, "basestring", str)
@@ -48,6 +67,21 @@ string_type = getattr(builtins, "unicode", str)
 int_types = (int, long) if sys.version_info[0] < 3 else (int,)
 
 
+# bytes as little-endian integers, for working on all of them at once
+if hasattr(int, "from_bytes"):
+    def _toInt(data):
+        return int.from_bytes(data, "little")
+
+    def _fromInt(value, length):
+        return value.to_bytes(length, "little")
+else:  # Py2
+    def _toInt(data):
+        return int(hexlify(bytes(data)[::-1]) or "0", 16)
+
+    def _fromInt(value, length):
+        return unhexlify("%0*x" % (2 * length, value))[::-1]
+
+
 # Make basic type tests more consistent
 def isString(s):
     """Test if arg is a string. Compatible with Python 2 and 3."""
@@ -141,6 +175,65 @@ def readUntilRegex(stream, regex, ignore_eof=False):
     return name
 
 
+def getStreamBuffer(stream):
+    """
+    Returns a buffer holding the complete contents of stream, so that the
+    bulk parsers can scan it with compiled regexes instead of reading it one
+    byte at a time.  Memory maps are used as they are and ``io.BytesIO``
+    hands out its internal buffer without copying.  Returns ``None`` for
+    anything else, which then has to be read incrementally.
+    """
+    if isinstance(stream, mmap.mmap):
+        return stream
+    if _BytesIO is not None and type(stream) is _BytesIO:
+        return stream.getvalue()
+    return None
+
+
+def sliceBuffer(buf, start, end):
+    """
+    Returns buf[start:end].  Slices of a memory map are returned as zero-copy
+    ``memoryview`` objects instead of bytes copies.
+    """
+    if isinstance(buf, mmap.mmap):
+        return memoryview(buf)[start:end]
+    return buf[start:end]
+
+
+def readStreamData(stream, length):
+    """
+    Reads length bytes of stream payload.  When the stream is a memory map
+    the payload is returned as a zero-copy ``memoryview`` slice of the map
+    instead of a bytes copy.
+    """
+    if isinstance(stream, mmap.mmap):
+        start = stream.tell()
+        data = sliceBuffer(stream, start, start + length)
+        stream.seek(start + len(data), 0)
+        return data
+    return stream.read(length)
+
+
+def mapFile(fileobj):
+    """
+    Maps the file behind fileobj read-only into memory.  Returns ``None`` if
+    the object has no mappable file descriptor (e.g. an in-memory stream or
+    a pipe).
+    """
+    try:
+        fileno = fileobj.fileno()
+    except (AttributeError, IOError, ValueError):
+        # io.UnsupportedOperation derives from both OSError and ValueError
+        return None
+    try:
+        return mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+    except ValueError:
+        raise PdfReadError("Cannot read an empty file")
+    except EnvironmentError:
+        # pipes, sockets and the like cannot be mapped
+        return None
+
+
 class ConvertFunctionsToVirtualList(object):
     def __init__(self, lengthFunction, getFunction):
         self.lengthFunction = lengthFunction
@@ -165,21 +258,48 @@ class ConvertFunctionsToVirtualList(object):
         return self.getFunction(index)
 
 
+# the key and permutation of the last key scheduled by RC4_encrypt
+_rc4Schedule = (None, None)
+
+
 def RC4_encrypt(key, plaintext):
-    S = [i for i in range(256)]
-    j = 0
-    for i in range(256):
-        j = (j + S[i] + ord_(key[i % len(key)])) % 256
-        S[i], S[j] = S[j], S[i]
-    i, j = 0, 0
-    retval = b_("")
-    for x in range(len(plaintext)):
-        i = (i + 1) % 256
-        j = (j + S[i]) % 256
-        S[i], S[j] = S[j], S[i]
-        t = S[(S[i] + S[j]) % 256]
-        retval += b_(chr(ord_(plaintext[x]) ^ t))
-    return retval
+    """
+    Encrypts or decrypts plaintext with RC4, through the ``cryptography``
+    package when it is installed and supports the key size.
+
+    Otherwise the keystream is generated into a bytearray and XORed with
+    the whole plaintext at once.  The key schedule of the last key is kept,
+    as the strings of one object are all encrypted with the same key.
+    """
+    global _rc4Schedule
+    if not plaintext:
+        return b_("")
+    key = b_(key)
+    if ARC4 is not None and len(key) * 8 in ARC4.key_sizes:
+        return Cipher(ARC4(key), mode=None).encryptor().update(plaintext)
+    schedule = _rc4Schedule
+    if schedule[0] != key:
+        S = list(range(256))
+        j = 0
+        keyBytes = bytearray(key)
+        keyLength = len(keyBytes)
+        for i in range(256):
+            j = (j + S[i] + keyBytes[i % keyLength]) & 255
+            S[i], S[j] = S[j], S[i]
+        schedule = _rc4Schedule = (key, S)
+    S = list(schedule[1])
+    length = len(plaintext)
+    keystream = bytearray(length)
+    i = j = 0
+    for x in range(length):
+        i = (i + 1) & 255
+        a = S[i]
+        j = (j + a) & 255
+        b = S[j]
+        S[i] = b
+        S[j] = a
+        keystream[x] = S[(a + b) & 255]
+    return _fromInt(_toInt(plaintext) ^ _toInt(keystream), length)
 
 
 def matrixMultiply(a, b):
@@ -214,6 +334,10 @@ class PageSizeNotDefinedError(PyPdfError):
     pass
 
 
+class PdfWriteError(PyPdfError):
+    pass
+
+
 class PdfReadWarning(UserWarning):
     pass
 
@@ -0,0 +1,278 @@
+"""
+Compact cross-reference index and bulk decoders for cross-reference tables
+and streams.
+"""
+
+import re
+import sys
+from array import array
+from .utils import PdfReadError
+
+try:
+    array('q')
+    _INT64 = 'q'
+except ValueError:  # Py2
+    _INT64 = 'l'
+
+# entry types, as in the first field of cross-reference stream entries
+FREE = 0
+UNCOMPRESSED = 1
+COMPRESSED = 2
+_ABSENT = 0xFF
+
+# how far past the end of the arrays an object number may lie before its entry
+# goes to the overflow dict instead of growing the arrays
+_GROWTH_SLACK = 65536
+
+# stream entry types as stored in the table: free entries of a stream carry
+# nothing worth keeping, unknown types are ignored
+_STREAM_TYPES = bytearray([_ABSENT] * 256)
+_STREAM_TYPES[UNCOMPRESSED] = UNCOMPRESSED
+_STREAM_TYPES[COMPRESSED] = COMPRESSED
+_STREAM_TYPES = bytes(_STREAM_TYPES)
+
+_TABLE_TYPES = bytearray([_ABSENT] * 256)
+_TABLE_TYPES[ord('n')] = UNCOMPRESSED
+_TABLE_TYPES[ord('f')] = FREE
+_TABLE_TYPES = bytes(_TABLE_TYPES)
+
+_KNOWN = re.compile(b"[^\xff]")
+
+
+def _int64Array(values=()):
+    return array(_INT64, values)
+
+
+def _frombytes(arr, data):
+    if hasattr(arr, "frombytes"):
+        arr.frombytes(data)
+    else:  # Py2
+        arr.fromstring(bytes(data))
+
+
+class XrefTable(object):
+    """
+    Maps object numbers and generations to the location of the objects.
+
+    Entries live in flat arrays indexed by object number: the entry type in a
+    bytearray, the byte offset (or object stream number) and the generation
+    (or index within the object stream) in arrays of 64-bit integers.  Entries
+    for a number already taken by another generation, and numbers far beyond
+    the highest one seen so far, go to a small overflow dict instead.
+
+    Cross-reference sections are read newest first, so the first entry added
+    for an object wins and later ones are ignored.
+    """
+    def __init__(self):
+        self._types = bytearray()
+        self._field2 = _int64Array()
+        self._field3 = _int64Array()
+        self._extra = {}
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def _reserve(self, end, count=1):
+        """
+        Grows the arrays to hold object numbers below end, for count new
+        entries.  Returns False if end is too far out to be worth it.
+        """
+        size = len(self._types)
+        if end <= size:
+            return True
+        if end - size > size + 2 * count + _GROWTH_SLACK:
+            return False
+        grow = end - size
+        self._types.extend(bytearray([_ABSENT]) * grow)
+        self._field2.extend(_int64Array([0]) * grow)
+        self._field3.extend(_int64Array([0]) * grow)
+        return True
+
+    def add(self, num, generation, type, field2, field3):
+        """
+        Adds an entry of the given type unless the object is already known.
+        Returns True if the entry was added.
+        """
+        if num < 0:
+            return False
+        if self._reserve(num + 1):
+            known = self._types[num]
+            if known == _ABSENT:
+                self._types[num] = type
+                self._field2[num] = field2
+                self._field3[num] = field3
+                self._count += 1
+                return True
+            if (0 if known == COMPRESSED else self._field3[num]) == generation:
+                return False
+        key = (generation, num)
+        if key in self._extra:
+            return False
+        self._extra[key] = (type, field2, field3)
+        self._count += 1
+        return True
+
+    def addSection(self, start, types, field2, field3):
+        """
+        Adds a subsection of consecutive objects starting at number start.
+        types is a bytearray of stored entry types (``_ABSENT`` for entries
+        to skip), field2 and field3 are int64 arrays of the same length.
+        """
+        count = len(types)
+        end = start + count
+        if not self._reserve(end, count):
+            for i in range(count):
+                type = types[i]
+                if type != _ABSENT:
+                    generation = 0 if type == COMPRESSED else field3[i]
+                    self.add(start + i, generation, type, field2[i], field3[i])
+            return
+        # take the whole run at once, then put back the few objects that were
+        # already known and pass their new entries on to add()
+        known = [(m.start(), self._types[m.start()], self._field2[m.start()],
+                  self._field3[m.start()])
+                 for m in _KNOWN.finditer(self._types, start, end)]
+        self._types[start:end] = types
+        self._field2[start:end] = field2
+        self._field3[start:end] = field3
+        self._count += count - types.count(bytearray([_ABSENT]))
+        for num, type, f2, f3 in known:
+            i = num - start
+            if types[i] != _ABSENT:
+                self._count -= 1
+            self._types[num] = type
+            self._field2[num] = f2
+            self._field3[num] = f3
+            if types[i] != _ABSENT:
+                generation = 0 if types[i] == COMPRESSED else field3[i]
+                self.add(num, generation, types[i], field2[i], field3[i])
+
+    def get(self, num, generation):
+        """
+        Returns the entry for the object as a (type, field2, field3) tuple,
+        or None if the object is not in the table.
+        """
+        if 0 <= num < len(self._types):
+            type = self._types[num]
+            if type != _ABSENT:
+                field3 = self._field3[num]
+                if (0 if type == COMPRESSED else field3) == generation:
+                    return type, self._field2[num], field3
+        if self._extra:
+            return self._extra.get((generation, num))
+        return None
+
+    def entries(self):
+        """
+        Yields (num, generation, type, field2, field3) for all entries,
+        ordered by object number.
+        """
+        types, field2, field3 = self._types, self._field2, self._field3
+        for num in range(len(types)):
+            type = types[num]
+            if type != _ABSENT:
+                generation = 0 if type == COMPRESSED else field3[num]
+                yield num, generation, type, field2[num], field3[num]
+        for (generation, num) in sorted(self._extra, key=lambda k: k[1]):
+            type, f2, f3 = self._extra[(generation, num)]
+            yield num, generation, type, f2, f3
+
+    def update(self, other):
+        """
+        Adds the entries of another table, such as an older section read on
+        its own, except for the objects already known.
+        """
+        self.addSection(0, other._types, other._field2, other._field3)
+        for (generation, num), (type, f2, f3) in other._extra.items():
+            self.add(num, generation, type, f2, f3)
+
+    def renumber(self, generation, delta):
+        """
+        Shifts the numbers of all uncompressed and free entries of the given
+        generation by delta.
+        """
+        moved = [e for e in self.entries()
+                 if e[1] == generation and e[2] != COMPRESSED]
+        for num, gen, type, f2, f3 in moved:
+            self._remove(num, gen)
+        for num, gen, type, f2, f3 in moved:
+            self.add(num + delta, gen, type, f2, f3)
+
+    def _remove(self, num, generation):
+        if self._extra.pop((generation, num), None) is None:
+            self._types[num] = _ABSENT
+        self._count -= 1
+
+
+def readXrefStreamEntries(data, widths, count):
+    """
+    Decodes count entries of cross-reference stream data laid out in fields
+    of the given /W widths.  Returns the stored entry types as a bytearray
+    (``_ABSENT`` for free entries and unknown types) and the second and third
+    fields as int64 arrays, along with the raw types for error reporting.
+
+    Every field is converted for all entries at once: its bytes are
+    scattered into 8-byte big-endian slots with extended slice assignment and
+    reinterpreted by the array module, instead of unpacking every field of
+    every entry.
+    """
+    widths = [int(w) for w in widths]
+    rowSize = sum(widths)
+    if rowSize:
+        count = min(count, len(data) // rowSize)
+        data = data[:count * rowSize]
+    columns = []
+    fieldStart = 0
+    for i, width in enumerate(widths[:3]):
+        if width > 8:
+            raise PdfReadError("invalid size in convertToInt")
+        if width == 0:
+            # PDF Spec Table 17: A value of zero for an element in the W
+            # array indicates...the default value shall be used
+            if i == 0:
+                columns.append(bytearray([UNCOMPRESSED]) * count)
+            else:
+                columns.append(_int64Array([0]) * count)
+        elif i == 0 and width == 1:
+            columns.append(bytearray(data[fieldStart::rowSize]))
+        else:
+            slots = bytearray(8 * count)
+            for k in range(width):
+                slots[8 - width + k::8] = data[fieldStart + k::rowSize]
+            column = _int64Array()
+            _frombytes(column, slots)
+            if sys.byteorder == "little":
+                column.byteswap()
+            columns.append(column)
+        fieldStart += width
+    rawTypes, field2, field3 = columns
+    if not isinstance(rawTypes, bytearray):
+        rawTypes = bytearray(min(t, 255) if t >= 0 else 255 for t in rawTypes)
+    return rawTypes.translate(_STREAM_TYPES), field2, field3, rawTypes
+
+
+def readXrefTableEntries(buf, pos, count):
+    """
+    Decodes a subsection of count classic cross-reference table entries
+    starting at pos in buf, provided they all have the regular fixed layout
+    of 20 bytes each.  Returns the stored entry types, offsets and
+    generations, or None if the subsection has to be read line by line.
+    """
+    size = 20 * count
+    block = bytes(buf[pos:pos + size])
+    if len(block) != size or \
+            block[10::20].count(b" ") != count or \
+            block[16::20].count(b" ") != count or \
+            block[18::20].translate(None, b" \r") or \
+            block[19::20].translate(None, b"\r\n"):
+        return None
+    types = bytearray(block[17::20]).translate(_TABLE_TYPES)
+    if types.count(bytearray([_ABSENT])):
+        return None
+    fields = block.split()
+    if len(fields) != 3 * count:
+        return None
+    offsets = _int64Array(map(int, fields[0::3]))
+    generations = _int64Array(map(int, fields[1::3]))
+    return types, offsets, generations
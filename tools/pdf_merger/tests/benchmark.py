@@ -0,0 +1,490 @@
+"""
+Times PyPDF2 on documents and data generated on the spot, so that runs before
+and after a change can be compared:
+
+    python tests/benchmark.py [--repeat N] [--scale N] [name ...]
+
+Only the benchmarks whose names contain one of the given names are run.
+Every benchmark is run --repeat times and the best time is reported, along
+with what the benchmark measures besides, such as the size of the file it
+wrote; --scale multiplies the size of the generated inputs.
+"""
+import argparse
+import gc
+import hashlib
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from io import BytesIO
+
+TESTS_ROOT = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, TESTS_ROOT)
+sys.path.insert(0, os.path.dirname(TESTS_ROOT))
+
+from packages.PyPDF2 import (PdfFileMerger, PdfFileReader, PdfFileWriter,
+                             countPages, filters, security)
+from packages.PyPDF2.generic import (ArrayObject, DecodedStreamObject,
+                                     DictionaryObject, EncodedStreamObject,
+                                     FloatObject, IndirectObject, NameObject,
+                                     NumberObject, RectangleObject,
+                                     createStringObject)
+from packages.PyPDF2.pdf import ContentStream
+from packages.PyPDF2.utils import RC4_encrypt
+from test_filters import predictedRows, referenceLzwEncode
+from test_text import textDocument
+
+BENCHMARKS = []
+
+
+def benchmark(function):
+    BENCHMARKS.append(function)
+    return function
+
+
+def manyObjects(pages):
+    # pages with contents, annotations and a shared font, as a merge of
+    # similar documents would have
+    writer = PdfFileWriter()
+    font = writer._addObject(DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    }))
+    for i in range(pages):
+        page = writer.addBlankPage(612, 792)
+        contents = DecodedStreamObject()
+        contents.setData(b"BT /F1 12 Tf 72 720 Td 14.4 TL " + b" ".join(
+            b"(Line %d of page %d, \\(escaped\\)) ' 0.5 0.25 0.125 rg" % (j, i)
+            for j in range(20)) + b" ET")
+        page[NameObject("/Contents")] = writer._addObject(contents)
+        page[NameObject("/Resources")] = DictionaryObject({
+            NameObject("/Font"): DictionaryObject({NameObject("/F1"): font}),
+        })
+        page[NameObject("/Annots")] = ArrayObject(
+            writer._addObject(DictionaryObject({
+                NameObject("/Type"): NameObject("/Annot"),
+                NameObject("/Subtype"): NameObject("/Square"),
+                NameObject("/Rect"): ArrayObject(
+                    [FloatObject(j * 1.5), FloatObject(j + 0.25),
+                     FloatObject(j + 5.75), FloatObject(j + 5)]),
+                NameObject("/Contents"): createStringObject(
+                    b"Note %d" % j),
+            })) for j in range(5))
+    output = BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+def incremental(data, updates):
+    # appends updates that each replace the first page's contents
+    reader = PdfFileReader(BytesIO(data))
+    size = reader.trailer["/Size"]
+    root = reader.trailer.raw_get("/Root")
+    startxref = data.rindex(b"startxref")
+    prev = int(data[startxref + 9:].split()[0])
+    out = bytearray(data)
+    for i in range(updates):
+        offset = len(out)
+        out += b"%d 0 obj\n<< /Length 2 >>\nstream\nBT\nendstream\nendobj\n" \
+            % size
+        xref = len(out)
+        out += b"xref\n0 1\n0000000000 65535 f \n%d 1\n%010d 00000 n \n" \
+            % (size, offset)
+        out += b"trailer\n<< /Size %d /Root %d %d R /Prev %d >>\n" \
+            b"startxref\n%d\n%%%%EOF\n" % (size + 1, root.idnum,
+                                          root.generation, prev, xref)
+        prev = xref
+        size += 1
+    return bytes(out)
+
+
+@benchmark
+def readAllObjects(inputs):
+    reader = PdfFileReader(BytesIO(inputs["objects"]))
+    for num in range(1, reader.trailer["/Size"]):
+        reader.getObject(IndirectObject(num, 0, reader))
+
+
+@benchmark
+def objectMemory(inputs):
+    # the memory the objects of a file take once read; traced, so the time
+    # is not worth comparing with the others
+    gc.collect()
+    tracemalloc.start()
+    try:
+        reader = PdfFileReader(BytesIO(inputs["objects"]))
+        objects = [reader.getObject(IndirectObject(num, 0, reader))
+                   for num in range(1, reader.trailer["/Size"])]
+        return tracemalloc.get_traced_memory()[0], "bytes"
+    finally:
+        tracemalloc.stop()
+
+
+@benchmark
+def readAllObjectsMmap(inputs):
+    with open(inputs["objectsPath"], "rb") as f:
+        reader = PdfFileReader(f, useMmap=True)
+        for num in range(1, reader.trailer["/Size"]):
+            reader.getObject(IndirectObject(num, 0, reader))
+
+
+@benchmark
+def readPages(inputs):
+    reader = PdfFileReader(BytesIO(inputs["objects"]))
+    for page in reader.pages:
+        page.getContents().getData()
+
+
+@benchmark
+def parseContentStreams(inputs):
+    reader = PdfFileReader(BytesIO(inputs["objects"]))
+    for page in reader.pages:
+        ContentStream(page.getContents(), reader).operations
+
+
+@benchmark
+def rewriteFloatContent(inputs):
+    # a cm prepended to a content stream of real numbers, which is then
+    # written out again
+    content = ContentStream(inputs["floatContent"], None)
+    zero = NumberObject(0)
+    content.operations.insert(0, ([FloatObject(0.5), zero, zero,
+                                   FloatObject(0.5), FloatObject(10.25), zero],
+                                  b"cm"))
+    content.getData()
+
+
+@benchmark
+def boxArithmetic(inputs):
+    half = FloatObject("0.5")
+    for box in inputs["boxes"]:
+        box.getWidth() * half + box.getHeight() * half
+
+
+@benchmark
+def contentPassThrough(inputs):
+    # a /Contents array that is read and written back without being edited
+    ContentStream(inputs["contentParts"], None).getData()
+
+
+@benchmark
+def inlineImageSized(inputs):
+    ContentStream(inputs["inlineImageSized"], None).operations
+
+
+@benchmark
+def inlineImageScanned(inputs):
+    # filtered, so the end of the data has to be searched for
+    ContentStream(inputs["inlineImageScanned"], None).operations
+
+
+@benchmark
+def extractText(inputs):
+    reader = PdfFileReader(BytesIO(inputs["objects"]))
+    for page in reader.pages:
+        page.extractText()
+
+
+@benchmark
+def extractAllText(inputs):
+    for text in PdfFileReader(BytesIO(inputs["text"])).extractAllText():
+        pass
+
+
+@benchmark
+def extractAllTextPool(inputs):
+    # two processes, even on a single CPU, where extractAllText would not
+    # start them
+    reader = PdfFileReader(BytesIO(inputs["text"]))
+    for text in reader._extractAllTextInProcesses(2, 16, reader.numPages):
+        pass
+
+
+@benchmark
+def openIncremental(inputs):
+    # opening only: the page tree is in the oldest section, so counting the
+    # pages reads every section in either mode
+    PdfFileReader(BytesIO(inputs["incremental"]))
+
+
+@benchmark
+def openIncrementalLazy(inputs):
+    PdfFileReader(BytesIO(inputs["incremental"]), lazyXref=True)
+
+
+@benchmark
+def countPagesProbe(inputs):
+    countPages(BytesIO(inputs["objects"]))
+
+
+@benchmark
+def countPagesFlattened(inputs):
+    PdfFileReader(BytesIO(inputs["objects"])).getNumPages()
+
+
+@benchmark
+def writeCopy(inputs):
+    return write(inputs, lambda writer, output: None)
+
+
+def objectStreams(objectsPerStream, compressionLevel=-1):
+    def writeObjectStreams(inputs):
+        return write(inputs, lambda writer, output: writer.useObjectStreams(
+            objectsPerStream, compressionLevel))
+    writeObjectStreams.__name__ += "%d" % objectsPerStream
+    if compressionLevel != -1:
+        writeObjectStreams.__name__ += "Level%d" % compressionLevel
+    return benchmark(writeObjectStreams)
+
+
+# the size of the output is reported with the time, to compare with the
+# classic cross-reference table and uncompressed objects of writeCopy
+for objectsPerStream in (10, 100, 1000):
+    objectStreams(objectsPerStream)
+objectStreams(100, 1)
+objectStreams(100, 9)
+
+
+@benchmark
+def writeStreaming(inputs):
+    return write(inputs, lambda writer, output: writer.beginWrite(output))
+
+
+@benchmark
+def writeDuplicates(inputs):
+    # the same pages twice over, from two readers
+    return write(inputs, lambda writer, output: None, 2)
+
+
+@benchmark
+def writeDeduplicated(inputs):
+    return write(inputs, lambda writer, output: writer.useDeduplication(), 2)
+
+
+@benchmark
+def writeToFile(inputs):
+    # a file of writer-made objects, so that little but the writing of the
+    # objects is left, written to disk
+    with open(inputs["outputPath"], "wb") as f:
+        inputs["annotations"].write(f)
+
+
+@benchmark
+def sweepManyObjects(inputs):
+    inputs["annotations"].write(BytesIO())
+
+
+@benchmark
+def sweepLongChain(inputs):
+    writer = PdfFileWriter()
+    writer.addPage(PdfFileReader(BytesIO(inputs["chain"])).getPage(0))
+    writer.write(BytesIO())
+
+
+@benchmark
+def mergePages(inputs):
+    merger = PdfFileMerger()
+    merger.append(BytesIO(inputs["objects"]))
+    merger.write(BytesIO())
+
+
+def write(inputs, setup, copies=1):
+    writer = PdfFileWriter()
+    output = BytesIO()
+    setup(writer, output)
+    for i in range(copies):
+        for page in PdfFileReader(BytesIO(inputs["objects"])).pages:
+            writer.addPage(page)
+    writer.write(output)
+    return output.tell(), "bytes"
+
+
+@benchmark
+def flatePngPredictor(inputs):
+    filters.FlateDecode.decode(inputs["png"], inputs["pngParms"])
+
+
+@benchmark
+def tiffPredictor(inputs):
+    filters._tiffUnpredict(inputs["data"], 100, 3, 8)
+
+
+@benchmark
+def lzwDecode(inputs):
+    filters.LZWDecode.decode(inputs["lzw"])
+
+
+@benchmark
+def ascii85(inputs):
+    filters.ASCII85Decode.decode(
+        filters.ASCII85Decode.encode(inputs["data"]))
+
+
+@benchmark
+def asciiHex(inputs):
+    filters.ASCIIHexDecode.decode(
+        filters.ASCIIHexDecode.encode(inputs["data"]))
+
+
+@benchmark
+def rc4(inputs):
+    # a few keys in turn, as for the strings of consecutive objects
+    data = inputs["data"][:len(inputs["data"]) // 16]
+    for i in range(16):
+        RC4_encrypt(b"key %d" % (i % 4), data)
+
+
+@benchmark
+def aesCryptography(inputs):
+    if security.Cipher is None:
+        raise NotImplementedError("the cryptography package is not installed")
+    security.decrypt(inputs["aesKey"], inputs["aes"])
+
+
+@benchmark
+def aesPurePython(inputs):
+    cipher, security.Cipher = security.Cipher, None
+    try:
+        security.decrypt(inputs["aesKey"], inputs["aes"])
+    finally:
+        security.Cipher = cipher
+
+
+@benchmark
+def hashStreamWhole(inputs):
+    hashlib.md5(inputs["bigStream"].getData()).digest()
+
+
+@benchmark
+def hashStreamChunks(inputs):
+    digest = hashlib.md5()
+    for chunk in inputs["bigStream"].iterData():
+        digest.update(chunk)
+    digest.digest()
+
+
+def makeInputs(scale, directory):
+    inputs = {}
+    inputs["objects"] = manyObjects(500 * scale)
+    inputs["objectsPath"] = os.path.join(directory, "objects.pdf")
+    with open(inputs["objectsPath"], "wb") as f:
+        f.write(inputs["objects"])
+    inputs["incremental"] = incremental(inputs["objects"], 50 * scale)
+    inputs["outputPath"] = os.path.join(directory, "output.pdf")
+
+    inputs["text"] = textDocument(500 * scale)
+
+    # 8000 lines of 5 real numbers, and boxes of real numbers
+    stream = DecodedStreamObject()
+    stream.setData(b"".join(b"%d.25 %d.5 %d.125 245.80 612.0 c\n" % (i, i, i)
+                            for i in range(8000 * scale)))
+    inputs["floatContent"] = stream
+    inputs["boxes"] = [
+        RectangleObject([FloatObject(b"0.5"), FloatObject(b"0.0"),
+                         FloatObject(b"%d.5" % i), FloatObject(b"792.0")])
+        for i in range(20000 * scale)]
+
+    # 400 parts of 16 KB of content each
+    parts = ArrayObject()
+    for i in range(400 * scale):
+        part = DecodedStreamObject()
+        part.setData(b"BT /F1 12 Tf 72 720 Td " + b"(Some text) Tj T* " * 900
+                     + b"ET\n")
+        parts.append(part)
+    inputs["contentParts"] = parts
+
+    # a 300 KB RGB inline image, whose length is given or has to be found
+    image = os.urandom(100 * 1000 * 3 * scale)
+    for name, settings in (("inlineImageSized", b"/CS /RGB"),
+                           ("inlineImageScanned", b"/CS /RGB /F /Fl")):
+        stream = DecodedStreamObject()
+        stream.setData(b"q 100 0 0 100 0 0 cm BI /W 1000 /H %d /BPC 8 %s ID "
+                       % (100 * scale, settings) + image + b"EI Q\n")
+        inputs[name] = stream
+
+    # 5000 pages with 10 annotations each, all created by the writer
+    writer = PdfFileWriter()
+    for i in range(5000 * scale):
+        page = writer.addBlankPage(100, 100)
+        page[NameObject("/Annots")] = ArrayObject(
+            writer._addObject(DictionaryObject({
+                NameObject("/Type"): NameObject("/Annot"),
+                NameObject("/Subtype"): NameObject("/Square"),
+                NameObject("/Rect"): ArrayObject(
+                    [NumberObject(j), NumberObject(j), NumberObject(j + 5),
+                     NumberObject(j + 5)]),
+            })) for j in range(10))
+    inputs["annotations"] = writer
+
+    # a page referring to a chain of 5000 dictionaries
+    writer = PdfFileWriter()
+    page = writer.addBlankPage(100, 100)
+    link = None
+    for i in range(5000 * scale):
+        entries = {NameObject("/N"): NumberObject(i)}
+        if link is not None:
+            entries[NameObject("/Next")] = link
+        link = writer._addObject(DictionaryObject(entries))
+    page[NameObject("/Chain")] = link
+    output = BytesIO()
+    writer.write(output)
+    inputs["chain"] = output.getvalue()
+
+    rows = 2000 * scale
+    inputs["pngParms"] = {"/Predictor": 15, "/Columns": 100, "/Colors": 3,
+                          "/BitsPerComponent": 8}
+    inputs["png"] = filters.compress(predictedRows(
+        [(i * 7) % 5 for i in range(rows)], 300))
+    inputs["data"] = predictedRows([0] * rows, 299)
+    inputs["lzw"] = referenceLzwEncode(
+        bytes(bytearray(b % 16 for b in bytearray(inputs["data"]))))
+    stream = EncodedStreamObject()
+    stream._data = filters.compress(inputs["data"] * 50)
+    stream[NameObject("/Filter")] = NameObject("/FlateDecode")
+    inputs["bigStream"] = stream
+    inputs["aesKey"] = security.AESKey(b"0123456789abcdef")
+    inputs["aes"] = security.encrypt(inputs["aesKey"], inputs["data"])
+    return inputs
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().split("\n\n")[0])
+    parser.add_argument("names", nargs="*")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--scale", type=int, default=1)
+    options = parser.parse_args()
+    selected = [function for function in BENCHMARKS
+                if not options.names or
+                any(name.lower() in function.__name__.lower()
+                    for name in options.names)]
+
+    directory = tempfile.mkdtemp()
+    try:
+        inputs = makeInputs(options.scale, directory)
+        for function in selected:
+            best = None
+            try:
+                for i in range(options.repeat):
+                    start = time.perf_counter()
+                    result = function(inputs)
+                    elapsed = time.perf_counter() - start
+                    if best is None or elapsed < best:
+                        best = elapsed
+            except NotImplementedError as e:
+                print("%-28s skipped: %s" % (function.__name__, e))
+                continue
+            line = "%-28s %9.1f ms" % (function.__name__, best * 1000)
+            if result is not None:
+                line += " %12d %s" % result
+            print(line)
+    finally:
+        for name in os.listdir(directory):
+            os.remove(os.path.join(directory, name))
+        os.rmdir(directory)
+
+
+if __name__ == "__main__":
+    main()
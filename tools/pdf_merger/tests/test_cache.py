@@ -0,0 +1,106 @@
+import gc
+import os
+import sys
+import unittest
+from io import BytesIO
+
+TESTS_ROOT = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, TESTS_ROOT)
+sys.path.insert(0, os.path.dirname(TESTS_ROOT))
+
+from packages.PyPDF2 import PdfFileReader
+from packages.PyPDF2.cache import LRUCache, ObjectCache
+from packages.PyPDF2.generic import IndirectObject
+from test_reader import pageTreePdf
+
+
+class LRUCacheTestCase(unittest.TestCase):
+    def testEntries(self):
+        cache = LRUCache(maxEntries=2)
+        cache["a"] = 1
+        cache["b"] = 2
+        self.assertEqual(cache.get("a"), 1)
+        # "b" is now the least recently used
+        cache["c"] = 3
+        self.assertEqual(sorted(cache), ["a", "c"])
+        self.assertEqual(cache.get("b"), None)
+        self.assertRaises(KeyError, lambda: cache["b"])
+        self.assertEqual((cache.hits, cache.misses, cache.evictions),
+                         (1, 2, 1))
+
+    def testBytes(self):
+        cache = LRUCache(maxBytes=10)
+        cache["a"] = b"1234"
+        cache["b"] = b"12345"
+        self.assertEqual(cache.bytes, 9)
+        # too big on its own: not kept, and nothing else dropped for it
+        cache["c"] = b"12345678901"
+        self.assertEqual((sorted(cache), cache.evictions), (["a", "b"], 0))
+        cache["c"] = b"123"
+        self.assertEqual((sorted(cache), cache.bytes, cache.evictions),
+                         (["b", "c"], 8, 1))
+        self.assertEqual(cache.pop("b"), b"12345")
+        self.assertEqual(cache.bytes, 3)
+        cache.clear()
+        self.assertEqual((len(cache), cache.bytes), (0, 0))
+
+    def testUnbounded(self):
+        cache = LRUCache()
+        for i in range(1000):
+            cache[i] = i
+        self.assertEqual((len(cache), cache.evictions), (1000, 0))
+
+
+class ObjectCacheTestCase(unittest.TestCase):
+    def read(self, reader, num):
+        return reader.getObject(IndirectObject(num, 0, reader))
+
+    def testCounts(self):
+        data = pageTreePdf([3, None, None, None])
+        reader = PdfFileReader(BytesIO(data))
+        self.assertIsInstance(reader.resolvedObjects, ObjectCache)
+        for num in (3, 4, 3, 5, 4):
+            self.read(reader, num)
+        cache = reader.resolvedObjects
+        self.assertEqual((len(cache), cache.evictions), (3, 0))
+        self.assertEqual(cache.hits, 2)
+
+    def testEviction(self):
+        data = pageTreePdf([3, None, None, None])
+        cache = ObjectCache(maxEntries=2)
+        reader = PdfFileReader(BytesIO(data), objectCache=cache)
+        first = self.read(reader, 3)
+        self.read(reader, 4)
+        self.read(reader, 5)
+        self.assertEqual((len(cache), cache.evictions), (2, 1))
+        self.assertNotIn((0, 3), cache)
+        # read again from the file, as a new object
+        again = self.read(reader, 3)
+        self.assertIsNot(again, first)
+        self.assertEqual(again, first)
+        self.assertEqual(reader.getNumPages(), 3)
+
+    def testWeakPageTree(self):
+        data = pageTreePdf([3, None, None, None])
+        cache = ObjectCache(maxEntries=1, weakPageTree=True)
+        reader = PdfFileReader(BytesIO(data), objectCache=cache)
+        pages = [self.read(reader, num) for num in (2, 3, 4, 5)]
+        # held outside the bound while in use
+        self.assertEqual((len(cache), cache.evictions), (4, 0))
+        self.assertIs(self.read(reader, 3), pages[1])
+        del pages
+        gc.collect()
+        self.assertEqual(len(cache), 0)
+        # the catalog is held strongly
+        self.read(reader, 1)
+        self.assertIn((0, 1), cache)
+
+    def testDict(self):
+        data = pageTreePdf([3, None, None, None])
+        reader = PdfFileReader(BytesIO(data), objectCache={})
+        self.assertEqual(reader.getNumPages(), 3)
+        self.assertEqual(len(reader.resolvedObjects), 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,151 @@
+import os
+import sys
+import unittest
+from io import BytesIO
+
+TESTS_ROOT = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.dirname(TESTS_ROOT))
+
+from packages.PyPDF2 import PdfFileReader, PdfFileWriter
+from packages.PyPDF2.generic import (ArrayObject, DecodedStreamObject,
+                                     NameObject)
+from packages.PyPDF2.pdf import ContentStream
+from packages.PyPDF2.utils import PdfStreamError
+
+
+CONTENT = (b"q 1 0 0 1 72 720 cm\n"
+           b"BT /F1 12 Tf 14.4 TL (Hello, \\(world\\)) Tj T*\n"
+           b"[(Kerned) -250 <54657874>] TJ 0 -14 Td (Line) ' ET\n"
+           b"% a comment\n"
+           b"/GS1 gs << /MCID 3 >> BDC EMC Q\n")
+
+
+def contentStream(*parts):
+    # a ContentStream of the given parts, as an array if there are several
+    streams = []
+    for part in parts:
+        stream = DecodedStreamObject()
+        stream.setData(part)
+        streams.append(stream)
+    if len(streams) == 1:
+        return ContentStream(streams[0], None)
+    return ContentStream(ArrayObject(streams), None)
+
+
+def pageWithContent(data):
+    writer = PdfFileWriter()
+    page = writer.addBlankPage(612, 792)
+    contents = DecodedStreamObject()
+    contents.setData(data)
+    page[NameObject("/Contents")] = writer._addObject(contents)
+    output = BytesIO()
+    writer.write(output)
+    return PdfFileReader(BytesIO(output.getvalue())).getPage(0)
+
+
+class IterOperationsTestCase(unittest.TestCase):
+    def testSameAsOperations(self):
+        operations = list(contentStream(CONTENT).iterOperations())
+        self.assertEqual(operations, contentStream(CONTENT).operations)
+        self.assertEqual([operator for operands, operator in operations],
+                         [b"q", b"cm", b"BT", b"Tf", b"TL", b"Tj", b"T*",
+                          b"TJ", b"Td", b"'", b"ET", b"gs", b"BDC", b"EMC",
+                          b"Q"])
+        self.assertEqual(operations[7][0][0],
+                         [u"Kerned", -250, u"Text"])
+
+    def testParts(self):
+        # the parts of an array are joined, as if they were one stream
+        middle = CONTENT.index(b"T*")
+        joined = contentStream(CONTENT[:middle], CONTENT[middle:])
+        self.assertEqual(list(joined.iterOperations()),
+                         contentStream(CONTENT).operations)
+
+    def testLazy(self):
+        # the operations after the ones taken are not parsed, so the broken
+        # end of the stream is not reached
+        content = contentStream(b"1 0 0 1 0 0 cm (unterminated")
+        operands, operator = next(content.iterOperations())
+        self.assertEqual(operator, b"cm")
+        self.assertEqual(content.getData(), b"1 0 0 1 0 0 cm (unterminated")
+
+    def testUnparsedData(self):
+        # until the operations are asked for, the data is passed through
+        content = contentStream(CONTENT)
+        list(content.iterOperations())
+        self.assertEqual(content.getData(), CONTENT)
+
+    def testModified(self):
+        content = contentStream(CONTENT)
+        content.operations = [op for op in content.operations
+                              if op[1] not in (b"Tj", b"TJ", b"'")]
+        self.assertEqual(list(content.iterOperations()), content.operations)
+        reparsed = contentStream(content.getData())
+        self.assertEqual(reparsed.operations, content.operations)
+
+        content.setData(b"0 g")
+        self.assertEqual([op for operands, op in content.iterOperations()],
+                         [b"g"])
+
+
+class InlineImageTestCase(unittest.TestCase):
+    def image(self, settings, data, after=b" Q"):
+        # the one inline image of a content stream, checking that the
+        # operations after it are read as well
+        content = contentStream(b"q BI " + settings + b" ID " + data +
+                                b"EI" + after)
+        operations = content.operations
+        following = contentStream(after).operations
+        self.assertEqual([op for operands, op in operations],
+                         [b"q", b"INLINE IMAGE"] +
+                         [op for operands, op in following])
+        image = operations[1][0]
+        self.assertEqual(image["data"], data)
+        # written back, the image reads the same
+        reparsed = contentStream(content.getData()).operations
+        self.assertEqual([op for operands, op in reparsed],
+                         [op for operands, op in operations])
+        self.assertEqual(reparsed[1][0]["data"], data)
+        return image
+
+    def testUnfiltered(self):
+        # the length follows from the dictionary, whatever the data holds
+        data = b"EI Q\n" + bytes(bytearray(range(19)))
+        image = self.image(b"/W 4 /H 2 /BPC 8 /CS /RGB", data)
+        self.assertEqual(image["settings"]["/W"], 4)
+        self.image(b"/Width 4 /Height 2 /BitsPerComponent 8 "
+                   b"/ColorSpace /DeviceRGB", data)
+        # rows of a mask are padded to whole bytes
+        self.image(b"/IM true /W 10 /H 2", b"EI Q")
+        self.image(b"/W 3 /H 1 /BPC 8 /CS [/I /RGB 1 <000000ffffff>]",
+                   b"\x00EI", b"\nQ")
+
+    def testASCII85(self):
+        # the data ends at its end-of-data marker
+        self.image(b"/W 4 /H 2 /BPC 8 /CS /RGB /F /A85",
+                   b"EI Q <+U,m~>\n")
+        self.image(b"/W 4 /H 2 /F [/AHx /Fl]", b"45 49 20 51>")
+
+    def testScanned(self):
+        # no length to go by: an "EI" only ends the data if it is followed
+        # by white-space and "Q", the end of the stream or more operations
+        data = b"x\x9c EI\x00\x01EI \xff\xfeEI\n\x80"
+        self.image(b"/W 4 /H 2 /BPC 8 /CS /RGB /F /Fl", data + b" ")
+        self.image(b"/W 4 /H 2 /BPC 8 /CS /RGB /F /Fl", data + b" ", b"")
+        self.image(b"/W 4 /H 2 /BPC 8 /CS /RGB /F /Fl", data + b"\n",
+                   b"\n0 0 m 10 10 l S 1 0 0 RG Q")
+
+    def testUnterminated(self):
+        content = contentStream(b"BI /W 4 /H 2 /F /Fl ID x\x9c\x00EI\x01")
+        self.assertRaises(PdfStreamError, lambda: content.operations)
+
+
+class ExtractTextTestCase(unittest.TestCase):
+    def testOperators(self):
+        page = pageWithContent(CONTENT)
+        self.assertEqual(page.extractText(),
+                         u"Hello, (world)\nKernedText\n\nLine")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,328 @@
+import os
+import sys
+import unittest
+
+TESTS_ROOT = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, TESTS_ROOT)
+sys.path.insert(0, os.path.dirname(TESTS_ROOT))
+
+from packages.PyPDF2 import filters
+from packages.PyPDF2.generic import (ArrayObject, DictionaryObject,
+                                     NameObject, NullObject, NumberObject)
+from packages.PyPDF2.utils import isString
+from test_generic import encodedStream
+
+
+def referencePngUnpredict(data, columns, colors, bitsPerComponent):
+    # a byte at a time, straight from the PNG specification
+    bpp = max(1, (colors * bitsPerComponent + 7) // 8)
+    width = (colors * bitsPerComponent * columns + 7) // 8
+    previous = [0] * width
+    out = []
+    data = bytearray(data)
+    for start in range(0, len(data), width + 1):
+        filterByte = data[start]
+        row = list(data[start + 1:start + 1 + width])
+        for i in range(width):
+            left = row[i - bpp] if i >= bpp else 0
+            up = previous[i]
+            upLeft = previous[i - bpp] if i >= bpp else 0
+            if filterByte == 0:
+                pass
+            elif filterByte == 1:
+                row[i] = (row[i] + left) % 256
+            elif filterByte == 2:
+                row[i] = (row[i] + up) % 256
+            elif filterByte == 3:
+                row[i] = (row[i] + (left + up) // 2) % 256
+            elif filterByte == 4:
+                p = left + up - upLeft
+                pa, pb, pc = abs(p - left), abs(p - up), abs(p - upLeft)
+                if pa <= pb and pa <= pc:
+                    predicted = left
+                elif pb <= pc:
+                    predicted = up
+                else:
+                    predicted = upLeft
+                row[i] = (row[i] + predicted) % 256
+        out.extend(row)
+        previous = row
+    return bytes(bytearray(out))
+
+
+def predictedRows(filterBytes, width, seed=7):
+    # rows of pseudo-random bytes behind the given filter bytes
+    data = bytearray()
+    value = seed
+    for filterByte in filterBytes:
+        data.append(filterByte)
+        for _ in range(width):
+            value = (value * 1103515245 + 12345) % (1 << 31)
+            data.append(value >> 23)
+    return bytes(data)
+
+
+class PngPredictorTestCase(unittest.TestCase):
+    def check(self, filterBytes, columns, colors, bitsPerComponent):
+        width = (colors * bitsPerComponent * columns + 7) // 8
+        data = predictedRows(filterBytes, width)
+        self.assertEqual(
+            filters._pngUnpredict(data, columns, colors, bitsPerComponent),
+            referencePngUnpredict(data, columns, colors, bitsPerComponent))
+
+    def testSubByteMultiComponent(self):
+        # 3 colors of 4 bits make a 12 bit pixel, whose left neighbour
+        # is 2 bytes back
+        for filterByte in (1, 3, 4):
+            self.check([0, filterByte, filterByte, 2, filterByte], 5, 3, 4)
+
+    def testMixedFilters(self):
+        rows = [0, 1, 2, 3, 4, 1, 1, 3, 3, 4, 4, 2, 0]
+        for columns, colors, bitsPerComponent in (
+                (7, 1, 8), (7, 3, 8), (4, 4, 8), (6, 3, 16), (9, 1, 1),
+                (9, 1, 2), (5, 2, 4), (5, 3, 4)):
+            self.check(rows, columns, colors, bitsPerComponent)
+
+    def testFlateDecodeParms(self):
+        columns, colors, bitsPerComponent = 5, 3, 4
+        data = predictedRows([4, 3, 1, 4], 8)
+        parms = {"/Predictor": 15, "/Columns": columns, "/Colors": colors,
+                 "/BitsPerComponent": bitsPerComponent}
+        self.assertEqual(
+            filters.FlateDecode.decode(filters.compress(data), parms),
+            referencePngUnpredict(data, columns, colors, bitsPerComponent))
+
+
+class TiffPredictorTestCase(unittest.TestCase):
+    def testRows(self):
+        columns, colors = 4, 3
+        # rows of one filter byte and 11 bytes, read as 3 rows of 12 bytes
+        data = predictedRows([0] * 3, columns * colors - 1)
+        expected = bytearray()
+        for start in range(0, len(data), columns * colors):
+            row = bytearray(data[start:start + columns * colors])
+            for i in range(colors, len(row)):
+                row[i] = (row[i] + row[i - colors]) % 256
+            expected += row
+        self.assertEqual(filters._tiffUnpredict(data, columns, colors, 8),
+                         bytes(expected))
+
+
+class ASCII85TestCase(unittest.TestCase):
+    def roundTrip(self, data):
+        encoded = filters.ASCII85Decode.encode(data)
+        self.assertEqual(filters.ASCII85Decode.decode(encoded), data)
+        self.assertEqual(filters.ASCII85Decode.decode(b"<~" + encoded), data)
+        return encoded
+
+    def testGreaterThanFirst(self):
+        # the first digit is ">", so the data starts with "<~>"
+        encoded = self.roundTrip(b"[\x00\x00\x00abc")
+        self.assertTrue(encoded.startswith(b">"))
+
+    def testRoundTrip(self):
+        data = bytes(bytearray(range(256))) * 3
+        for length in (0, 1, 2, 3, 4, 5, 8, 13, 255, len(data)):
+            self.roundTrip(data[:length])
+        self.assertEqual(self.roundTrip(b"\x00" * 12), b"zzz~>")
+
+    def testWhiteSpace(self):
+        encoded = filters.ASCII85Decode.encode(b"Hello, world")
+        spaced = b"<~ " + b"\n".join(encoded[i:i + 3]
+                                     for i in range(0, len(encoded), 3))
+        self.assertEqual(filters.ASCII85Decode.decode(spaced),
+                         b"Hello, world")
+
+
+class ASCIIHexTestCase(unittest.TestCase):
+    def testRoundTrip(self):
+        data = bytes(bytearray(range(256)))
+        for length in (0, 1, 2, 255, 256):
+            encoded = filters.ASCIIHexDecode.encode(data[:length])
+            self.assertEqual(filters.ASCIIHexDecode.decode(encoded),
+                             data[:length])
+            self.assertEqual(
+                filters.ASCIIHexDecode.decode(bytearray(encoded)),
+                data[:length])
+
+    def testLayout(self):
+        decode = filters.ASCIIHexDecode.decode
+        self.assertEqual(decode(b"48 65\n6c6C\r\n6F>ignored"), b"Hello")
+        # a missing last digit is taken to be 0
+        self.assertEqual(decode(b"414>"), b"A@")
+        self.assertEqual(decode(b"41"), b"A")
+        self.assertRaises(filters.PdfReadError, decode, b"4G>")
+
+def parms(entries):
+    return DictionaryObject(
+        (NameObject(key), NameObject(value) if isString(value)
+         else NumberObject(value)) for key, value in entries.items())
+
+
+class Reverse(object):
+    # a codec that counts the calls made to it
+    calls = []
+
+    def decode(data, decodeParms=None):
+        Reverse.calls.append("decode")
+        return data[::-1]
+    decode = staticmethod(decode)
+
+    def iterDecode(chunks, decodeParms, chunkSize):
+        Reverse.calls.append("iterDecode")
+        yield b"".join(chunks)[::-1]
+    iterDecode = staticmethod(iterDecode)
+
+
+class RegistryTestCase(unittest.TestCase):
+    jpeg = b"\xff\xd8\xff\xe0 not quite a JPEG \xff\xd9"
+
+    def testPassthrough(self):
+        stream = encodedStream(self.jpeg, NameObject("/DCTDecode"))
+        self.assertTrue(filters.isPassthrough(stream))
+        self.assertEqual(stream.getData(), self.jpeg)
+        self.assertEqual(b"".join(stream.iterData(5)), self.jpeg)
+        # decoded up to the image filter, and never cached
+        stream = encodedStream(filters.ASCIIHexDecode.encode(self.jpeg),
+                               ArrayObject([NameObject("/AHx"),
+                                            NameObject("/DCT")]))
+        stream.cacheDecodedData = True
+        self.assertEqual(stream.getData(), self.jpeg)
+        self.assertIsNone(stream.decodedSelf)
+        stream = encodedStream(b"x", NameObject("/FlateDecode"))
+        self.assertFalse(filters.isPassthrough(stream))
+
+    def testUnknown(self):
+        stream = encodedStream(b"data", NameObject("/Reverse"))
+        self.assertRaises(NotImplementedError, stream.getData)
+
+    def testRegisterFilter(self):
+        filters.registerFilter(Reverse, "/Reverse", "/Rev")
+        try:
+            del Reverse.calls[:]
+            stream = encodedStream(
+                filters.compress(b"olleh"),
+                ArrayObject([NameObject("/FlateDecode"), NameObject("/Rev")]))
+            self.assertEqual(stream.getData(), b"hello")
+            self.assertEqual(b"".join(stream.iterData()), b"hello")
+            self.assertEqual(Reverse.calls, ["decode", "iterDecode"])
+        finally:
+            del filters._FILTERS["/Reverse"], filters._FILTERS["/Rev"]
+
+    def testDecodeParmsArray(self):
+        # each filter gets its own entry, null for the defaults
+        rows = predictedRows([2, 2, 1], 4)
+        stream = encodedStream(
+            filters.compress(filters.compress(rows)),
+            ArrayObject([NameObject("/FlateDecode"),
+                         NameObject("/FlateDecode")]))
+        stream[NameObject("/DecodeParms")] = ArrayObject([
+            NullObject(), parms({"/Predictor": 12, "/Columns": 4})])
+        self.assertEqual(stream.getData(),
+                         filters._pngUnpredict(rows, 4, 1, 8))
+
+    def testCrypt(self):
+        for decodeParms in (None, parms({}), parms({"/Name": "/Identity"})):
+            stream = encodedStream(b"data", NameObject("/Crypt"))
+            if decodeParms is not None:
+                stream[NameObject("/DecodeParms")] = decodeParms
+            self.assertEqual(stream.getData(), b"data")
+        stream[NameObject("/DecodeParms")] = parms({"/Name": "/StdCF"})
+        self.assertRaises(NotImplementedError, stream.getData)
+
+
+def referenceLzwEncode(data, earlyChange=1, clearAt=4000):
+    """
+    A plain LZW encoder, writing every code as wide as the decoder will
+    read it and starting over with a clear code before the table is full.
+    """
+    out = []
+    state = {}
+
+    def reset():
+        state["table"] = dict((bytes(bytearray([i])), i) for i in range(256))
+        state["next"] = 258
+        # the decoder adds its entries a code later than the encoder
+        state["decoderNext"] = 258
+        state["first"] = True
+
+    def emit(code):
+        out.append((code, state["length"]))
+        if code == 256:
+            reset()
+            state["length"] = 9
+        elif code != 257:
+            if not state["first"] and state["decoderNext"] < 4096:
+                state["decoderNext"] += 1
+                if state["decoderNext"] >= (1 << state["length"]) - \
+                        earlyChange and state["length"] < 12:
+                    state["length"] += 1
+            state["first"] = False
+
+    state["length"] = 9
+    emit(256)
+    word = b""
+    for c in bytearray(data):
+        c = bytes(bytearray([c]))
+        if word + c in state["table"]:
+            word += c
+            continue
+        emit(state["table"][word])
+        if state["next"] < clearAt:
+            state["table"][word + c] = state["next"]
+            state["next"] += 1
+        else:
+            emit(256)
+        word = c
+    if word:
+        emit(state["table"][word])
+    emit(257)
+    packed = bytearray()
+    buf = bits = 0
+    for code, length in out:
+        buf = (buf << length) | code
+        bits += length
+        while bits >= 8:
+            bits -= 8
+            packed.append(buf >> bits)
+            buf &= (1 << bits) - 1
+    if bits:
+        packed.append(buf << (8 - bits))
+    return bytes(packed)
+
+
+class LZWTestCase(unittest.TestCase):
+    def testReferenceExample(self):
+        # from section 7.4.4.2 of the PDF Reference
+        self.assertEqual(
+            filters.LZWDecode.decode(bytes(bytearray(
+                [0x80, 0x0B, 0x60, 0x50, 0x22, 0x0C, 0x0C, 0x85, 0x01]))),
+            b"\x2d\x2d\x2d\x2d\x2d\x41\x2d\x2d\x2d\x42")
+
+    def testRoundTrip(self):
+        # low entropy data, to grow the codes to 12 bits and clear the table
+        data = predictedRows([0] * 400, 99)
+        data = bytes(bytearray(b % 5 + 65 for b in bytearray(data)))
+        data += b"x" * 5000 + bytes(bytearray(range(256))) * 4
+        for earlyChange in (0, 1):
+            parms = {"/EarlyChange": earlyChange}
+            for length in (0, 1, 2, 3, 100, 5000, len(data)):
+                encoded = referenceLzwEncode(data[:length], earlyChange)
+                self.assertEqual(filters.LZWDecode.decode(encoded, parms),
+                                 data[:length])
+
+    def testPredictor(self):
+        data = predictedRows([2, 4, 1, 3], 12)
+        parms = {"/Predictor": 12, "/Columns": 4, "/Colors": 3}
+        self.assertEqual(
+            filters.LZWDecode.decode(referenceLzwEncode(data), parms),
+            referencePngUnpredict(data, 4, 3, 8))
+
+    def testMissingStopCode(self):
+        encoded = referenceLzwEncode(b"abcabcabc")
+        self.assertRaises(filters.PdfReadError, filters.LZWDecode.decode,
+                          encoded[:-2])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,285 @@
+import copy
+import mmap
+import os
+import pickle
+import sys
+import tempfile
+import unittest
+from io import BytesIO
+
+TESTS_ROOT = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.dirname(TESTS_ROOT))
+
+from packages.PyPDF2 import filters
+from packages.PyPDF2 import PdfFileReader, PdfFileWriter
+from packages.PyPDF2.generic import (ArrayObject, BooleanObject,
+                                     ByteStringObject, DecodedStreamObject,
+                                     DictionaryObject, EncodedStreamObject,
+                                     FloatObject, IndirectObject, NameObject,
+                                     NullObject, NumberObject,
+                                     RectangleObject, createStringObject,
+                                     readObject, readObjectFromBuffer,
+                                     readStringFromStream)
+from packages.PyPDF2.pdf import ContentStream
+
+
+class UnbufferedStream(BytesIO):
+    # not handed out as a buffer, so it is read a byte at a time
+    pass
+
+
+STRINGS = [
+    (b"(\\7)", b"\x07"),
+    (b"(\\07)", b"\x07"),
+    (b"(\\007)", b"\x07"),
+    (b"(\\0077)", b"\x077"),
+    (b"(a\\7)", b"a\x07"),
+    (b"(\\53\\7(x\\1))", b"+\x07(x\x01)"),
+    (b"(a\\\nb\\\r\nc)", b"abc"),
+    (b"(\\(\\)\\n\\\\)", b"()\n\\"),
+]
+
+
+class ReadStringTestCase(unittest.TestCase):
+    def check(self, stream, read):
+        for data, expected in STRINGS:
+            stream.seek(0)
+            stream.truncate()
+            stream.write(b"  " + data + b" /Next")
+            stream.seek(2)
+            self.assertEqual(read(stream).original_bytes, expected)
+            self.assertEqual(stream.read(6), b" /Next")
+
+    def testStream(self):
+        self.check(UnbufferedStream(), readStringFromStream)
+        self.check(UnbufferedStream(), lambda s: readObject(s, None))
+
+    def testBuffer(self):
+        self.check(BytesIO(), readStringFromStream)
+        self.check(BytesIO(), lambda s: readObject(s, None))
+
+    def testMmap(self):
+        for data, expected in STRINGS:
+            with tempfile.TemporaryFile() as f:
+                f.write(b"  " + data + b" /Next")
+                f.flush()
+                m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                try:
+                    m.seek(2)
+                    self.assertEqual(readObject(m, None).original_bytes,
+                                     expected)
+                    self.assertEqual(m.read(6), b" /Next")
+                finally:
+                    m.close()
+
+def written(obj):
+    output = BytesIO()
+    obj.writeToStream(output, None)
+    return output.getvalue()
+
+
+class FloatObjectTestCase(unittest.TestCase):
+    TOKENS = [b"612.0", b"245.80", b"-.5", b"+3.", b"0.000001", b"1.250000",
+              b"-0.0"]
+
+    def testParsedTokens(self):
+        # numbers read from a file are written back as they were read
+        for token in self.TOKENS:
+            for obj in (readObject(BytesIO(token + b" "), None),
+                        readObjectFromBuffer(token + b" ", 0, None)[0]):
+                self.assertIsInstance(obj, FloatObject)
+                self.assertEqual(obj, float(token))
+                self.assertEqual(written(obj), token)
+                self.assertEqual(written(FloatObject(obj)), token)
+        array = readObject(BytesIO(b"[0 0 612.0 792.00]"), None)
+        self.assertEqual(written(array), b"[ 0 0 612.0 792.00 ]")
+
+    def testComputed(self):
+        # other values have at most five decimal places
+        for value, expected in ((1.0 / 3, b"0.33333"), (2.5, b"2.5"),
+                                (-0.125, b"-0.125"), (0.1 + 0.2, b"0.3"),
+                                (245.8, b"245.8"), ("12.34567890", b"12.34568"),
+                                (2.0 / 3 * 100, b"66.66667")):
+            self.assertEqual(written(FloatObject(value)), expected)
+
+    def testIntegers(self):
+        for value, expected in ((612.0, b"612"), ("792.00", b"792"),
+                                (-3.0, b"-3"), (0.0, b"0"), (1e20,
+                                b"100000000000000000000"), (7, b"7")):
+            obj = FloatObject(value)
+            self.assertTrue(obj.is_integer())
+            self.assertEqual(written(obj), expected)
+            self.assertEqual(repr(obj), expected.decode())
+
+    def testArithmetic(self):
+        box = RectangleObject([FloatObject(b"0.5"), 0, FloatObject(b"612.0"),
+                               792])
+        self.assertEqual(box.getWidth() * 0.5, 305.75)
+        self.assertEqual(FloatObject(b"1.5").as_numeric(), 1.5)
+
+    def testContentStream(self):
+        # operands of an edited content stream keep their text
+        stream = DecodedStreamObject()
+        stream.setData(b"1.0 0 0 1.00 245.80 .5 cm 0.1 g")
+        content = ContentStream(stream, None)
+        content.operations.insert(0, ([FloatObject(0.5)], b"w"))
+        self.assertEqual(content.getData(),
+                         b"0.5 w\n1.0 0 0 1.00 245.80 .5 cm\n0.1 g\n")
+
+
+def sampleObjects():
+    stream = DecodedStreamObject()
+    stream.setData(b"BT ET")
+    stream[NameObject("/Type")] = NameObject("/XObject")
+    return [
+        NullObject(), BooleanObject(True), BooleanObject(False),
+        NumberObject(-7), FloatObject(b"1.50"), FloatObject(2.25),
+        NameObject("/Name"), createStringObject(b"text"),
+        createStringObject(b"\xfe\xff\x00\xe9"), ByteStringObject(b"\x00\xff"),
+        ArrayObject([NumberObject(1), NameObject("/X")]),
+        RectangleObject([0, 0, 612, 792]),
+        DictionaryObject({NameObject("/A"): NumberObject(1)}),
+        IndirectObject(12, 0, None), stream,
+    ]
+
+
+class CompactObjectTestCase(unittest.TestCase):
+    def checkCopy(self, obj, other):
+        self.assertIs(type(other), type(obj))
+        self.assertEqual(other, obj)
+        for name in ("_token", "autodetect_pdfdocencoding", "autodetect_utf16",
+                     "idnum", "generation", "value"):
+            if hasattr(obj, name):
+                self.assertEqual(getattr(other, name), getattr(obj, name))
+        if isinstance(obj, DecodedStreamObject):
+            self.assertEqual(other.getData(), obj.getData())
+
+    def testPickle(self):
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            for obj in sampleObjects():
+                self.checkCopy(obj, pickle.loads(pickle.dumps(obj, protocol)))
+            # there is only one null object and one of each boolean
+            for obj in NullObject(), BooleanObject(True), BooleanObject(False):
+                self.assertIs(pickle.loads(pickle.dumps(obj, protocol)), obj)
+
+    def testCopy(self):
+        for obj in sampleObjects():
+            self.checkCopy(obj, copy.copy(obj))
+            self.checkCopy(obj, copy.deepcopy(obj))
+
+    def testNoDict(self):
+        for obj in sampleObjects()[:-1]:
+            self.assertFalse(hasattr(obj, "__dict__"), type(obj))
+
+    def testEquality(self):
+        self.assertEqual(NumberObject(3), 3)
+        self.assertEqual(hash(NumberObject(3)), hash(3))
+        self.assertEqual(FloatObject(b"1.50"), 1.5)
+        self.assertEqual(hash(FloatObject(b"1.50")), hash(1.5))
+        self.assertEqual(NameObject("/Name"), "/Name")
+        self.assertEqual({NameObject("/Name"): 1}["/Name"], 1)
+        self.assertEqual(createStringObject(b"text"), u"text")
+        self.assertEqual(IndirectObject(1, 0, None), IndirectObject(1, 0, None))
+        self.assertNotEqual(IndirectObject(1, 0, None),
+                            IndirectObject(1, 1, None))
+        self.assertEqual(RectangleObject([0, 0, 1, 2]), [0, 0, 1, 2])
+        self.assertIs(BooleanObject(1), BooleanObject(True))
+        self.assertTrue(BooleanObject(True).value)
+
+    def testShared(self):
+        # the names and references a reader reads are made once
+        writer = PdfFileWriter()
+        for i in range(3):
+            writer.addBlankPage(100, 100)
+        output = BytesIO()
+        writer.write(output)
+        reader = PdfFileReader(BytesIO(output.getvalue()))
+        pages = [reader.getPage(i) for i in range(3)]
+        parents = [page.raw_get("/Parent") for page in pages]
+        self.assertIs(parents[0], parents[1])
+        self.assertIs(parents[0], parents[2])
+        names = [list(page.keys()) for page in pages]
+        for name in names[0]:
+            self.assertIs(name, [other for other in names[1]
+                                 if other == name][0])
+
+
+def encodedStream(data, filterNames, decodeParms=None):
+    stream = EncodedStreamObject()
+    stream._data = data
+    stream[NameObject("/Filter")] = filterNames
+    if decodeParms is not None:
+        stream[NameObject("/DecodeParms")] = DictionaryObject(
+            (NameObject(key), NumberObject(value))
+            for key, value in decodeParms.items())
+    return stream
+
+
+class StreamDataTestCase(unittest.TestCase):
+    data = bytes(bytearray((i * 7 + i // 251) % 256 for i in range(100000)))
+
+    def check(self, stream, expected, bound=0):
+        self.assertEqual(stream.getData(), expected)
+        for chunkSize in (1, 7, 1000, 65536):
+            chunks = list(stream.iterData(chunkSize))
+            self.assertEqual(b"".join(chunks), expected)
+            self.assertLessEqual(max(len(chunk) for chunk in chunks),
+                                 chunkSize + bound)
+
+    def testDecoded(self):
+        stream = DecodedStreamObject()
+        stream.setData(self.data)
+        self.check(stream, self.data)
+        self.assertEqual(list(DecodedStreamObject().iterData()), [])
+
+    def testFlate(self):
+        stream = encodedStream(filters.compress(self.data),
+                               NameObject("/FlateDecode"))
+        self.check(stream, self.data)
+
+    def testPredictor(self):
+        # rows of 1 filter byte and 99 bytes, decoded a row at a time
+        rows = bytearray()
+        for start in range(0, len(self.data), 99):
+            rows += b"\x02" + self.data[start:start + 99]
+        rows = bytes(rows[:len(rows) // 100 * 100])
+        stream = encodedStream(filters.compress(rows),
+                               NameObject("/FlateDecode"),
+                               {"/Predictor": 12, "/Columns": 99})
+        self.check(stream, filters._pngUnpredict(rows, 99, 1, 8), 99)
+
+    def testChain(self):
+        encoded = filters.compress(filters.compress(self.data))
+        stream = encodedStream(encoded, ArrayObject(
+            [NameObject("/FlateDecode"), NameObject("/FlateDecode")]))
+        self.check(stream, self.data)
+        # decoded whole, then chunked for the next filter
+        encoded = filters.ASCIIHexDecode.encode(filters.compress(self.data))
+        stream = encodedStream(encoded, ArrayObject(
+            [NameObject("/ASCIIHexDecode"), NameObject("/FlateDecode")]))
+        self.check(stream, self.data)
+
+    def testCache(self):
+        stream = encodedStream(filters.compress(self.data),
+                               NameObject("/FlateDecode"))
+        stream.getData()
+        self.assertIsNone(stream.decodedSelf)
+        stream.cacheDecodedData = True
+        self.assertEqual(stream.getData(), self.data)
+        self.assertEqual(stream.decodedSelf.getData(), self.data)
+        # served from the cache from now on
+        stream._data = b""
+        self.check(stream, self.data)
+
+        EncodedStreamObject.cacheDecodedData = True
+        try:
+            stream = encodedStream(filters.compress(self.data),
+                                   NameObject("/FlateDecode"))
+            stream.getData()
+            self.assertIsNotNone(stream.decodedSelf)
+        finally:
+            EncodedStreamObject.cacheDecodedData = False
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,252 @@
+import os
+import struct
+import sys
+import unittest
+import warnings
+from io import BytesIO
+
+TESTS_ROOT = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.dirname(TESTS_ROOT))
+
+from packages.PyPDF2 import PdfFileReader, countPages
+from packages.PyPDF2.cache import ObjectCache
+from packages.PyPDF2.generic import IndirectObject
+from packages.PyPDF2.utils import PdfReadError
+
+
+def xrefTable(subsections):
+    # subsections of (first number, [offset or None for the free head])
+    out = b"xref\n"
+    for start, offsets in subsections:
+        out += b"%d %d\n" % (start, len(offsets))
+        for offset in offsets:
+            if offset is None:
+                out += b"0000000000 65535 f \n"
+            else:
+                out += b"%010d 00000 n \n" % offset
+    return out
+
+
+def appendObjects(out, objects):
+    offsets = {}
+    for num in sorted(objects):
+        offsets[num] = len(out)
+        out += b"%d 0 obj\n%s\nendobj\n" % (num, objects[num])
+    return offsets
+
+
+def notZeroIndexedPdf():
+    """
+    A file with an incremental update, whose cross reference tables were
+    both written numbering the entries from 1 instead of 0.
+    """
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = appendObjects(out, {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        2: b"<< /Type /Pages /Kids [ 3 0 R ] /Count 1 >>",
+        3: b"<< /Type /Page /Parent 2 0 R /MediaBox [ 0 0 100 100 ] >>",
+        4: b"(four)",
+        5: b"(five)",
+    })
+    first = len(out)
+    out += xrefTable([(1, [None] + [offsets[n] for n in range(1, 6)])])
+    out += b"trailer\n<< /Size 6 /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" \
+        % first
+    offsets = appendObjects(out, {
+        3: b"<< /Type /Page /Parent 2 0 R /MediaBox [ 0 0 100 100 ] "
+           b"/Rotate 90 >>",
+        6: b"(six)",
+    })
+    second = len(out)
+    out += xrefTable([(1, [None]), (4, [offsets[3]]), (7, [offsets[6]])])
+    out += b"trailer\n<< /Size 7 /Root 1 0 R /Prev %d >>\nstartxref\n%d\n" \
+        b"%%%%EOF\n" % (first, second)
+    return bytes(out)
+
+
+def objectStreamPdf(streams, indexes=None):
+    """
+    A file whose objects from 3 on are compressed into object streams, one
+    for each dict of object number to object given in streams, and listed in
+    a cross reference stream.  indexes overrides the index within its stream
+    recorded for an object.
+    """
+    out = bytearray(b"%PDF-1.5\n")
+    offsets = appendObjects(out, {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        2: b"<< /Type /Pages /Kids [ ] /Count 0 >>",
+    })
+    entries = {0: (0, 0, 65535), 1: (1, offsets[1], 0), 2: (1, offsets[2], 0)}
+    num = 3 + sum(len(objects) for objects in streams)
+    for objects in streams:
+        header, body = [], b""
+        for i, objnum in enumerate(sorted(objects)):
+            header.append(b"%d %d" % (objnum, len(body)))
+            body += objects[objnum] + b"\n"
+            entries[objnum] = (2, num, i)
+        header = b" ".join(header) + b"\n"
+        entries[num] = (1, len(out), 0)
+        out += b"%d 0 obj\n<< /Type /ObjStm /N %d /First %d /Length %d >>\n" \
+            b"stream\n%s%s\nendstream\nendobj\n" % (
+                num, len(objects), len(header), len(header) + len(body),
+                header, body)
+        num += 1
+    for objnum, index in (indexes or {}).items():
+        entries[objnum] = entries[objnum][:2] + (index,)
+    entries[num] = (1, len(out), 0)
+    data = b"".join(struct.pack(">BIH", *entries[n]) for n in range(num + 1))
+    start = len(out)
+    out += b"%d 0 obj\n<< /Type /XRef /Size %d /W [ 1 4 2 ] /Root 1 0 R " \
+        b"/Length %d >>\nstream\n%s\nendstream\nendobj\n" % (
+            num, num + 1, len(data), data)
+    out += b"startxref\n%d\n%%%%EOF\n" % start
+    return bytes(out)
+
+
+def pageTreePdf(tree):
+    """
+    A file with the page tree given as nested lists, each holding the
+    /Count claimed for the node and its kids: further lists or None for a
+    page.
+    """
+    objects = {1: None}
+
+    def add(node, parent):
+        num = len(objects) + 1
+        if node is None:
+            objects[num] = b"<< /Type /Page /Parent %d 0 R " \
+                b"/MediaBox [ 0 0 100 100 ] >>" % parent
+            return num
+        objects[num] = None
+        kids = [add(kid, num) for kid in node[1:]]
+        parentEntry = b"/Parent %d 0 R " % parent if parent else b""
+        objects[num] = b"<< /Type /Pages %s/Count %d /Kids [ %s ] >>" % (
+            parentEntry, node[0], b" ".join(b"%d 0 R" % kid for kid in kids))
+        return num
+
+    objects[1] = b"<< /Type /Catalog /Pages %d 0 R >>" % add(tree, None)
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = appendObjects(out, objects)
+    start = len(out)
+    out += xrefTable([(0, [None] + [offsets[n] for n in sorted(offsets)])])
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" \
+        % (len(objects) + 1, start)
+    return bytes(out)
+
+
+class PeekPageCountTestCase(unittest.TestCase):
+    def check(self, tree, expected):
+        data = pageTreePdf(tree)
+        self.assertEqual(PdfFileReader(BytesIO(data)).peekPageCount(),
+                         expected)
+        self.assertEqual(PdfFileReader(BytesIO(data)).getNumPages(), expected)
+        self.assertEqual(countPages(BytesIO(data)), expected)
+
+    def testConsistent(self):
+        self.check([3, None, None, None], 3)
+        self.check([0], 0)
+        self.check([7, [3, None, None, None], None, [3, [2, None, None], None]],
+                   7)
+
+    def testWrongInnerCount(self):
+        # the root adds up with the /Count of its kids, which is wrong
+        self.check([5, [3, None, None], [2, None, None]], 4)
+        self.check([6, [3, [2, None], None], [3, None, None, None]], 5)
+
+    def testWrongRootCount(self):
+        self.check([5, [2, None, None], [2, None, None]], 4)
+        self.check([9, None, [2, None, None]], 3)
+        self.check([2, None, None, None], 3)
+
+    def testWeakPageTree(self):
+        # the nodes are freed as the walk goes on, and their id() reused
+        trees = ([49] + [None] * 50,
+                 [50, [24] + [None] * 25, [25] + [None] * 25])
+        for tree in trees:
+            reader = PdfFileReader(BytesIO(pageTreePdf(tree)),
+                                   objectCache=ObjectCache(weakPageTree=True))
+            self.assertEqual(reader.peekPageCount(), 50)
+
+    def testUnreadPages(self):
+        # the pages of a node with as many kids as its /Count are not read
+        data = pageTreePdf([6, [3, None, None, None], [3, None, None, None]])
+        reader = PdfFileReader(BytesIO(data))
+        self.assertEqual(reader.peekPageCount(), 6)
+        self.assertEqual(len(reader.resolvedObjects), 4)
+
+
+class ObjectStreamTestCase(unittest.TestCase):
+    streams = [
+        dict((num, b"(string %d)" % num) for num in range(3, 8)),
+        dict((num, b"<< /N %d /Next %d 0 R >>" % (num, num + 1))
+             for num in range(8, 12)),
+    ]
+
+    def read(self, reader, num):
+        return reader.getObject(IndirectObject(num, 0, reader))
+
+    def check(self, reader, num):
+        if num < 8:
+            self.assertEqual(self.read(reader, num), "string %d" % num)
+        else:
+            self.assertEqual(self.read(reader, num)["/N"], num)
+            self.assertEqual(self.read(reader, num).raw_get("/Next").idnum, num + 1)
+
+    def testLookups(self):
+        reader = PdfFileReader(BytesIO(objectStreamPdf(self.streams)))
+        # out of order, across the streams
+        for num in (7, 3, 10, 5, 8, 11, 4, 6, 9):
+            self.check(reader, num)
+        # each stream is decoded and indexed once
+        cache = reader.objectStreamCache
+        self.assertEqual((cache.misses, cache.hits, len(cache)), (2, 7, 2))
+
+    def testBudget(self):
+        data = objectStreamPdf(self.streams)
+        # nothing kept, or room for either stream but not both
+        for budget, kept, misses, evictions in (0, 0, 9, 0), (150, 1, 2, 1):
+            reader = PdfFileReader(BytesIO(data), objStmCacheBytes=budget)
+            for num in range(3, 12):
+                self.check(reader, num)
+            cache = reader.objectStreamCache
+            self.assertEqual((len(cache), cache.misses, cache.evictions),
+                             (kept, misses, evictions))
+
+    def testWrongIndex(self):
+        data = objectStreamPdf(self.streams, {5: 3})
+        reader = PdfFileReader(BytesIO(data))
+        self.assertEqual(self.read(reader, 4), "string 4")
+        self.assertRaises(PdfReadError, self.read, reader, 5)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            reader = PdfFileReader(BytesIO(data), strict=False)
+        self.assertEqual(self.read(reader, 5), "string 5")
+
+
+class NotZeroIndexedXrefTestCase(unittest.TestCase):
+    def check(self, lazyXref):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            reader = PdfFileReader(BytesIO(notZeroIndexedPdf()), strict=False,
+                                   lazyXref=lazyXref)
+
+        def get(num):
+            return reader.getObject(IndirectObject(num, 0, reader))
+        self.assertEqual(get(6), "six")
+        self.assertEqual(get(5), "five")
+        self.assertEqual(get(4), "four")
+        self.assertEqual(get(3)["/Rotate"], 90)
+        self.assertEqual(get(2)["/Count"], 1)
+        self.assertEqual(get(1)["/Type"], "/Catalog")
+        self.assertEqual(reader.getNumPages(), 1)
+        self.assertEqual(reader.getPage(0)["/Rotate"], 90)
+
+    def testLazy(self):
+        self.check(True)
+
+    def testWhole(self):
+        self.check(False)
+
+
+if __name__ == "__main__":
+    unittest.main()
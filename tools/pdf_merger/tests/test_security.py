@@ -0,0 +1,112 @@
+import os
+import sys
+import unittest
+from binascii import unhexlify
+from io import BytesIO
+
+TESTS_ROOT = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.dirname(TESTS_ROOT))
+
+from packages.PyPDF2 import (PdfFileReader, PdfFileWriter, security,
+                             utils)
+from packages.PyPDF2.generic import DecodedStreamObject, NameObject
+from packages.PyPDF2.utils import RC4_encrypt
+
+
+# NIST SP 800-38A, F.2.1 and F.2.5
+CBC_IV = unhexlify("000102030405060708090a0b0c0d0e0f")
+CBC_PLAINTEXT = unhexlify(
+    "6bc1bee22e409f96e93d7e117393172aae2d8a571e03ac9c9eb76fac45af8e51"
+    "30c81c46a35ce411e5fbc1191a0a52eff69f2445df4f9b17ad2b417be66c3710")
+CBC_VECTORS = [
+    (unhexlify("2b7e151628aed2a6abf7158809cf4f3c"), unhexlify(
+        "7649abac8119b246cee98e9b12e9197d5086cb9b507219ee95db113a917678b2"
+        "73bed6b8e3c1743b7116e69e222295163ff1caa1681fac09120eca307586e1a7")),
+    (unhexlify("603deb1015ca71be2b73aef0857d7781"
+               "1f352c073b6108d72d9810a30914dff4"), unhexlify(
+        "f58c4c04d6e5f1ba779eabfb5f7bfbd69cfc4e967edb808d679f777bc6702c7d"
+        "39f23369a9d9bacfa530e26304231461b2eb05e2c39be9fcda6c19078c6a9d1b")),
+]
+
+
+class CipherPaths(object):
+    # runs every test with the cryptography package and without it
+    def run(self, result=None):
+        paths = [(None, None)]
+        if utils.ARC4 is not None or security.Cipher is not None:
+            paths.append((utils.ARC4, security.Cipher))
+        saved = utils.ARC4, security.Cipher
+        try:
+            for utils.ARC4, security.Cipher in paths:
+                super(CipherPaths, self).run(result)
+        finally:
+            utils.ARC4, security.Cipher = saved
+
+
+class AESTestCase(CipherPaths, unittest.TestCase):
+    def testVectors(self):
+        for key, ciphertext in CBC_VECTORS:
+            self.assertEqual(security.cbcEncrypt(key, CBC_IV, CBC_PLAINTEXT),
+                             ciphertext)
+            self.assertEqual(security.cbcDecrypt(key, CBC_IV, ciphertext),
+                             CBC_PLAINTEXT)
+            self.assertEqual(
+                security.decrypt(security.AESKey(key), CBC_IV + ciphertext),
+                CBC_PLAINTEXT)
+
+    def testRoundTrip(self):
+        for keyLength in (16, 32):
+            key = security.AESKey(os.urandom(keyLength))
+            for length in (0, 1, 15, 16, 17, 1000):
+                data = os.urandom(length)
+                encrypted = security.encrypt(key, data)
+                self.assertEqual(len(encrypted) % 16, 0)
+                self.assertEqual(security.decrypt(key, encrypted), data)
+
+
+class RC4TestCase(CipherPaths, unittest.TestCase):
+    def testVectors(self):
+        # the key schedule of the last key is kept, so the keys alternate
+        for i in range(2):
+            self.assertEqual(RC4_encrypt(b"Key", b"Plaintext"),
+                             unhexlify("bbf316e8d940af0ad3"))
+            self.assertEqual(RC4_encrypt(b"Wiki", b"pedia"),
+                             unhexlify("1021bf0420"))
+        self.assertEqual(RC4_encrypt(b"Key", unhexlify("bbf316e8d940af0ad3")),
+                         b"Plaintext")
+
+    def testKeySizes(self):
+        # 40 and 128 bit keys, as PDFs use, and a long plaintext
+        data = bytes(bytearray(range(256))) * 40
+        for key in (b"\x01\x02\x03\x04\x05", os.urandom(16)):
+            encrypted = RC4_encrypt(key, data)
+            self.assertNotEqual(encrypted, data)
+            self.assertEqual(RC4_encrypt(key, encrypted), data)
+        self.assertEqual(RC4_encrypt(b"Key", b""), b"")
+
+
+class EncryptedDocumentTestCase(CipherPaths, unittest.TestCase):
+    def testAlgorithms(self):
+        for algorithm in ("RC4-40", "RC4-128", "AES-128", "AES-256"):
+            writer = PdfFileWriter()
+            page = writer.addBlankPage(100, 100)
+            contents = DecodedStreamObject()
+            contents.setData(b"BT /F1 12 Tf (Hello) Tj ET")
+            page[NameObject("/Contents")] = writer._addObject(contents)
+            writer.addMetadata({"/Title": "Secret title"})
+            writer.encrypt("user", "owner", algorithm=algorithm)
+            output = BytesIO()
+            writer.write(output)
+            self.assertNotIn(b"Secret title", output.getvalue())
+
+            reader = PdfFileReader(BytesIO(output.getvalue()))
+            self.assertTrue(reader.isEncrypted)
+            self.assertEqual(reader.decrypt("wrong"), 0)
+            self.assertTrue(reader.decrypt("user"))
+            self.assertEqual(reader.getDocumentInfo().title, "Secret title")
+            self.assertEqual(reader.getPage(0).getContents().getData(),
+                             b"BT /F1 12 Tf (Hello) Tj ET")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,176 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from io import BytesIO
+
+TESTS_ROOT = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.dirname(TESTS_ROOT))
+
+from packages.PyPDF2 import PdfFileReader, PdfFileWriter, pdf
+from packages.PyPDF2.generic import (ArrayObject, DecodedStreamObject,
+                                     DictionaryObject, NameObject,
+                                     NumberObject, TextStringObject)
+from packages.PyPDF2.text import FontMap, fontMap, parseCMap
+
+
+CMAP = (b"/CIDInit /ProcSet findresource begin 12 dict begin begincmap\n"
+        b"1 begincodespacerange <0000> <FFFF> endcodespacerange\n"
+        b"2 beginbfrange\n<0020> <007E> <0020>\n"
+        b"<0100> <0101> [<00C0> <0066 0069>]\nendbfrange\n"
+        b"1 beginbfchar <0003> <D83D DE00> endbfchar\n"
+        b"endcmap CMapName currentdict /CMap defineresource pop end end")
+
+# one byte codes below 0x80, two byte codes from 0x8000
+MIXED_CMAP = (b"begincmap 2 begincodespacerange <00> <7F> <8000> <FFFF>\n"
+              b"endcodespacerange\n2 beginbfchar <41> <0061> <8141> <4E2D>\n"
+              b"endbfchar endcmap")
+
+
+def font(**entries):
+    return DictionaryObject((NameObject("/" + key), value)
+                            for key, value in entries.items())
+
+
+def textDocument(pages, encrypt=False):
+    # pages showing text in a Type0 font with a ToUnicode CMap and in a
+    # WinAnsi encoded font
+    writer = PdfFileWriter()
+    cmap = DecodedStreamObject()
+    cmap.setData(CMAP)
+    type0 = writer._addObject(font(
+        Type=NameObject("/Font"), Subtype=NameObject("/Type0"),
+        BaseFont=NameObject("/Identity"), Encoding=NameObject("/Identity-H"),
+        ToUnicode=writer._addObject(cmap)))
+    winAnsi = writer._addObject(font(
+        Type=NameObject("/Font"), Subtype=NameObject("/Type1"),
+        BaseFont=NameObject("/Helvetica"),
+        Encoding=NameObject("/WinAnsiEncoding")))
+    for i in range(pages):
+        page = writer.addBlankPage(612, 792)
+        contents = DecodedStreamObject()
+        contents.setData(
+            b"BT 14 TL /F1 10 Tf <0048006900200101> Tj T* "
+            b"q /F2 10 Tf (Caf\xe9 %d) Tj Q [<0100> -250 <0003>] TJ ET" % i)
+        page[NameObject("/Contents")] = writer._addObject(contents)
+        page[NameObject("/Resources")] = DictionaryObject({
+            NameObject("/Font"): DictionaryObject({
+                NameObject("/F1"): type0, NameObject("/F2"): winAnsi})})
+    if encrypt:
+        writer.encrypt("", algorithm="AES-128")
+    output = BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+def expectedText(page):
+    return u"Hi fi\nCaf\xe9 %d\xc0\U0001f600\n" % page
+
+
+class FontMapTestCase(unittest.TestCase):
+    def testCMap(self):
+        fonts = parseCMap(CMAP)
+        self.assertEqual(fonts.decode(b"\x00H\x00i"), u"Hi")
+        # arrays of destinations, ligatures and surrogate pairs
+        self.assertEqual(fonts.decode(b"\x01\x00\x01\x01\x00\x03"),
+                         u"\xc0fi\U0001f600")
+        # codes without text are dropped
+        self.assertEqual(fonts.decode(b"\x00\x01\x00A"), u"A")
+
+    def testMixedWidths(self):
+        fonts = parseCMap(MIXED_CMAP)
+        self.assertEqual(fonts.decode(b"A\x81AA\x90\x00"), u"a中a")
+
+    def testSingleByte(self):
+        fonts = FontMap({b"A": u"x", b"\xe9": u"\xe9"})
+        self.assertEqual(fonts.decode(b"A\xe9B"), u"x\xe9")
+
+    def testEncoding(self):
+        self.assertEqual(
+            fontMap(font(Encoding=NameObject("/WinAnsiEncoding")))
+            .decode(b"\x93Caf\xe9\x94"), u"“Caf\xe9”")
+        differences = font(
+            BaseEncoding=NameObject("/MacRomanEncoding"),
+            Differences=ArrayObject([NumberObject(65), NameObject("/fi"),
+                                     NameObject("/uni263A"),
+                                     NameObject("/Z")]))
+        self.assertEqual(fontMap(font(Encoding=differences))
+                         .decode(b"ABC\x8e"), u"fi☺Z\xe9")
+        # fonts that say nothing about their codes have no map
+        self.assertIsNone(fontMap(font(Subtype=NameObject("/Type1"))))
+        self.assertIsNone(fontMap(font(Subtype=NameObject("/Type0"))))
+        self.assertIsNone(fontMap(font(
+            Encoding=NameObject("/StandardEncoding"))))
+
+
+class ExtractAllTextTestCase(unittest.TestCase):
+    def setUp(self):
+        self.data = textDocument(40)
+        self.expected = [expectedText(i) for i in range(40)]
+
+    def testInProcess(self):
+        reader = PdfFileReader(BytesIO(self.data))
+        self.assertEqual(list(reader.extractAllText()), self.expected)
+        # the pages share the maps of the two fonts
+        self.assertEqual(len(reader._fontMaps), 2)
+        # extractText still keeps the text strings only
+        self.assertEqual(reader.getPage(0).extractText(), u"\nCaf\xe9 0\n")
+
+    def testBuiltStrings(self):
+        # strings made rather than read have no original bytes to decode
+        reader = PdfFileReader(BytesIO(self.data))
+        page = reader.getPage(0)
+        content = pdf.ContentStream(page["/Contents"], reader)
+        content.operations = [
+            ([NameObject("/F2"), NumberObject(10)], b"Tf"),
+            ([TextStringObject(u"☺ made")], b"Tj"),
+        ]
+        page[NameObject("/Contents")] = content
+        self.assertEqual(page._extractText(reader._fontMaps), u"☺ made")
+
+    def testWorkers(self):
+        # what the worker processes run, in this process
+        pdf._textWorkerInit(None, self.data, True, None)
+        try:
+            self.assertEqual(pdf._textWorkerPages(3, 7), self.expected[3:7])
+        finally:
+            pdf._textReader = None
+
+    def testProcesses(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, "text.pdf")
+            with open(path, "wb") as f:
+                f.write(self.data)
+            sources = [PdfFileReader(path), PdfFileReader(BytesIO(self.data))]
+            with open(path, "rb") as f:
+                # the file is read again by name only if it was opened by
+                # the reader itself
+                sources.append(PdfFileReader(f))
+                self.assertIsNone(sources[-1]._path)
+                sources.append(PdfFileReader(f, useMmap=True))
+                encrypted = PdfFileReader(BytesIO(textDocument(40, True)))
+                encrypted.decrypt("")
+                sources.append(encrypted)
+                for reader in sources:
+                    texts = reader._extractAllTextInProcesses(2, 8, 40)
+                    self.assertEqual(list(texts), self.expected)
+            self.assertEqual(sources[0]._path, path)
+        finally:
+            shutil.rmtree(directory)
+
+    def testSingleCpu(self):
+        # workers sharing one CPU would only slow it down
+        reader = PdfFileReader(BytesIO(self.data))
+        cpus, pdf._availableCpus = pdf._availableCpus, lambda: 1
+        try:
+            reader._extractAllTextInProcesses = None
+            self.assertEqual(list(reader.extractAllText(4, 8)),
+                             self.expected)
+        finally:
+            pdf._availableCpus = cpus
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,516 @@
+import gc
+import hashlib
+import os
+import sys
+import unittest
+import weakref
+from io import BytesIO
+
+TESTS_ROOT = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.dirname(TESTS_ROOT))
+
+from packages.PyPDF2 import (PdfFileMerger, PdfFileReader, PdfFileWriter,
+                             xref)
+from packages.PyPDF2.pdf import _OutputBuffer
+from packages.PyPDF2.utils import PdfWriteError
+from packages.PyPDF2.generic import (ArrayObject, BooleanObject,
+                                     DecodedStreamObject, DictionaryObject,
+                                     FloatObject, IndirectObject, NameObject,
+                                     NullObject, NumberObject, StreamObject,
+                                     createStringObject)
+
+
+def canonical(obj, seen=None):
+    """
+    Returns the object with everything it refers to as plain Python values,
+    numbering the indirect objects in the order they are met, so that the
+    same objects written out differently compare equal.
+    """
+    if seen is None:
+        seen = {}
+    if isinstance(obj, IndirectObject):
+        key = obj.idnum, obj.generation
+        if key in seen:
+            return "ref", seen[key]
+        seen[key] = len(seen)
+        return "obj", seen[key], canonical(obj.getObject(), seen)
+    if isinstance(obj, DictionaryObject):
+        items = [(key, canonical(value, seen)) for key, value
+                 in sorted(obj.items())
+                 if key not in ("/Length", "/Filter", "/DecodeParms")]
+        if isinstance(obj, StreamObject):
+            items.append(("stream", obj.getData()))
+        return "dict", items
+    if isinstance(obj, ArrayObject):
+        return "array", [canonical(value, seen) for value in obj]
+    return type(obj).__name__, obj
+
+
+def buildDocument(writer, pageCount=7, baseFont="/Helvetica"):
+    # pages sharing a font, with contents, annotations linking them and
+    # document information
+    font = writer._addObject(DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject(baseFont),
+    }))
+    pages = []
+    for i in range(pageCount):
+        page = writer.addBlankPage(200 + i, 300)
+        contents = DecodedStreamObject()
+        contents.setData(b"BT /F1 12 Tf 10 10 Td (Page " +
+                         str(i).encode() + b") Tj ET")
+        page[NameObject("/Contents")] = writer._addObject(contents)
+        page[NameObject("/Resources")] = DictionaryObject({
+            NameObject("/Font"): DictionaryObject({NameObject("/F1"): font}),
+        })
+        page[NameObject("/UserUnit")] = FloatObject("1.25")
+        pages.append(page)
+    for i in range(pageCount - 1):
+        writer.addLink(i, i + 1, [0, 0, 10, 10])
+    writer.addMetadata({"/Title": "Objects", "/Subject": u"café"})
+    return pages
+
+
+def variedDocument(writer):
+    # a document over 64 KB, with numbers, names and strings that take
+    # every way of being written
+    pages = buildDocument(writer, 40)
+    for i, page in enumerate(pages):
+        contents = DecodedStreamObject()
+        contents.setData(b"0 0 m 100 100 l S\n" * (100 + i))
+        page[NameObject("/Contents")] = writer._addObject(contents)
+        page[NameObject("/Values")] = ArrayObject([
+            NumberObject(-7), NumberObject(0), NumberObject(1023),
+            NumberObject(1024 + i), NumberObject(2 ** 40),
+            FloatObject("-0.5"), FloatObject("%d.375" % i),
+            BooleanObject(True), BooleanObject(False), NullObject(),
+            NameObject("/Name%d" % i), NameObject("/A#20B"),
+            createStringObject(u"(paren) \\ tab\t caf\xe9 %d" % i),
+            createStringObject(u"\u2603 snowman"),
+            createStringObject(b"\x00\xff binary"),
+            writer.getReference(pages[0]),
+        ])
+    return pages
+
+
+def written(writer):
+    output = BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+def readBack(data, **options):
+    reader = PdfFileReader(BytesIO(data), **options)
+    return reader, canonical(reader.trailer.raw_get("/Root")), \
+        canonical(reader.trailer.raw_get("/Info"))
+
+
+class GetReferenceTestCase(unittest.TestCase):
+    def testPages(self):
+        writer = PdfFileWriter()
+        pages = buildDocument(writer, 3)
+        for page in pages:
+            self.assertIs(writer.getObject(writer.getReference(page)), page)
+        # an equal object that is not one of the writer's own
+        self.assertEqual(writer.getReference(DictionaryObject(pages[1])),
+                         writer.getReference(pages[1]))
+
+    def testReplaced(self):
+        writer = PdfFileWriter()
+        first = DictionaryObject({NameObject("/N"): NumberObject(1)})
+        ref = writer._addObject(first)
+        second = DictionaryObject({NameObject("/N"): NumberObject(2)})
+        writer._setObject(ref.idnum, second)
+        self.assertEqual(writer.getReference(second), ref)
+        self.assertRaises(ValueError, writer.getReference, first)
+        # objects made after the replaced ones are freed may be given their
+        # id(), but not their number
+        writer._setObject(ref.idnum, None)
+        del first, second
+        for i in range(100):
+            obj = DictionaryObject({NameObject("/N"): NumberObject(i + 3)})
+            self.assertNotIn(id(obj), writer._objectIds)
+            other = writer._addObject(obj)
+            self.assertEqual(writer.getReference(obj), other)
+
+
+class ObjectStreamTestCase(unittest.TestCase):
+    def setUp(self):
+        writer = PdfFileWriter()
+        buildDocument(writer)
+        self.plain = written(writer)
+        self.expected = readBack(self.plain)[1:]
+
+    def check(self, data, **options):
+        reader, root, info = readBack(data, **options)
+        self.assertEqual((root, info), self.expected)
+        return reader
+
+    def testObjectStreams(self):
+        for objectsPerStream, compressionLevel in ((1, -1), (3, 1), (100, 9)):
+            writer = PdfFileWriter()
+            writer.useObjectStreams(objectsPerStream, compressionLevel)
+            buildDocument(writer)
+            data = written(writer)
+            self.assertTrue(data.startswith(b"%PDF-1.5"))
+            self.assertIn(b"/ObjStm", data)
+            self.assertIn(b"/XRef", data)
+            self.assertNotIn(b"\nxref\n", data)
+            if objectsPerStream == 100:
+                self.assertLess(len(data), len(self.plain))
+            self.check(data)
+            self.check(data, lazyXref=True)
+
+    def testEncrypted(self):
+        writer = PdfFileWriter()
+        writer.useObjectStreams(4)
+        buildDocument(writer)
+        writer.encrypt("", algorithm="AES-128")
+        reader = PdfFileReader(BytesIO(written(writer)))
+        self.assertTrue(reader.decrypt(""))
+        self.assertEqual(canonical(reader.trailer.raw_get("/Root")),
+                         self.expected[0])
+
+    def testCopied(self):
+        # pages copied from another file, also while streaming
+        for streaming in (False, True):
+            source = PdfFileReader(BytesIO(self.plain))
+            writer = PdfFileWriter()
+            writer.useObjectStreams(5)
+            output = BytesIO()
+            if streaming:
+                writer.beginWrite(output)
+            for page in source.pages:
+                writer.addPage(page)
+            writer.addMetadata({"/Title": "Objects", "/Subject": u"café"})
+            writer.write(output)
+            reader = self.check(output.getvalue())
+            self.assertEqual(reader.getNumPages(), 7)
+
+    def testOptions(self):
+        writer = PdfFileWriter()
+        self.assertRaises(ValueError, writer.useObjectStreams, 0)
+        self.assertRaises(ValueError, writer.useObjectStreams, 65536)
+        writer.beginWrite(BytesIO())
+        self.assertRaises(ValueError, writer.useObjectStreams)
+
+
+def xrefOffsets(data):
+    # the offsets of the objects in the cross-reference table of a file
+    # written by PdfFileWriter, by object number
+    start = int(data[data.rindex(b"startxref") + 9:].split()[0])
+    lines = data[start:].split(b"\n")
+    assert lines[0] == b"xref"
+    first, count = [int(n) for n in lines[1].split()]
+    offsets = {}
+    for num in range(first, first + count):
+        offset, generation, kind = lines[2 + num - first].split()
+        if kind == b"n":
+            offsets[num] = int(offset)
+    return offsets
+
+
+class OutputTestCase(unittest.TestCase):
+    def setUp(self):
+        writer = PdfFileWriter()
+        variedDocument(writer)
+        self.classic = written(writer)
+
+    def copied(self, streaming, output=None):
+        writer = PdfFileWriter()
+        if output is None:
+            output = BytesIO()
+        if streaming:
+            writer.beginWrite(output)
+        for page in PdfFileReader(BytesIO(self.classic)).pages:
+            writer.addPage(page)
+        writer.write(output)
+        return output.getvalue()
+
+    def testIdentical(self):
+        # the digests of what the writer wrote before its output was
+        # buffered
+        writer = PdfFileWriter()
+        writer.useObjectStreams(7)
+        variedDocument(writer)
+        outputs = [self.classic, written(writer), self.copied(False),
+                   self.copied(True)]
+        self.assertEqual([hashlib.md5(data).hexdigest() for data in outputs],
+                         ["2e0d8d4285966e80463c253ef360dbd1",
+                          "53fdd374fb2e7fa65ba1478008dcec83",
+                          "28b07bb67bf935575fc68becc868138a",
+                          "c1698e6d771c39411fe6f186eaf2b747"])
+
+    def testOffsets(self):
+        # written after other data, the file is over 64 KB and handed to
+        # the stream in several pieces
+        for streaming in (False, True):
+            output = BytesIO()
+            output.write(b"%" * 1000 + b"\n")
+            data = self.copied(streaming, output)
+            self.assertGreater(len(data), 65536)
+            offsets = xrefOffsets(data)
+            self.assertEqual(sorted(offsets), list(range(1, 124)))
+            for num, offset in offsets.items():
+                self.assertTrue(data.startswith(b"%d 0 obj" % num, offset))
+
+    def testBuffer(self):
+        stream = BytesIO()
+        stream.write(b"head")
+        output = _OutputBuffer(stream)
+        output.write(b"abc")
+        output.write(bytearray(b"de"))
+        self.assertEqual(output.tell(), 9)
+        # kept until there is enough of it
+        output.flush(6)
+        self.assertEqual(stream.getvalue(), b"head")
+        output.flush(5)
+        self.assertEqual(stream.getvalue(), b"headabcde")
+        self.assertEqual(output.tell(), 9)
+        output.write(b"f")
+        self.assertEqual(output.tell(), 10)
+        output.flush()
+        output.flush()
+        self.assertEqual(stream.getvalue(), b"headabcdef")
+        self.assertEqual(output.tell(), 10)
+
+
+class SweepTestCase(unittest.TestCase):
+    def testLongChain(self):
+        # far more objects referring to each other than the recursion limit
+        length = 5 * sys.getrecursionlimit()
+        writer = PdfFileWriter()
+        page = writer.addBlankPage(100, 100)
+        first = writer._addObject(DictionaryObject())
+        link = first
+        for i in range(length - 1):
+            link = writer._addObject(DictionaryObject({
+                NameObject("/Next"): link, NameObject("/N"): NumberObject(i),
+            }))
+        # back to the end of the chain, to have a cycle as well
+        first.getObject()[NameObject("/Next")] = link
+        page[NameObject("/Chain")] = link
+        data = written(writer)
+
+        source = PdfFileReader(BytesIO(data))
+        copy = PdfFileWriter()
+        copy.addPage(source.getPage(0))
+        reader = PdfFileReader(BytesIO(written(copy)))
+        link = reader.getPage(0).raw_get("/Chain")
+        seen = set()
+        while link.idnum not in seen:
+            seen.add(link.idnum)
+            link = link.getObject().raw_get("/Next")
+        self.assertEqual(len(seen), length)
+
+
+def templateDocument(baseFont="/Helvetica"):
+    # pages whose resources are equal from one copy of the file to the
+    # next, some of which must not be shared
+    writer = PdfFileWriter()
+    pages = buildDocument(writer, 3, baseFont)
+    shared = writer._addObject(DictionaryObject({
+        NameObject("/N"): NumberObject(1)}))
+    first = writer._addObject(DictionaryObject())
+    second = writer._addObject(DictionaryObject({NameObject("/Next"): first}))
+    first.getObject()[NameObject("/Next")] = second
+    for page in pages:
+        for key, kind in (("/P", "/Owned"), ("/Parent", "/Child")):
+            page[NameObject(kind)] = writer._addObject(DictionaryObject({
+                NameObject(key): shared, NameObject("/Kind"): NameObject(kind),
+            }))
+        page[NameObject("/Cycle")] = first
+    return written(writer)
+
+
+class DeduplicationTestCase(unittest.TestCase):
+    def setUp(self):
+        self.template = templateDocument()
+
+    def merged(self, deduplicate=True, streaming=False, objectStreams=False):
+        # the template twice over, from two readers
+        writer = PdfFileWriter()
+        if deduplicate:
+            writer.useDeduplication()
+        if objectStreams:
+            writer.useObjectStreams(4)
+        output = BytesIO()
+        if streaming:
+            writer.beginWrite(output)
+        for i in range(2):
+            for page in PdfFileReader(BytesIO(self.template)).pages:
+                writer.addPage(page)
+        writer.write(output)
+        return output.getvalue()
+
+    def count(self, data):
+        # the number of objects of each kind in the file
+        reader = PdfFileReader(BytesIO(data))
+        counts = {}
+        for num, generation, type, field2, field3 in reader.xref.entries():
+            if type == xref.FREE:
+                continue
+            obj = reader.getObject(IndirectObject(num, generation, reader))
+            if not isinstance(obj, DictionaryObject):
+                continue
+            if isinstance(obj, StreamObject) and b"Page" in obj.getData():
+                kind = "contents"
+            elif "/Next" in obj:
+                kind = "cycle"
+            elif obj.get("/N") == 1:
+                kind = "shared"
+            else:
+                kind = obj.get("/Kind", obj.get("/Type"))
+            counts[kind] = counts.get(kind, 0) + 1
+        return reader, counts
+
+    def testShared(self):
+        reader, counts = self.count(self.merged(False))
+        self.assertEqual((counts["/Font"], counts["shared"],
+                          counts["contents"]), (2, 2, 6))
+        reader, counts = self.count(self.merged())
+        # the font, the contents and what /P and /Parent point to are
+        # written once
+        self.assertEqual((counts["/Font"], counts["shared"],
+                          counts["contents"]), (1, 1, 3))
+
+    def testUnshared(self):
+        reader, counts = self.count(self.merged())
+        # pages, annotations, objects with /P or /Parent and cycles are
+        # copied for each page or file
+        self.assertEqual(counts["/Page"], 6)
+        self.assertEqual(counts["/Annot"], 4)
+        self.assertEqual((counts["/Owned"], counts["/Child"]), (6, 6))
+        self.assertEqual(counts["cycle"], 4)
+        owned = [page.raw_get("/Owned").idnum for page in reader.pages]
+        self.assertEqual(len(set(owned)), 6)
+
+    def testReadBack(self):
+        expected = PdfFileReader(BytesIO(self.merged(False)))
+        for streaming in (False, True):
+            for objectStreams in (False, True):
+                data = self.merged(True, streaming, objectStreams)
+                reader = PdfFileReader(BytesIO(data))
+                self.assertEqual(reader.getNumPages(), 6)
+                self.assertEqual(self.count(data)[1]["/Font"], 1)
+                for i in range(6):
+                    for key in ("/Resources", "/Contents", "/Owned",
+                                "/Child", "/Cycle"):
+                        self.assertEqual(
+                            canonical(reader.getPage(i).raw_get(key)),
+                            canonical(expected.getPage(i).raw_get(key)))
+
+    def testSourcesFreed(self):
+        # the digests of a file's objects don't keep it
+        writer = PdfFileWriter()
+        writer.useDeduplication()
+        writer.beginWrite(BytesIO())
+        reader = PdfFileReader(BytesIO(self.template))
+        for page in reader.pages:
+            writer.addPage(page)
+        source = weakref.ref(reader)
+        del reader, page
+        writer.addBlankPage(100, 100)
+        gc.collect()
+        self.assertIsNone(source())
+
+    def testReusedIds(self):
+        # files read one after the other, each going before the next is
+        # opened and maybe given its id(), with different fonts under the
+        # same object numbers
+        baseFonts = ("/Helvetica", "/Courier", "/Times-Roman")
+        templates = [templateDocument(baseFont) for baseFont in baseFonts]
+        writer = PdfFileWriter()
+        writer.useDeduplication()
+        output = BytesIO()
+        writer.beginWrite(output)
+        for i in range(30):
+            for page in PdfFileReader(BytesIO(templates[i % 3])).pages:
+                writer.addPage(page)
+            del page
+            writer.addBlankPage(100, 100)
+            gc.collect()
+        writer.write(output)
+        reader = PdfFileReader(BytesIO(output.getvalue()))
+        self.assertEqual(
+            [reader.getPage(i)["/Resources"]["/Font"]["/F1"]["/BaseFont"]
+             for i in range(len(reader.pages)) if i % 4 != 3],
+            [baseFonts[i % 3] for i in range(30) for j in range(3)])
+        self.assertEqual(self.count(output.getvalue())[1]["/Font"], 3)
+
+
+class StreamingTestCase(unittest.TestCase):
+    def setUp(self):
+        writer = PdfFileWriter()
+        buildDocument(writer)
+        self.plain = written(writer)
+
+    def testCopied(self):
+        expected = None
+        for streaming in (False, True):
+            source = PdfFileReader(BytesIO(self.plain))
+            writer = PdfFileWriter()
+            output = BytesIO()
+            if streaming:
+                writer.beginWrite(output)
+            for page in source.pages:
+                writer.addPage(page)
+            writer.write(output)
+            root = readBack(output.getvalue())[1]
+            if expected is None:
+                expected = root
+            self.assertEqual(root, expected)
+
+    def testWrittenPages(self):
+        writer = PdfFileWriter()
+        output = BytesIO()
+        writer.beginWrite(output)
+        for i in range(3):
+            writer.addBlankPage(100 + i, 100)
+        # the pages before the last one were written out
+        for pageNumber in 0, 1, -2:
+            self.assertRaises(PdfWriteError, writer.getPage, pageNumber)
+        self.assertRaises(PdfWriteError, writer.addLink, 0, 2, [0, 0, 1, 1])
+        self.assertRaises(PdfWriteError, writer.removeLinks)
+        self.assertEqual(writer.getPage(2).mediaBox.getWidth(), 102)
+        self.assertEqual(writer.getPage(-1).mediaBox.getWidth(), 102)
+        # links to written pages are fine
+        writer.addLink(2, 0, [0, 0, 1, 1])
+        writer.write(output)
+
+        reader = PdfFileReader(BytesIO(output.getvalue()))
+        self.assertEqual(reader.getNumPages(), 3)
+        link = reader.getPage(2)["/Annots"][0].getObject()
+        self.assertEqual(link["/Dest"][0].getObject()["/MediaBox"][2], 100)
+
+    def testSourcesFreed(self):
+        # another file goes once its pages have been written out
+        writer = PdfFileWriter()
+        writer.beginWrite(BytesIO())
+        reader = PdfFileReader(BytesIO(self.plain))
+        for page in reader.pages:
+            writer.addPage(page)
+        source = weakref.ref(reader)
+        del reader, page
+        writer.addBlankPage(100, 100)
+        gc.collect()
+        self.assertIsNone(source())
+
+    def testMergerInputs(self):
+        # the inputs go as soon as their pages have been written
+        merger = PdfFileMerger(streamOutput=True)
+        for i in range(3):
+            merger.append(BytesIO(self.plain))
+        readers = [weakref.ref(reader) for fo, reader, mine in merger.inputs]
+        output = BytesIO()
+        merger.write(output)
+        gc.collect()
+        self.assertEqual([reader() for reader in readers], [None] * 3)
+        reader = PdfFileReader(BytesIO(output.getvalue()))
+        self.assertEqual(reader.getNumPages(), 21)
+        self.assertEqual(reader.getPage(20)["/MediaBox"][2], 206)
+
+
+if __name__ == "__main__":
+    unittest.main()